@@ -20,26 +20,25 @@
 # USA
 
 
-import os
 from gettext import gettext as _
 
-from gi.repository import Gio, GLib, Gst
+from gi.repository import Gio, GLib, GObject, Gst
 
+from soundconverter.gstreamer.fileio import get_sink, get_source, quote_location
+from soundconverter.gstreamer.pipelinepool import get_pipeline_pool, make_template
+from soundconverter.gstreamer.workerpool import get_worker_pool
 from soundconverter.util.error import show_error
 from soundconverter.util.fileoperations import (
     beautify_uri,
-    vfs_encode_filename,
     vfs_exists,
     vfs_rename,
     vfs_unlink,
 )
 from soundconverter.util.logger import logger
-from soundconverter.util.settings import get_gio_settings
+from soundconverter.util.namegenerator import TargetNameGenerator
+from soundconverter.util.settings import get_gio_settings, settings
 from soundconverter.util.task import Task
 
-GSTREAMER_SOURCE = "giosrc"
-GSTREAMER_SINK = "giosink"
-
 available_elements = set()
 
 
@@ -104,40 +103,40 @@ def find_available_elements():
 find_available_elements()
 
 
-def create_flac_encoder():
+def create_flac_encoder(gio_settings):
     """Return an flac encoder for the gst pipeline string."""
-    flac_compression = get_gio_settings().get_int("flac-compression")
+    flac_compression = gio_settings.get_int("flac-compression")
     return f"flacenc mid-side-stereo=true quality={flac_compression}"
 
 
-def create_wav_encoder():
+def create_wav_encoder(gio_settings):
     """Return a wav encoder for the gst pipeline string."""
-    wav_sample_width = get_gio_settings().get_int("wav-sample-width")
+    wav_sample_width = gio_settings.get_int("wav-sample-width")
     formats = {8: "U8", 16: "S16LE", 24: "S24LE", 32: "S32LE"}
     return f"audioconvert ! audio/x-raw,format={formats[wav_sample_width]} ! wavenc"
 
 
-def create_oggvorbis_encoder():
+def create_oggvorbis_encoder(gio_settings):
     """Return an ogg encoder for the gst pipeline string."""
     cmd = "vorbisenc"
-    vorbis_quality = get_gio_settings().get_double("vorbis-quality")
+    vorbis_quality = gio_settings.get_double("vorbis-quality")
     if vorbis_quality is not None:
         cmd += f" quality={vorbis_quality}"
     cmd += " ! oggmux "
     return cmd
 
 
-def create_mp3_encoder():
+def create_mp3_encoder(gio_settings):
     """Return an mp3 encoder for the gst pipeline string."""
     quality = {
         "cbr": "mp3-cbr-quality",
         "abr": "mp3-abr-quality",
         "vbr": "mp3-vbr-quality",
     }
-    mode = get_gio_settings().get_string("mp3-mode")
+    mode = gio_settings.get_string("mp3-mode")
 
     mp3_mode = mode
-    mp3_quality = get_gio_settings().get_int(quality[mode])
+    mp3_quality = gio_settings.get_int(quality[mode])
 
     cmd = "lamemp3enc encoding-engine-quality=2 "
 
@@ -164,9 +163,9 @@ def create_mp3_encoder():
     return cmd
 
 
-def create_aac_encoder():
+def create_aac_encoder(gio_settings):
     """Return an aac encoder for the gst pipeline string."""
-    aac_quality = get_gio_settings().get_int("aac-quality")
+    aac_quality = gio_settings.get_int("aac-quality")
 
     # it seemed like I couldn't get vbr to work with any of these, not even
     # with rate-control and quality of faac or with maxrate of avenc_aac.
@@ -191,21 +190,90 @@ def create_aac_encoder():
     return f"avenc_aac bitrate={bitrate} ! mp4mux"
 
 
-def create_opus_encoder():
+def create_opus_encoder(gio_settings):
     """Return an opus encoder for the gst pipeline string."""
-    opus_quality = get_gio_settings().get_int("opus-bitrate")
+    opus_quality = gio_settings.get_int("opus-bitrate")
     return (
         f"opusenc bitrate={opus_quality * 1000} bitrate-type=vbr "
         "bandwidth=auto ! oggmux"
     )
 
 
-def create_wma_encoder():
+def create_wma_encoder(gio_settings):
     """Return an wma encoder for the gst pipeline string."""
-    wma_quality = get_gio_settings().get_int("wma-bitrate")
+    wma_quality = gio_settings.get_int("wma-bitrate")
     return f"avenc_wmav2 bitrate={wma_quality * 1000} ! asfmux"
 
 
+def create_encoder(mime_type, gio_settings=None):
+    """Return the encoder of the mime type for the gst pipeline string.
+
+    Parameters
+    ----------
+    mime_type : string
+        For example "audio/x-flac"
+    gio_settings : Gio.Settings
+        Where the quality is read from, defaults to get_gio_settings()
+    """
+    if gio_settings is None:
+        gio_settings = get_gio_settings()
+    return {
+        "audio/x-vorbis": create_oggvorbis_encoder,
+        "audio/x-flac": create_flac_encoder,
+        "audio/x-wav": create_wav_encoder,
+        "audio/mpeg": create_mp3_encoder,
+        "audio/x-m4a": create_aac_encoder,
+        "audio/ogg; codecs=opus": create_opus_encoder,
+        "audio/x-ms-wma": create_wma_encoder,
+    }[mime_type](gio_settings)
+
+
+# Rough encoding cost per second of audio relative to mp3, used to start the
+# most expensive conversions first.
+encoder_costs = {
+    "audio/x-wav": 0.2,
+    "audio/x-flac": 0.5,
+    "audio/x-vorbis": 1.0,
+    "audio/mpeg": 1.0,
+    "audio/ogg; codecs=opus": 1.2,
+    "audio/x-m4a": 1.5,
+    "audio/x-ms-wma": 1.0,
+}
+
+
+class ExtraOutput:
+    """An additional format that Converters write from the same decoded audio.
+
+    Create this once for the queue, like the TargetNameGenerator. It
+    remembers the relevant settings, see --extra-output.
+    """
+
+    def __init__(self, gio_settings):
+        """Remember the output settings.
+
+        Parameters
+        ----------
+        gio_settings : Gio.Settings
+            A copy of the settings with a different format, quality and
+            output folder
+        """
+        self.mime_type = gio_settings.get_string("output-mime-type")
+        self.encoder = create_encoder(self.mime_type, gio_settings)
+        self.name_generator = TargetNameGenerator(gio_settings)
+
+
+class Branch:
+    """The targets of an ExtraOutput for a single Converter."""
+
+    def __init__(self, output):
+        self.output = output
+        self.newname = None
+        self.temporary_filename = None
+        # False if the target exists already and should be skipped
+        self.active = True
+        self.output_uri = None
+
+
 class Converter(Task):
     """Completely handle the conversion of a single file."""
 
@@ -213,7 +281,7 @@ class Converter(Task):
     OVERWRITE = "overwrite"
     SKIP = "skip"
 
-    def __init__(self, sound_file, name_generator):
+    def __init__(self, sound_file, name_generator, extra_outputs=()):
         """create a converter that converts a single file.
 
         Parameters
@@ -221,6 +289,9 @@ class Converter(Task):
         name_generator : TargetNameGenerator
             TargetNameGenerator that creates filenames for all converters
             of the current TaskQueue
+        extra_outputs : ExtraOutput[]
+            Formats that are written in addition to the output-mime-type,
+            from the same decoded audio
         """
         # Configuration
         self.sound_file = sound_file
@@ -228,6 +299,7 @@ class Converter(Task):
         self.newname = None
         self.existing_behaviour = Converter.INCREMENT
         self.name_generator = name_generator
+        self.branches = [Branch(output) for output in extra_outputs]
 
         # All relevant gio settings have to be copied and remembered, so that
         # they don't suddenly change during the conversion
@@ -236,12 +308,21 @@ class Converter(Task):
         self.output_resample = settings.get_boolean("output-resample")
         self.resample_rate = settings.get_int("resample-rate")
         self.force_mono = settings.get_boolean("force-mono")
-        self.replace_messy_chars = settings.get_boolean("replace-messy-chars")
         self.delete_original = settings.get_boolean("delete-original")
 
         # State
+        # False if only the branches are written, because the target exists
+        self.write_main = True
         self.command = None
+        # the same pipeline without locations, for --reuse-pipelines
+        self.template = None
+        self.locations = None
         self.pipeline = None
+        # if set, self.pipeline belongs to it and goes back to the PipelinePool
+        self.reusable = None
+        # if set, the pipeline runs in a process of the WorkerPool instead
+        self.worker = None
+        self.worker_position = 0
         self._done = False
         self.error = None
         self.output_uri = None
@@ -250,6 +331,8 @@ class Converter(Task):
 
     def _query_position(self):
         """Ask for the stream position of the current pipeline."""
+        if self.worker is not None:
+            return self.worker_position
         if self.pipeline:
             # during Gst.State.PAUSED it returns super small numbers,
             # so take care
@@ -264,7 +347,7 @@ class Converter(Task):
         if self._done:
             return 1, duration
 
-        if self.pipeline is None or duration is None:
+        if (self.pipeline is None and self.worker is None) or duration is None:
             return 0, duration
 
         position = self._query_position()
@@ -272,6 +355,19 @@ class Converter(Task):
         progress = min(max(progress, 0.0), 1.0)
         return progress, duration
 
+    def get_cost(self):
+        """Estimate how expensive the conversion is going to be."""
+        duration = self.sound_file.duration or 0
+        mime_types = [self.output_mime_type]
+        mime_types += [branch.output.mime_type for branch in self.branches]
+        return duration * sum(encoder_costs.get(mime, 1) for mime in mime_types)
+
+    def get_speed_key(self):
+        """Decoding and encoding speed depends on the input and output format."""
+        mime_types = [self.output_mime_type]
+        mime_types += [branch.output.mime_type for branch in self.branches]
+        return f"{self.sound_file.codec} {' + '.join(mime_types)}"
+
     def cancel(self):
         """Cancel execution of the task."""
         self._stop_pipeline()
@@ -279,6 +375,9 @@ class Converter(Task):
 
     def pause(self):
         """Pause execution of the task."""
+        if self.worker is not None:
+            get_worker_pool().pause(self)
+            return
         if not self.pipeline:
             logger.debug("pause(): pipeline is None!")
             return
@@ -286,6 +385,9 @@ class Converter(Task):
 
     def resume(self):
         """Resume execution of the task."""
+        if self.worker is not None:
+            get_worker_pool().resume(self)
+            return
         if not self.pipeline:
             logger.debug("resume(): pipeline is None!")
             return
@@ -293,6 +395,13 @@ class Converter(Task):
 
     def _cleanup(self):
         """Delete the pipeline."""
+        if self.worker is not None:
+            get_worker_pool().release(self)
+        if self.reusable is not None:
+            self.pipeline.get_bus().disconnect(self.watch_id)
+            get_pipeline_pool().release(self.reusable, reuse=self.error is None)
+            self.reusable = None
+            self.pipeline = None
         if self.pipeline is not None:
             bus = self.pipeline.get_bus()
             if hasattr(self, "watch_id"):
@@ -301,17 +410,40 @@ class Converter(Task):
             self.pipeline.set_state(Gst.State.NULL)
             self.pipeline = None
 
+    def _remove_temporary_file(self, temporary_filename, name_generator):
+        """Delete a partially written file."""
+        if temporary_filename is None:
+            return
+        target_index = name_generator.target_index
+        if target_index.exists(temporary_filename):
+            try:
+                vfs_unlink(temporary_filename)
+                target_index.remove(temporary_filename)
+            except Exception as error:
+                logger.error(
+                    f"cannot delete: '{beautify_uri(temporary_filename)}': {str(error)}",
+                )
+
+    def get_temporary_filenames(self):
+        """Get the temporary files of all outputs that are being written."""
+        temporary_filenames = [self.temporary_filename]
+        for branch in self.branches:
+            temporary_filenames.append(branch.temporary_filename)
+        return [temp for temp in temporary_filenames if temp is not None]
+
+    def _remove_temporary_files(self):
+        """Delete the partially written files of all outputs."""
+        self._remove_temporary_file(self.temporary_filename, self.name_generator)
+        for branch in self.branches:
+            self._remove_temporary_file(
+                branch.temporary_filename,
+                branch.output.name_generator,
+            )
+
     def _stop_pipeline(self):
-        # remove partial file
-        if self.temporary_filename is not None:
-            if vfs_exists(self.temporary_filename):
-                try:
-                    vfs_unlink(self.temporary_filename)
-                except Exception as error:
-                    logger.error(
-                        f"cannot delete: '{beautify_uri(self.temporary_filename)}': {str(error)}",
-                    )
-        if not self.pipeline:
+        # remove partial files
+        self._remove_temporary_files()
+        if not self.pipeline and self.worker is None:
             logger.debug("pipeline already stopped!")
             return
         self._cleanup()
@@ -323,6 +455,30 @@ class Converter(Task):
         renaming the file to it's final path.
         """
         command = self.command
+        # pipelines with branches are not linear, those are not reused
+        reuse = settings.get("reuse-pipelines") and self.template is not None
+        if settings.get("worker-processes"):
+            logger.debug(f"launching in a worker process: '{command}'")
+            if reuse:
+                get_worker_pool().run_reused(self, self.template, *self.locations)
+            else:
+                get_worker_pool().run(self, command)
+            return
+
+        if self.pipeline is None and reuse:
+            logger.debug(f"launching in a reused pipeline: '{command}'")
+            try:
+                self.reusable = get_pipeline_pool().acquire(self.template)
+            except GLib.Error as error:
+                self.error = f"gstreamer error when creating pipeline: {str(error)}"
+                self._on_error(self.error)
+                return
+
+            self.pipeline = self.reusable.pipeline
+            self.watch_id = self.pipeline.get_bus().connect("message", self._on_message)
+            self.reusable.start(*self.locations)
+            return
+
         if self.pipeline is None:
             logger.debug(f"launching: '{command}'")
             try:
@@ -343,67 +499,112 @@ class Converter(Task):
 
         Will clear the temporary data on error or move the temporary file
         to the final path on success.
+
+        If one of the outputs can't be moved, the conversion failed and the
+        remaining temporary files are deleted. Outputs that were already
+        moved are complete and stay where they are.
         """
         input_uri = self.sound_file.uri
-        newname = self.newname
 
-        if newname is None:
+        if self.newname is None:
             raise AssertionError("the conversion was not started")
 
         if self.error:
             logger.debug(
                 f"error in task, skipping rename: {self.temporary_filename}",
             )
-            vfs_unlink(self.temporary_filename)
+            self._remove_temporary_files()
             logger.error(
                 f"could not convert {beautify_uri(input_uri)}: {self.error}",
             )
             self.done()
             return
 
-        if not vfs_exists(self.temporary_filename):
-            self.error = (
-                f"Expected {self.temporary_filename} to exist after conversion."
+        for branch in self.branches:
+            if not branch.active:
+                continue
+            branch.output_uri = self._move_to_target(
+                branch.temporary_filename,
+                branch.newname,
+                branch.output.name_generator,
             )
-            self.done()
-            return
+            if branch.output_uri is None:
+                self._remove_temporary_files()
+                self.done()
+                return
+
+        newname = None
+        if self.write_main:
+            newname = self._move_to_target(
+                self.temporary_filename,
+                self.newname,
+                self.name_generator,
+            )
+            if newname is None:
+                self._remove_temporary_files()
+                self.done()
+                return
+
+        if self.delete_original and not self.error:
+            logger.info(f"deleting: '{self.sound_file.uri}'")
+            try:
+                vfs_unlink(self.sound_file.uri)
+                self.name_generator.target_index.remove(self.sound_file.uri)
+            except Exception as error:
+                logger.info(
+                    f"cannot remove '{beautify_uri(self.sound_file.uri)}': {str(error)}",
+                )
+
+        self.output_uri = newname
+        self.done()
+
+    def _move_to_target(self, temporary_filename, newname, name_generator):
+        """Rename the converted temporary file to its target.
+
+        Returns the uri it ended up at, or None if that failed, in which case
+        self.error is set.
+        """
+        input_uri = self.sound_file.uri
+        target_index = name_generator.target_index
+        original_newname = newname
+
+        # the only check that has to ask the filesystem, the index doesn't
+        # know whether gstreamer actually wrote something
+        if not vfs_exists(temporary_filename):
+            target_index.remove(temporary_filename)
+            self.error = f"Expected {temporary_filename} to exist after conversion."
+            return None
 
         # rename temporary file
         logger.debug(
-            f"{beautify_uri(self.temporary_filename)} -> {beautify_uri(newname)}",
+            f"{beautify_uri(temporary_filename)} -> {beautify_uri(newname)}",
         )
 
-        path, extension = os.path.splitext(newname)
-        path = path.replace("%", "%%")
-
-        space = " "
-        if self.replace_messy_chars:
-            space = "_"
-
-        exists = vfs_exists(newname)
+        exists = target_index.exists(newname)
         if self.existing_behaviour == Converter.INCREMENT and exists:
             # If the file already exists, increment the filename so that
             # nothing gets overwritten.
-            path = path + space + "(%d)" + extension
             i = 1
-            while vfs_exists(newname):
-                newname = path % i
+            while target_index.exists(newname):
+                newname = name_generator.get_incremented_uri(original_newname, i)
                 i += 1
 
+        # lets the journal know where the file is, should the rename be the
+        # last thing that happens before a crash
+        self.emit("moving", newname)
         try:
             if self.existing_behaviour == Converter.OVERWRITE and exists:
                 logger.info(f"overwriting '{beautify_uri(newname)}'")
                 vfs_unlink(newname)
-            vfs_rename(self.temporary_filename, newname)
+            vfs_rename(temporary_filename, newname)
+            target_index.remove(temporary_filename)
+            target_index.add(newname)
         except Exception as error:
             self.error = str(error)
             logger.error(
-                f"could not rename '{beautify_uri(self.temporary_filename)}' to '{beautify_uri(newname)}': {str(error)}",
+                f"could not rename '{beautify_uri(temporary_filename)}' to '{beautify_uri(newname)}': {str(error)}",
             )
-            self.done()
-            return
-
-        assert vfs_exists(newname)
+            return None
 
         logger.info(
             f"converted '{beautify_uri(input_uri)}' to '{beautify_uri(newname)}'",
@@ -437,17 +638,7 @@ class Converter(Task):
                 f"Could not set modification time of the target '{beautify_uri(newname)}': {str(error)}",
             )
 
-        if self.delete_original and not self.error:
-            logger.info(f"deleting: '{self.sound_file.uri}'")
-            try:
-                vfs_unlink(self.sound_file.uri)
-            except Exception as error:
-                logger.info(
-                    f"cannot remove '{beautify_uri(self.sound_file.uri)}': {str(error)}",
-                )
-
-        self.output_uri = newname
-        self.done()
+        return newname
 
     def done(self):
         self._done = True
@@ -456,28 +647,48 @@ class Converter(Task):
 
     def run(self):
         """Call this in order to run the whole Converter task."""
-        self.newname = self.name_generator.generate_target_uri(self.sound_file)
+        if self.newname is None:
+            # otherwise it was planned already, see ConversionPlan
+            self.newname = self.name_generator.generate_target_uri(self.sound_file)
 
-        # temporary output file, in order to easily remove it without
-        # any overwritten file and therefore caused damage in the target dir.
-        self.temporary_filename = self.name_generator.generate_temp_path(
-            self.sound_file,
-        )
-
-        exists = vfs_exists(self.newname)
-        if self.existing_behaviour == Converter.SKIP and exists:
+        exists = self.name_generator.target_index.exists(self.newname)
+        self.write_main = not (self.existing_behaviour == Converter.SKIP and exists)
+        if not self.write_main:
             logger.info(
                 f"output file already exists, skipping '{beautify_uri(self.newname)}'",
             )
+
+        for branch in self.branches:
+            name_generator = branch.output.name_generator
+            branch.newname = name_generator.generate_target_uri(self.sound_file)
+            exists = name_generator.target_index.exists(branch.newname)
+            if self.existing_behaviour == Converter.SKIP and exists:
+                logger.info(
+                    "output file already exists, skipping "
+                    f"'{beautify_uri(branch.newname)}'",
+                )
+                branch.active = False
+
+        branches = [branch for branch in self.branches if branch.active]
+        if not self.write_main and len(branches) == 0:
             self.done()
             return
 
-        # construct a pipeline for conversion
-        # Add default decoding step that remains the same for all formats.
-        command = [
-            f'{GSTREAMER_SOURCE} location="{vfs_encode_filename(self.sound_file.uri)}" name=src ! decodebin name=decoder',
-            "audiorate ! audioconvert ! audioresample",
-        ]
+        # temporary output files, in order to easily remove them without
+        # any overwritten file and therefore caused damage in the target dir.
+        if self.write_main:
+            self.temporary_filename = self.name_generator.generate_temp_path(
+                self.sound_file,
+            )
+        for branch in branches:
+            name_generator = branch.output.name_generator
+            branch.temporary_filename = name_generator.generate_temp_path(
+                self.sound_file,
+            )
+
+        # construct a pipeline for conversion, the elements that come after
+        # the decoder. Add default step that remains the same for all formats.
+        command = ["audiorate", "audioconvert", "audioresample"]
 
         # audio resampling support
         if self.output_resample:
@@ -487,34 +698,57 @@ class Converter(Task):
         if self.force_mono:
             command.append("audio/x-raw,channels=1 ! audioconvert")
 
-        # figure out the rest of the gst pipeline string
-        encoder = {
-            "audio/x-vorbis": create_oggvorbis_encoder,
-            "audio/x-flac": create_flac_encoder,
-            "audio/x-wav": create_wav_encoder,
-            "audio/mpeg": create_mp3_encoder,
-            "audio/x-m4a": create_aac_encoder,
-            "audio/ogg; codecs=opus": create_opus_encoder,
-            "audio/x-ms-wma": create_wma_encoder,
-        }[self.output_mime_type]()
-        command.append(encoder)
-
-        gfile = Gio.file_parse_name(self.temporary_filename)
-        dirname = gfile.get_parent()
-        if dirname and not dirname.query_exists(None):
-            logger.info(f"creating folder: '{beautify_uri(dirname.get_uri())}'")
-            if not dirname.make_directory_with_parents():
-                show_error(
-                    _("cannot create '{}' folder.").format(beautify_uri(dirname)),
-                )
-                return
+        # the encoder and temporary file of each output
+        outputs = [
+            (branch.output.encoder, branch.temporary_filename) for branch in branches
+        ]
+        if self.write_main:
+            outputs.insert(
+                0,
+                (create_encoder(self.output_mime_type), self.temporary_filename),
+            )
 
-        command.append(
-            f'{GSTREAMER_SINK} location="{vfs_encode_filename(self.temporary_filename)}"',
+        for _encoder, temporary_filename in outputs:
+            gfile = Gio.file_parse_name(temporary_filename)
+            dirname = gfile.get_parent()
+            if dirname and not dirname.query_exists(None):
+                logger.info(f"creating folder: '{beautify_uri(dirname.get_uri())}'")
+                if not dirname.make_directory_with_parents():
+                    show_error(
+                        _("cannot create '{}' folder.").format(beautify_uri(dirname)),
+                    )
+                    return
+
+        source, source_location = get_source(self.sound_file.uri)
+        head = (
+            f"{source} location={quote_location(source_location)} name=src "
+            "! decodebin name=decoder"
         )
+        if len(outputs) == 1:
+            encoder, temporary_filename = outputs[0]
+            command.append(encoder)
+            sink, sink_location = get_sink(temporary_filename)
+            self.locations = (source_location, sink_location)
+            self.template = make_template(source, command, sink)
+            command = [
+                head,
+                *command,
+                f"{sink} location={quote_location(sink_location)}",
+            ]
+        else:
+            # decode once and encode into each output, see --extra-output
+            self.template = None
+            command = [head, *command, "tee name=tee"]
+            for encoder, temporary_filename in outputs:
+                sink, sink_location = get_sink(temporary_filename)
+                command[-1] += (
+                    f" tee. ! queue ! {encoder} ! "
+                    f"{sink} location={quote_location(sink_location)}"
+                )
 
         # preparation done, now convert
         self.command = " ! ".join(command)
+        self.emit("started")
         self._convert()
 
     def _on_error(self, error):
@@ -527,6 +761,14 @@ class Converter(Task):
         self._stop_pipeline()
         self.done()
 
+    def on_worker_eos(self):
+        """The pipeline in the worker process is done."""
+        self._conversion_done()
+
+    def on_worker_error(self, error):
+        """The pipeline in the worker process failed."""
+        self._on_error(error)
+
     def _on_message(self, _, message):
         """Handle message events sent by gstreamer.
 
@@ -540,3 +782,11 @@ class Converter(Task):
         elif message.type == Gst.MessageType.EOS:
             # Conversion done
             self._conversion_done()
+
+
+# emitted when the target and temporary filenames are known and the pipeline
+# is about to be launched
+GObject.signal_new("started", Converter, GObject.SignalFlags.RUN_FIRST, None, [])
+
+# emitted with the final uri right before a temporary file is renamed to it
+GObject.signal_new("moving", Converter, GObject.SignalFlags.RUN_FIRST, None, [str])
@@ -19,14 +19,24 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
 # USA
 
+import os
+import select
+import subprocess
+import sys
+import time
 from fnmatch import fnmatch
+from queue import Empty, Queue, SimpleQueue
 from threading import Thread
 
 from gi.repository import GLib, GObject, Gst, GstPbutils
 
+from soundconverter.gstreamer.worker import LineReader, encode_message
 from soundconverter.util.formats import filename_denylist
+from soundconverter.util.headerreader import read_header
 from soundconverter.util.logger import logger
-from soundconverter.util.settings import get_num_jobs
+from soundconverter.util.metadatacache import get_metadata_cache
+from soundconverter.util.prefilter import get_prefilter
+from soundconverter.util.settings import get_gio_settings, get_num_jobs, settings
 from soundconverter.util.task import Task
 
 type_getters = {
@@ -39,13 +49,18 @@ type_getters = {
 
 
 def add_discoverers(task_queue, sound_files):
-    """Fill a TaskQueue with Discoverer tasks for optimized discovery."""
+    """Fill a TaskQueue with Discoverer tasks for optimized discovery.
+
+    The Discoverers share their work, so each of them reports a chunk of
+    sound_files, but the files are analysed by whichever thread is free.
+    """
+    work = DiscoveryWork(sound_files)
     chunk = []
     chunksize = len(sound_files) / get_num_jobs()
     for sound_file in sound_files:
         chunk.append(sound_file)
         if len(chunk) >= chunksize or sound_file is sound_files[-1]:
-            discoverer = Discoverer(chunk)
+            discoverer = Discoverer(chunk, work)
             task_queue.add(discoverer)
             chunk = []
 
@@ -63,6 +78,29 @@ def get_sound_files(task_queue):
     return sound_files
 
 
+def get_discovery_timeout():
+    """Get after how many seconds discovering a single file is given up."""
+    timeout = get_gio_settings().get_int("discovery-timeout")
+    # gstreamer only accepts timeouts between 1 second and 1 hour
+    if timeout <= 0:
+        return 3600
+    return min(max(timeout, 1), 3600)
+
+
+def get_gst_tags(needed_tags):
+    """Get the names of the gstreamer tags that provide the needed tags.
+
+    Returns None if all tags are needed.
+    """
+    if needed_tags is None:
+        return None
+    gst_tags = set(needed_tags)
+    if "year" in gst_tags or "date" in gst_tags:
+        # both are taken from the datetime
+        gst_tags.add("datetime")
+    return tuple(sorted(gst_tags))
+
+
 def is_denylisted(sound_file):
     """Check the file against the denylist."""
     for file_pattern in filename_denylist:
@@ -71,6 +109,135 @@ def is_denylisted(sound_file):
     return False
 
 
+class DiscoveryWork:
+    """SoundFiles to discover, shared by the threads of multiple Discoverers.
+
+    Threads take one file at a time, so that a thread that got stuck on a
+    few slow files doesn't hold up the rest of the files.
+    """
+
+    def __init__(self, sound_files):
+        self.pending = SimpleQueue()
+        for sound_file in sound_files:
+            self.pending.put(sound_file)
+        self.total = len(sound_files)
+        # the DiscovererThreads that work on it
+        self.threads = []
+
+    def __iter__(self):
+        """Take files until none are left. Safe to use from many threads."""
+        while True:
+            try:
+                yield self.pending.get_nowait()
+            except Empty:
+                return
+
+    @property
+    def discovered(self):
+        """How many files all threads together analysed so far."""
+        return sum(thread.analysed for thread in self.threads)
+
+
+class DiscoveryProcess:
+    """Worker process that discovers files for a single DiscovererThread.
+
+    See soundconverter/gstreamer/discoveryworker.py for the protocol.
+    """
+
+    # how much longer than the discovery timeout the worker may take for a
+    # file until it is considered to be stuck
+    grace_period = 10
+
+    def __init__(self, timeout, prefilter=None, needed_tags=None):
+        """Start a new worker process.
+
+        Parameters
+        ----------
+        timeout : int
+            Seconds after which discovering a single file is given up
+        prefilter : Prefilter
+            If set, the worker uses the same ignored extensions
+        needed_tags : set
+            If set, only those tags are read
+        """
+        env = os.environ.copy()
+        # make sure the worker finds the same soundconverter package
+        env["PYTHONPATH"] = os.pathsep.join(path for path in sys.path if path)
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "soundconverter.gstreamer.discoveryworker"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+        )
+        self.reader = LineReader(self.process.stdout.fileno())
+        self.messages = []
+        self.max_duration = timeout + self.grace_period
+        self.send(
+            "config",
+            timeout,
+            None if prefilter is None else sorted(prefilter.ignored_extensions),
+            None if needed_tags is None else sorted(needed_tags),
+        )
+
+    def send(self, *message):
+        """Send a request to the worker. Returns False if it is gone."""
+        try:
+            self.process.stdin.write(encode_message(*message))
+            self.process.stdin.flush()
+            return True
+        except (BrokenPipeError, OSError):
+            return False
+
+    def discover(self, sound_file):
+        """Fill readable, tags, duration and codec of the SoundFile.
+
+        Returns whether the result can be cached, or None if the worker
+        crashed or didn't answer in time, in which case it should be killed.
+        """
+        if not self.send("discover", sound_file.uri):
+            return None
+
+        deadline = time.monotonic() + self.max_duration
+        while not self.messages:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if not select.select([self.reader.fd], [], [], remaining)[0]:
+                return None
+            messages = self.reader.read()
+            if messages is None:
+                return None
+            self.messages += messages
+
+        _, readable, duration, codec, tags, cacheable = self.messages.pop(0)
+        sound_file.readable = readable
+        sound_file.duration = duration
+        sound_file.codec = codec
+        sound_file.tags.update(tags)
+        return cacheable
+
+    def stop(self):
+        """Ask the worker to quit and wait for it."""
+        self.send("quit")
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+
+    def kill(self):
+        """Stop the worker immediately."""
+        self.process.kill()
+        self.process.wait()
+        for pipe in (self.process.stdin, self.process.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+
 class DiscovererThread(Thread):
     """Discover if multiple SoundFiles can be read and their tags."""
 
@@ -84,29 +251,59 @@ class DiscovererThread(Thread):
     # Threads with a drastic ~5-times performance increase for ~360
     # files.
     # I couldn't get it to work with the multiprocessing module though,
-    # because the discover_uri function would hang.
+    # because the discover_uri function would hang. That happens in forked
+    # processes of a parent that already used gstreamer. With
+    # settings["discovery-processes"] each thread hands its files to a
+    # freshly started python process instead, see DiscoveryProcess.
 
-    def __init__(self, sound_files, bus):
+    def __init__(self, sound_files, on_finished, needed_tags=None):
         super().__init__()
         self.sound_files = sound_files
-        self.bus = bus
+        self.on_finished = on_finished
+        # Only written by this thread and read by the main loop whenever it
+        # wants to display the progress. Posting a message to the main loop
+        # for each file was expensive when adding many thousands of files.
+        self.analysed = 0
+        self.needed_tags = needed_tags
+        self.gst_tags = get_gst_tags(needed_tags)
+        # read in advance, because the gio settings belong to the main thread
+        self.timeout = get_discovery_timeout()
+        # created lazily in the thread itself and used for all of its files
+        self.discoverer = None
+        self.cache = get_metadata_cache()
+        self.prefilter = get_prefilter()
+        self.use_processes = settings.get("discovery-processes", False)
+        self.process = None
+
+    def _get_discoverer(self):
+        """Get the GstPbutils.Discoverer of this thread."""
+        if self.discoverer is None:
+            self.discoverer = GstPbutils.Discoverer.new(self.timeout * Gst.SECOND)
+        return self.discoverer
+
+    def _timed_out(self, sound_file):
+        logger.info(
+            f"discovery timed out after {self.timeout} s: "
+            f"'{sound_file.filename_for_display}'"
+        )
+        sound_file.readable = False
+        # it might still be busy with the file, start over with a new one
+        self.discoverer = None
 
     def run(self):
         """Run the Thread."""
         for sound_file in self.sound_files:
             self._analyse_file(sound_file)
+            self.analysed += 1
 
-            msg_type = Gst.MessageType(Gst.MessageType.PROGRESS)
-            msg = Gst.Message.new_custom(msg_type, None, None)
-            self.bus.post(msg)
-
-        msg_type = Gst.MessageType(Gst.MessageType.EOS)
-        msg = Gst.Message.new_custom(msg_type, None, None)
-        self.bus.post(msg)
+        self._stop_process()
+        # the only time the main loop is notified
+        GLib.idle_add(self.on_finished)
 
     def _analyse_file(self, sound_file):
         """Figure out readable, tags and duration properties."""
-        sound_file.readable = True
+        # until proven otherwise
+        sound_file.readable = False
 
         denylisted_pattern = is_denylisted(sound_file)
         if denylisted_pattern:
@@ -115,32 +312,103 @@ class DiscovererThread(Thread):
             )
             return
 
+        if self.cache is not None and self.cache.load(sound_file, self.needed_tags):
+            return
+
+        if self.use_processes:
+            cacheable = self._analyse_in_process(sound_file)
+        else:
+            cacheable = self.analyse_uncached(sound_file)
+        if cacheable and self.cache is not None:
+            self.cache.store(sound_file, self.needed_tags)
+
+    def analyse_uncached(self, sound_file):
+        """Figure out readable, tags and duration without asking the cache.
+
+        Returns False if it failed for reasons that might go away, like
+        timeouts, so that the result should not be cached.
+        """
+        if self.prefilter is not None:
+            reason = self.prefilter.check(sound_file)
+            if reason is not None:
+                logger.info(
+                    f"not an audiofile ({reason}): {sound_file.filename_for_display}",
+                )
+                return False
+
+        # Common formats can be read a lot faster without gstreamer. It only
+        # knows the tags that filenames are made of though, so gstreamer has
+        # to look at files of which all tags are needed.
+        if self.needed_tags is not None and read_header(sound_file, self.needed_tags):
+            return True
+        return self._discover(sound_file)
+
+    def _analyse_in_process(self, sound_file):
+        """Like analyse_uncached, but in the DiscoveryProcess of this thread."""
+        if self.process is None:
+            self.process = DiscoveryProcess(
+                self.timeout, self.prefilter, self.needed_tags
+            )
+
+        cacheable = self.process.discover(sound_file)
+        if cacheable is None:
+            logger.error(
+                "discovery process crashed or got stuck: "
+                f"'{sound_file.filename_for_display}'"
+            )
+            self.process.kill()
+            self.process = None
+            sound_file.readable = False
+            return False
+
+        return cacheable
+
+    def _stop_process(self):
+        if self.process is not None:
+            self.process.stop()
+            self.process = None
+
+    def _discover(self, sound_file):
+        """Ask gstreamer about the file.
+
+        Returns False if it failed for reasons that might go away, like
+        timeouts.
+        """
+        start = time.monotonic()
         try:
-            discoverer = GstPbutils.Discoverer()
+            discoverer = self._get_discoverer()
             info = discoverer.discover_uri(sound_file.uri)
             if info is None:
                 logger.info(f"Non-readable file: '{sound_file.filename_for_display}'")
                 # Non-supported file
-                return
+                return True
+
+            if info.get_result() == GstPbutils.DiscovererResult.TIMEOUT:
+                self._timed_out(sound_file)
+                return False
 
             audio_streams = info.get_audio_streams()
             if not audio_streams:
                 # no audio streams available, not an audio file
-                return
+                return True
 
             # whatever anybody might ever need from it, here it is:
             sound_file.info = info
 
+            caps = audio_streams[0].get_caps()
+            if caps is not None and caps.get_size() > 0:
+                sound_file.codec = caps.get_structure(0).get_name()
+
             # Read root tags
             taglist = info.get_tags()
             if taglist:
-                taglist.foreach(lambda *args: self._add_tag(*args, sound_file))
+                self._read_tags(taglist, sound_file)
 
             for audio_stream in audio_streams:
                 # Read tags for each audio stream
                 taglist = audio_stream.get_tags()
                 if taglist:
-                    taglist.foreach(lambda *args: self._add_tag(*args, sound_file))
+                    self._read_tags(taglist, sound_file)
 
             filename = sound_file.filename_for_display
             logger.debug(f"found tag: {filename}")
@@ -150,7 +418,7 @@ class DiscovererThread(Thread):
             duration = info.get_duration() / Gst.SECOND
             if duration == 0:
                 # might be an image
-                return
+                return True
 
             # since threads share memory, this doesn't have to be sent
             # over a bus or queue, but rather can be written into the
@@ -158,11 +426,28 @@ class DiscovererThread(Thread):
             sound_file.duration = duration
 
             sound_file.readable = True
+            return True
         except Exception as error:
+            # the synchronous discover_uri reports timeouts as a generic error
+            if time.monotonic() - start >= self.timeout:
+                self._timed_out(sound_file)
+                return False
             # print("##### ", error)
             logger.error(str(error))
             # if not isinstance(error, GLib.Error):
             #     logger.error(str(error))
+            return False
+
+    def _read_tags(self, taglist, sound_file):
+        """Add the tags of a Gst.TagList to the SoundFile."""
+        if self.gst_tags is None:
+            taglist.foreach(lambda *args: self._add_tag(*args, sound_file))
+            return
+
+        # only look up what is needed instead of converting everything
+        for tag in self.gst_tags:
+            if taglist.get_tag_size(tag) > 0:
+                self._add_tag(taglist, tag, sound_file)
 
     def _add_tag(self, taglist, tag, sound_file):
         """Convert the taglist to a dict one by one."""
@@ -180,26 +465,145 @@ class DiscovererThread(Thread):
             sound_file.tags["date"] = date_time.to_iso8601_string()[:10]
 
 
+class StreamingDiscovererThread(DiscovererThread):
+    """Discover SoundFiles from a queue until it yields None."""
+
+    def __init__(self, pending, discovered, needed_tags=None):
+        super().__init__([], None, needed_tags)
+        self.pending = pending
+        self.discovered = discovered
+        # don't keep soundconverter alive when it is supposed to exit
+        self.daemon = True
+
+    def run(self):
+        """Run the Thread."""
+        while True:
+            sound_file = self.pending.get()
+            if sound_file is None:
+                break
+            self._analyse_file(sound_file)
+            self.discovered.put(sound_file)
+
+        self._stop_process()
+        # tell the consumer that this thread is done
+        self.discovered.put(None)
+
+
+class DiscoveryStream:
+    """Discover SoundFiles while they are still being produced.
+
+    The SoundFiles are taken from an iterable, for example a generator that
+    walks over directories, in a separate thread and are then discovered in
+    get_num_jobs() threads. Both steps go through bounded queues, so that
+    no matter how many files the iterable yields, only a few are held in
+    memory until they are collected with get_discovered.
+    """
+
+    def __init__(self, sound_files, maxsize=100, needed_tags=None):
+        """Create a new DiscoveryStream.
+
+        Parameters
+        ----------
+        sound_files : iterable
+            Yields the SoundFiles that should be discovered
+        maxsize : int
+            How many SoundFiles may wait for being discovered and for being
+            collected respectively
+        needed_tags : set
+            If set, only those tags are read, for example the ones that
+            TargetNameGenerator.get_needed_tags returns. All of them
+            otherwise.
+        """
+        self.sound_files = sound_files
+        self.needed_tags = needed_tags
+        self.pending = Queue(maxsize)
+        self.discovered = Queue(maxsize)
+        self.num_threads = 0
+        self.running_threads = 0
+        self.finished = False
+
+    def start(self):
+        """Start iterating and discovering in the background."""
+        self.num_threads = get_num_jobs()
+        self.running_threads = self.num_threads
+        Thread(target=self._produce, daemon=True).start()
+        for _ in range(self.num_threads):
+            StreamingDiscovererThread(
+                self.pending, self.discovered, self.needed_tags
+            ).start()
+
+    def _produce(self):
+        try:
+            for sound_file in self.sound_files:
+                self.pending.put(sound_file)
+        finally:
+            # one stop signal for each discoverer thread, even if the
+            # iterable failed, so that the stream can finish
+            for _ in range(self.num_threads):
+                self.pending.put(None)
+
+    def get_discovered(self, limit):
+        """Collect up to limit discovered SoundFiles without blocking.
+
+        Once all SoundFiles are discovered and collected, the finished
+        attribute becomes True.
+        """
+        sound_files = []
+        while len(sound_files) < limit and not self.finished:
+            try:
+                sound_file = self.discovered.get_nowait()
+            except Empty:
+                break
+
+            if sound_file is None:
+                self.running_threads -= 1
+                self.finished = self.running_threads == 0
+                continue
+
+            sound_files.append(sound_file)
+
+        return sound_files
+
+
 class Discoverer(Task):
     """Find type and tags of a SoundFile if possible."""
 
-    def __init__(self, sound_files):
-        """Find type and tags of a SoundFile if possible."""
+    def __init__(self, sound_files, work=None):
+        """Find type and tags of a SoundFile if possible.
+
+        Parameters
+        ----------
+        sound_files : SoundFile[]
+            The files this task is responsible for
+        work : DiscoveryWork
+            If set, this task helps with discovering all the files of
+            the DiscoveryWork instead of only its own sound_files. See
+            add_discoverers.
+        """
         self.sound_files = sound_files
+        self.work = work or DiscoveryWork(sound_files)
         self.error = None
         self.running = False
         self.callback = lambda: None
-        self.discovered = 0
         self.queue = None
 
-        self.bus = None
         self.thread = None
 
         super().__init__()
 
+    @property
+    def discovered(self):
+        """How many files the thread of this task analysed so far."""
+        if self.thread is None:
+            return 0
+        return self.thread.analysed
+
     def get_progress(self):
         """Fraction of how much of the task is completed."""
-        return self.discovered / len(self.sound_files), 1
+        # all Discoverers that share the work are equally far
+        if self.work.total == 0:
+            return 1, 1
+        return self.work.discovered / self.work.total, 1
 
     def cancel(self):
         """Cancel execution of the task."""
@@ -216,18 +620,14 @@ class Discoverer(Task):
 
     def run(self):
         self.running = True
-        bus = Gst.Bus()
-        bus.connect("message", self._on_message)
-        bus.add_signal_watch()
-        thread = DiscovererThread(self.sound_files, bus)
-        thread.start()
-        self.bus = bus
+        thread = DiscovererThread(self.work, self._on_finished)
+        self.work.threads.append(thread)
         self.thread = thread
+        thread.start()
 
-    def _on_message(self, _, message):
+    def _on_finished(self):
         """Write down that it is finished and call the callback."""
-        if message.type == Gst.MessageType.EOS:
-            self.running = False
-            self.done()
-        else:
-            self.discovered += 1
+        self.running = False
+        self.done()
+        # don't call again
+        return False
@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+"""Process that discovers files on behalf of a DiscovererThread.
+
+Started with `python3 -m soundconverter.gstreamer.discoveryworker`. Like
+soundconverter/gstreamer/worker.py it talks over stdin and stdout, one json
+encoded list per line.
+
+Requests read from stdin:
+ - ["config", timeout, ignored_extensions, needed_tags]: has to be sent
+   first. ignored_extensions is null if files should not be prefiltered,
+   needed_tags is null if all tags should be read.
+ - ["discover", uri]
+ - ["quit"]
+
+Messages written to stdout, one for each "discover" request:
+ - ["result", readable, duration, codec, tags, cacheable]
+
+The worker is a fresh python process that initializes gstreamer itself.
+Forking a process that already used gstreamer, which is what the
+multiprocessing module does by default on linux, can make discover_uri
+hang forever.
+"""
+
+import signal
+import sys
+
+import gi
+
+gi.require_version("Gst", "1.0")
+gi.require_version("GstPbutils", "1.0")
+from gi.repository import Gio, Gst  # noqa: E402
+
+from soundconverter.gstreamer.discoverer import DiscovererThread  # noqa: E402
+from soundconverter.gstreamer.worker import LineReader, encode_message  # noqa: E402
+from soundconverter.util.metadatacache import BYPASS  # noqa: E402
+from soundconverter.util.settings import set_gio_settings, settings  # noqa: E402
+from soundconverter.util.soundfile import SoundFile  # noqa: E402
+
+
+def configure(timeout, ignored_extensions, needed_tags):
+    """Create the DiscovererThread that is used for all files.
+
+    The settings of the parent process are used instead of the ones
+    stored in dconf.
+    """
+    backend = Gio.memory_settings_backend_new()
+    gio_settings = Gio.Settings.new_with_backend("org.soundconverter", backend)
+    set_gio_settings(gio_settings)
+    gio_settings.set_int("discovery-timeout", timeout)
+    gio_settings.set_boolean("prefilter", ignored_extensions is not None)
+    if ignored_extensions is not None:
+        gio_settings.set_strv("ignored-extensions", ignored_extensions)
+    # the parent takes care of the cache
+    settings["metadata-cache"] = BYPASS
+
+    if needed_tags is not None:
+        needed_tags = set(needed_tags)
+    # never started, its methods are just called directly
+    return DiscovererThread([], None, needed_tags)
+
+
+def discover(analyser, uri):
+    """Discover a single file and return the message for the parent."""
+    sound_file = SoundFile(uri)
+    cacheable = analyser.analyse_uncached(sound_file)
+    return (
+        "result",
+        sound_file.readable,
+        sound_file.duration,
+        sound_file.codec,
+        sound_file.tags,
+        cacheable,
+    )
+
+
+def worker_main():
+    # the parent decides when to stop, a ctrl+c on the terminal is sent to
+    # the whole process group though.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    Gst.init(None)
+
+    reader = LineReader(sys.stdin.fileno())
+    analyser = None
+    while True:
+        messages = reader.read()
+        if messages is None:
+            # the parent went away
+            return
+
+        for message in messages:
+            request = message[0]
+            if request == "quit":
+                return
+            if request == "config":
+                analyser = configure(*message[1:])
+            elif request == "discover":
+                sys.stdout.buffer.write(encode_message(*discover(analyser, message[1])))
+                sys.stdout.buffer.flush()
+
+
+if __name__ == "__main__":
+    worker_main()
@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+"""Pick the elements that read and write the files of a pipeline.
+
+giosrc and giosink support every location that gio can open, but for local
+files they add the overhead of gio and read in small blocks. Local files
+are read with filesrc and written with filesink in larger blocks instead.
+"""
+
+from soundconverter.util.fileoperations import (
+    split_uri,
+    unquote_filename,
+    vfs_encode_filename,
+)
+from soundconverter.util.settings import settings
+
+GIO_SOURCE = "giosrc"
+GIO_SINK = "giosink"
+
+# bytes read or written at once for local files, can be changed with
+# --block-size. 0 uses gio for local files as well.
+DEFAULT_BLOCK_SIZE = 256 * 1024
+
+
+def get_block_size():
+    """Return how many bytes are read or written at once, see --block-size."""
+    block_size = settings.get("block-size")
+    if block_size is None:
+        return DEFAULT_BLOCK_SIZE
+    return block_size
+
+
+def get_local_path(uri):
+    """Get the path of a file on this machine, or None if it isn't local.
+
+    Parameters
+    ----------
+    uri : string
+        For example "file:///home/user/a%20b.flac"
+    """
+    scheme, path = split_uri(uri)
+    if scheme != "file://":
+        # other schemes, or a host in the authority
+        return None
+    return unquote_filename(path)
+
+
+def _get_element(uri, gio_element, local_element):
+    """Get the element description and its location property for the uri."""
+    uri = vfs_encode_filename(uri)
+    block_size = get_block_size()
+    path = get_local_path(uri)
+    if block_size <= 0 or path is None:
+        return gio_element, uri
+    return local_element.format(block_size), path
+
+
+def get_source(uri):
+    """Get the element that reads the uri and the location to set on it.
+
+    Returns a tuple of the element with its properties, for example
+    "filesrc blocksize=262144", and the location, which is a path for local
+    files and an uri otherwise.
+    """
+    return _get_element(uri, GIO_SOURCE, "filesrc blocksize={}")
+
+
+def get_sink(uri):
+    """Get the element that writes the uri and the location to set on it.
+
+    See get_source.
+    """
+    return _get_element(
+        uri,
+        GIO_SINK,
+        "filesink buffer-mode=full buffer-size={}",
+    )
+
+
+def quote_location(location):
+    """Quote a location for a pipeline string of Gst.parse_launch."""
+    escaped = location.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+"""Keep pipelines around and use them for the next file.
+
+For short files, creating and destroying a pipeline with all its encoder
+elements can take longer than the conversion itself. A ReusablePipeline
+is created once for the output settings, only the locations of its source
+and sink change between files.
+"""
+
+from gi.repository import Gst
+
+
+def make_template(source, chain, sink):
+    """Create the pipeline string of a ReusablePipeline.
+
+    Parameters
+    ----------
+    source : string
+        Name of the source element, for example "giosrc"
+    chain : string[]
+        Elements after the decoder, for example ["audioconvert", "flacenc"].
+        The first one has to be a single element, the others may consist
+        of multiple elements.
+    sink : string
+        Name of the sink element, for example "giosink"
+    """
+    # decodebin is linked to the head in ReusablePipeline._on_pad_added
+    # instead of by parse_launch, because parse_launch only does that once
+    return (
+        f"{source} name=src ! decodebin name=decoder "
+        f"{chain[0]} name=head ! {' ! '.join([*chain[1:], sink])} name=sink"
+    )
+
+
+class ReusablePipeline:
+    """A pipeline that can convert one file after another."""
+
+    def __init__(self, template):
+        """Create the pipeline.
+
+        Raises a GLib.Error if the template is invalid.
+
+        Parameters
+        ----------
+        template : string
+            See make_template
+        """
+        self.template = template
+        self.pipeline = Gst.parse_launch(template)
+        self.source = self.pipeline.get_by_name("src")
+        self.sink = self.pipeline.get_by_name("sink")
+        self.head = self.pipeline.get_by_name("head").get_static_pad("sink")
+        decoder = self.pipeline.get_by_name("decoder")
+        decoder.connect("pad-added", self._on_pad_added)
+        self.pipeline.get_bus().add_signal_watch()
+
+    def _on_pad_added(self, _, pad):
+        """Link the first audio pad of the decoder, like parse_launch would."""
+        if self.head.is_linked():
+            return
+        caps = pad.get_current_caps() or pad.query_caps(None)
+        if caps.is_empty() or not caps.get_structure(0).get_name().startswith("audio/"):
+            return
+        pad.link(self.head)
+
+    def start(self, source_uri, sink_uri):
+        """Convert source_uri into sink_uri."""
+        self.source.set_property("location", source_uri)
+        self.sink.set_property("location", sink_uri)
+        self.pipeline.set_state(Gst.State.PLAYING)
+
+    def reset(self):
+        """Stop the pipeline, so that it can start with the next file.
+
+        In the NULL state the decoder forgets its elements and the encoder
+        and sink forget about the previous file.
+        """
+        self.pipeline.set_state(Gst.State.NULL)
+
+    def destroy(self):
+        """Stop the pipeline for good."""
+        self.pipeline.get_bus().remove_signal_watch()
+        self.pipeline.set_state(Gst.State.NULL)
+
+
+class PipelinePool:
+    """Idle ReusablePipelines of the current output settings.
+
+    New pipelines are only created when none are idle, so there are never
+    more of them than conversions were running at the same time.
+    """
+
+    def __init__(self):
+        self.idle = []
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, template):
+        """Get an idle pipeline for the template, or create a new one.
+
+        Raises a GLib.Error if the template is invalid.
+        """
+        for pipeline in self.idle:
+            if pipeline.template == template:
+                self.idle.remove(pipeline)
+                self.reused += 1
+                return pipeline
+
+        # the output settings changed, the other pipelines are not going
+        # to be needed anymore
+        for pipeline in self.idle:
+            pipeline.destroy()
+        self.idle = []
+
+        self.created += 1
+        return ReusablePipeline(template)
+
+    def release(self, pipeline, reuse=True):
+        """Put the pipeline back after the conversion is done.
+
+        Parameters
+        ----------
+        pipeline : ReusablePipeline
+        reuse : bool
+            False if it failed, then it is not used again
+        """
+        if not reuse:
+            pipeline.destroy()
+            return
+        pipeline.reset()
+        self.idle.append(pipeline)
+
+    def clear(self):
+        """Destroy all idle pipelines."""
+        for pipeline in self.idle:
+            pipeline.destroy()
+        self.idle = []
+
+
+_pipeline_pool = None
+
+
+def get_pipeline_pool():
+    """Return the PipelinePool, which is created on first use."""
+    global _pipeline_pool
+    if _pipeline_pool is None:
+        _pipeline_pool = PipelinePool()
+    return _pipeline_pool
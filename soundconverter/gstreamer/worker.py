@@ -0,0 +1,228 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+"""Process that runs gstreamer pipelines on behalf of the WorkerPool.
+
+Started with `python3 -m soundconverter.gstreamer.worker`. It talks to the
+WorkerPool over stdin and stdout, one json encoded list per line.
+
+Requests read from stdin:
+ - ["run", job, command]: launch the pipeline string command
+ - ["run-reused", job, template, source, sink]: convert source into sink
+   in the pipeline that the worker keeps for the template, see
+   soundconverter/gstreamer/pipelinepool.py
+ - ["pause", job], ["resume", job], ["cancel", job]
+ - ["quit"]
+
+Messages written to stdout:
+ - ["progress", job, seconds]: the position of the running pipeline
+ - ["eos", job]: the pipeline is done
+ - ["error", job, message]: the pipeline failed
+
+job is a number that the pool increments for every pipeline, so that it can
+tell late messages of a cancelled pipeline apart from those of the next one.
+"""
+
+import json
+import os
+import signal
+import sys
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import GLib, Gst  # noqa: E402
+
+from soundconverter.gstreamer.pipelinepool import ReusablePipeline  # noqa: E402
+
+# how often to report the position of the pipeline, in milliseconds
+PROGRESS_INTERVAL = 200
+
+
+def encode_message(*message):
+    """Serialize a message to a line for the worker pipes."""
+    return (json.dumps(message) + "\n").encode()
+
+
+class LineReader:
+    """Split non-blocking reads from a file descriptor into lines."""
+
+    def __init__(self, fd):
+        self.fd = fd
+        self._buffer = b""
+
+    def read(self):
+        """Return a list of complete messages, or None when the pipe closed."""
+        data = os.read(self.fd, 65536)
+        if not data:
+            return None
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b"\n")
+        return [json.loads(line) for line in lines if line]
+
+
+class Worker:
+    """Run one pipeline at a time as requested over stdin."""
+
+    def __init__(self):
+        self.loop = GLib.MainLoop()
+        self.reader = LineReader(sys.stdin.fileno())
+        self.pipeline = None
+        # kept for the next "run-reused" request with the same template
+        self.reusable = None
+        self.job = None
+        self.last_position = None
+
+    def send(self, *message):
+        sys.stdout.buffer.write(encode_message(*message))
+        sys.stdout.buffer.flush()
+
+    def run(self):
+        GLib.io_add_watch(
+            self.reader.fd,
+            GLib.PRIORITY_DEFAULT,
+            GLib.IOCondition.IN | GLib.IOCondition.HUP,
+            self._on_input,
+        )
+        GLib.timeout_add(PROGRESS_INTERVAL, self._send_progress)
+        self.loop.run()
+
+    def _on_input(self, fd, condition):
+        messages = self.reader.read()
+        if messages is None:
+            # the pool went away
+            self._stop()
+            self.loop.quit()
+            return False
+
+        for message in messages:
+            request = message[0]
+            if request == "quit":
+                self._stop()
+                self._destroy_reusable()
+                self.loop.quit()
+                return False
+            if request == "run":
+                self._start(message[1], message[2])
+            elif request == "run-reused":
+                self._start_reused(*message[1:])
+            elif message[1] != self.job or self.pipeline is None:
+                # outdated request for a previous pipeline
+                continue
+            elif request == "pause":
+                self.pipeline.set_state(Gst.State.PAUSED)
+            elif request == "resume":
+                self.pipeline.set_state(Gst.State.PLAYING)
+            elif request == "cancel":
+                self._stop()
+
+        return True
+
+    def _start(self, job, command):
+        self._stop()
+        self.job = job
+        self.last_position = None
+        try:
+            self.pipeline = Gst.parse_launch(command)
+        except GLib.Error as error:
+            self.send(
+                "error", job, f"gstreamer error when creating pipeline: {str(error)}"
+            )
+            return
+
+        bus = self.pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.connect("message", self._on_message)
+        self.pipeline.set_state(Gst.State.PLAYING)
+
+    def _start_reused(self, job, template, source_uri, sink_uri):
+        self._stop()
+        self.job = job
+        self.last_position = None
+        if self.reusable is not None and self.reusable.template != template:
+            self._destroy_reusable()
+        if self.reusable is None:
+            try:
+                self.reusable = ReusablePipeline(template)
+            except GLib.Error as error:
+                self.send(
+                    "error",
+                    job,
+                    f"gstreamer error when creating pipeline: {str(error)}",
+                )
+                return
+            self.reusable.pipeline.get_bus().connect("message", self._on_message)
+
+        self.pipeline = self.reusable.pipeline
+        self.reusable.start(source_uri, sink_uri)
+
+    def _destroy_reusable(self):
+        if self.reusable is None:
+            return
+        if self.pipeline is self.reusable.pipeline:
+            self.pipeline = None
+        self.reusable.destroy()
+        self.reusable = None
+
+    def _stop(self):
+        if self.pipeline is None:
+            return
+        if self.reusable is not None and self.pipeline is self.reusable.pipeline:
+            # ready for the next file
+            self.reusable.reset()
+            self.pipeline = None
+            return
+        bus = self.pipeline.get_bus()
+        bus.remove_signal_watch()
+        self.pipeline.set_state(Gst.State.NULL)
+        self.pipeline = None
+
+    def _send_progress(self):
+        if self.pipeline is not None:
+            position = self.pipeline.query_position(Gst.Format.TIME)[1]
+            position = max(0, position / Gst.SECOND)
+            if position != self.last_position:
+                self.last_position = position
+                self.send("progress", self.job, position)
+        return True
+
+    def _on_message(self, _, message):
+        if message.type == Gst.MessageType.ERROR:
+            error, __ = message.parse_error()
+            self._stop()
+            # it might be broken now
+            self._destroy_reusable()
+            self.send("error", self.job, str(error))
+        elif message.type == Gst.MessageType.EOS:
+            self._stop()
+            self.send("eos", self.job)
+
+
+def worker_main():
+    # the pool decides when to stop, a ctrl+c on the terminal is sent to the
+    # whole process group though.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    Gst.init(None)
+    Worker().run()
+
+
+if __name__ == "__main__":
+    worker_main()
@@ -0,0 +1,204 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+"""Run gstreamer pipelines in a pool of long-lived worker processes.
+
+A crashing gstreamer plugin only takes its own worker down, and the bus
+messages of the pipelines don't all have to go through the main loop of
+soundconverter. See soundconverter/gstreamer/worker.py for the protocol.
+"""
+
+import atexit
+import os
+import subprocess
+import sys
+
+from gi.repository import GLib
+
+from soundconverter.gstreamer.worker import LineReader, encode_message
+from soundconverter.util.logger import logger
+
+
+class WorkerProcess:
+    """Handle of a single worker process, owned by the WorkerPool."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        # the converter whose pipeline is currently running in this process
+        self.converter = None
+        self.job = None
+
+        env = os.environ.copy()
+        # make sure the worker finds the same soundconverter package
+        env["PYTHONPATH"] = os.pathsep.join(path for path in sys.path if path)
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "soundconverter.gstreamer.worker"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+        )
+        self.reader = LineReader(self.process.stdout.fileno())
+        self.watch_id = GLib.io_add_watch(
+            self.reader.fd,
+            GLib.PRIORITY_DEFAULT,
+            GLib.IOCondition.IN | GLib.IOCondition.HUP,
+            self._on_output,
+        )
+        logger.debug(f"started worker process {self.process.pid}")
+
+    def send(self, *message):
+        """Send a request to the worker. Returns False if it is gone."""
+        try:
+            self.process.stdin.write(encode_message(*message))
+            self.process.stdin.flush()
+            return True
+        except (BrokenPipeError, OSError):
+            return False
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def _on_output(self, fd, condition):
+        messages = self.reader.read()
+        if messages is None:
+            self.pool.worker_died(self)
+            return False
+
+        for message in messages:
+            kind, job = message[0], message[1]
+            if job != self.job or self.converter is None:
+                # leftovers of a cancelled pipeline
+                continue
+            converter = self.converter
+            if kind == "progress":
+                converter.worker_position = message[2]
+            elif kind == "eos":
+                converter.on_worker_eos()
+            elif kind == "error":
+                converter.on_worker_error(message[2])
+
+        return True
+
+    def stop(self):
+        """Ask the worker to quit and wait for it."""
+        GLib.source_remove(self.watch_id)
+        self.send("quit")
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+class WorkerPool:
+    """Processes that run the pipelines of Converters.
+
+    Workers are started when needed and kept around for the next pipeline,
+    so there are as many of them as there were Converters running at the
+    same time. A crashed worker fails the Converter that was running in it
+    and is replaced by a new process for the next one.
+    """
+
+    def __init__(self):
+        self.idle = []
+        self.busy = []
+        self._next_job = 0
+
+    def run(self, converter, command):
+        """Launch the pipeline string command for the converter."""
+        worker = self._assign(converter)
+        if not worker.send("run", worker.job, command):
+            self.worker_died(worker)
+
+    def run_reused(self, converter, template, source_uri, sink_uri):
+        """Convert in the pipeline of the worker that is kept for the template.
+
+        See soundconverter/gstreamer/pipelinepool.py
+        """
+        worker = self._assign(converter)
+        if not worker.send("run-reused", worker.job, template, source_uri, sink_uri):
+            self.worker_died(worker)
+
+    def _assign(self, converter):
+        """Get a worker for the converter and start a new job in it."""
+        worker = self.idle.pop() if self.idle else WorkerProcess(self)
+        self.busy.append(worker)
+        self._next_job += 1
+        worker.job = self._next_job
+        worker.converter = converter
+        converter.worker = worker
+        converter.worker_position = 0
+        return worker
+
+    def pause(self, converter):
+        converter.worker.send("pause", converter.worker.job)
+
+    def resume(self, converter):
+        converter.worker.send("resume", converter.worker.job)
+
+    def release(self, converter):
+        """Stop the pipeline of the converter if needed and free its worker."""
+        worker = converter.worker
+        converter.worker = None
+        if worker is None or worker.converter is not converter:
+            return
+        worker.send("cancel", worker.job)
+        worker.converter = None
+        worker.job = None
+        self.busy.remove(worker)
+        if worker.is_alive():
+            self.idle.append(worker)
+
+    def worker_died(self, worker):
+        """Fail the converter of a worker that went away unexpectedly."""
+        GLib.source_remove(worker.watch_id)
+        returncode = worker.process.wait()
+        logger.error(f"worker process {worker.process.pid} exited with {returncode}")
+        if worker in self.busy:
+            self.busy.remove(worker)
+        if worker in self.idle:
+            self.idle.remove(worker)
+        converter = worker.converter
+        worker.converter = None
+        if converter is not None:
+            converter.worker = None
+            converter.on_worker_error(
+                f"the worker process crashed with exit code {returncode}"
+            )
+
+    def shutdown(self):
+        """Stop all worker processes."""
+        for worker in self.idle + self.busy:
+            worker.stop()
+        self.idle = []
+        self.busy = []
+
+
+_worker_pool = None
+
+
+def get_worker_pool():
+    """Return the WorkerPool, which is created on first use."""
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = WorkerPool()
+        atexit.register(_worker_pool.shutdown)
+    return _worker_pool
@@ -22,13 +22,24 @@
 """Batch mode to run soundconverter in a console."""
 
 import os
+import time
 
 from gi.repository import Gio, GLib
 
-from soundconverter.gstreamer.converter import Converter
-from soundconverter.gstreamer.discoverer import add_discoverers, get_sound_files
+from soundconverter.gstreamer.converter import Converter, ExtraOutput
+from soundconverter.gstreamer.discoverer import (
+    DiscoveryStream,
+    add_discoverers,
+    get_sound_files,
+)
 from soundconverter.interface.preferences import rates
-from soundconverter.util.fileoperations import beautify_uri, filename_to_uri
+from soundconverter.interface.watch import CLIWatch
+from soundconverter.util.eta import EtaEstimator, SpeedHistory
+from soundconverter.util.fileoperations import (
+    beautify_uri,
+    filename_to_uri,
+    iter_walk,
+)
 from soundconverter.util.formats import (
     get_default_quality,
     get_mime_type,
@@ -36,11 +47,25 @@ from soundconverter.util.formats import (
     get_quality_setting_name,
 )
 from soundconverter.util.formatting import format_time
+from soundconverter.util.journal import Journal, get_journal_path
 from soundconverter.util.logger import logger
+from soundconverter.util.manifest import (
+    UNCHANGED,
+    Manifest,
+    get_manifest_path,
+    get_settings_fingerprint,
+)
+from soundconverter.util.metadatacache import flush_metadata_cache
 from soundconverter.util.namegenerator import TargetNameGenerator
-from soundconverter.util.settings import set_gio_settings, settings
+from soundconverter.util.plan import ConversionPlan, PlanStream
+from soundconverter.util.settings import (
+    get_gio_settings,
+    set_gio_settings,
+    settings,
+)
 from soundconverter.util.soundfile import SoundFile
 from soundconverter.util.taskqueue import TaskQueue
+from soundconverter.util.walkfilter import get_walk_filter, parse_size
 
 cli_convert = [None]
 
@@ -49,6 +74,10 @@ def batch_main(files):
     global cli_convert
     # works like a pointer, so that it can be accessed in tests,
     # just like in ui.py
+    if settings.get("watch"):
+        cli_convert[0] = CLIWatch(files)
+        cli_convert[0].run()
+        return
     cli_convert[0] = CLIConvert(files)
 
 
@@ -69,6 +98,12 @@ def use_memory_gsettings(options):
 
     gio_settings.set_boolean("delete-original", options.get("delete-original", False))
 
+    discovery_timeout = options.get("discovery-timeout")
+    if discovery_timeout is not None:
+        gio_settings.set_int("discovery-timeout", discovery_timeout)
+
+    gio_settings.set_boolean("prefilter", options.get("prefilter", True))
+
     if options.get("main") == "batch":
         # the number of jobs is only applied, when limit-jobs is true
         forced_jobs = options.get("forced-jobs", None)
@@ -78,6 +113,14 @@ def use_memory_gsettings(options):
         else:
             gio_settings.set_boolean("limit-jobs", False)
 
+        task_order = options.get("task-order")
+        gio_settings.set_string("task-order", task_order or TaskQueue.FIFO)
+
+        gio_settings.set_boolean(
+            "adaptive-jobs",
+            options.get("adaptive-jobs", False),
+        )
+
         format_option = options["format"]
         mime_type = get_mime_type(format_option)
 
@@ -106,20 +149,7 @@ def use_memory_gsettings(options):
             # the first name pattern is the filename itself
             gio_settings.set_int("name-pattern-index", 0)
 
-        quality_setting = options.get("quality")
-        if quality_setting is None:
-            quality_setting = get_default_quality(mime_type)
-
-        setting_name = get_quality_setting_name()
-        # here is the very long and incredible way to set a variable as gio
-        # settings value with the correct type as defined in the schema:
-        type_string = (
-            gio_settings.props.settings_schema.get_key(setting_name)
-            .get_value_type()
-            .dup_string()
-        )
-        variant = GLib.Variant(type_string, float(quality_setting))
-        gio_settings.set_value(setting_name, variant)
+        set_quality(gio_settings, options.get("quality"))
 
     else:
         # --tags and --check
@@ -132,6 +162,163 @@ def use_memory_gsettings(options):
         gio_settings.set_boolean("output-resample", True)
         gio_settings.set_int("resample-rate", resample)
 
+    # formats that are written in addition, from the same decoded audio
+    settings["extra-output-settings"] = [
+        create_extra_output_settings(gio_settings, spec)
+        for spec in options.get("extra-output") or []
+    ]
+
+
+def parse_extra_output(spec):
+    """Split the value of --extra-output.
+
+    Raises a ValueError if it is not valid.
+
+    Parameters
+    ----------
+    spec : string
+        FORMAT:QUALITY:PATH, for example "mp3:0:/music/mp3" or "opus::opus".
+        The quality may be empty for the default of the format.
+
+    Returns
+    -------
+    tuple of the mime type, the quality or None, and the output path
+    """
+    parts = spec.split(":", 2)
+    if len(parts) != 3:
+        raise ValueError(f'"{spec}" should look like FORMAT:QUALITY:PATH')
+    audio_format, quality, output_path = parts
+
+    mime_type = get_mime_type(audio_format)
+    if mime_type is None:
+        raise ValueError(
+            'cannot use "{}" format. Supported formats: {}'.format(
+                audio_format,
+                ", ".join(get_mime_type_mapping()),
+            ),
+        )
+
+    if quality == "":
+        quality = None
+    else:
+        try:
+            quality = float(quality)
+        except ValueError:
+            raise ValueError(f'"{quality}" is not a number') from None
+
+    if output_path == "":
+        raise ValueError(f'"{spec}" has no output path')
+
+    return mime_type, quality, output_path
+
+
+def validate_quality(mime_type, mode, quality):
+    """Check if the quality makes sense for the format.
+
+    Will log usage mistakes to the console.
+
+    Parameters
+    ----------
+    mime_type : string
+    mode : string
+        -m, one of abr, cbr or vbr for mp3
+    quality : float
+        -q, optional. Otherwise default quality values will be used
+    """
+    if quality is None:
+        return True
+
+    if mime_type == "audio/mpeg":
+        if mode in ["abr", "cbr"]:
+            if quality > 320 or quality < 64:
+                logger.error("mp3 cbr/abr bitrate should be between 64 and 320")
+                return False
+        else:
+            if quality > 9 or quality < 0:
+                logger.error(
+                    "mp3 vbr quality should be between 9 (low) and 0 (hight)",
+                )
+                return False
+
+    elif mime_type == "audio/x-vorbis":
+        if quality < 0 or quality > 1:
+            logger.error("ogg quality should be between 0.0 and 1.0")
+            return False
+
+    elif mime_type == "audio/x-m4a":
+        # supports arbitrary bitrates
+        # source: https://en.wikipedia.org/wiki/Advanced_Audio_Coding
+        # Our used encoder seems to cap somewhere between 400 and
+        # 440 kbps though
+        if quality < 0:
+            logger.error("m4a bitrate should be larger than 0")
+            return False
+
+    elif mime_type == "audio/x-flac":
+        if quality < 0 or quality > 8:
+            logger.error("flac compression strength should be between 0 and 8")
+            return False
+
+    elif mime_type == "audio/x-wav":
+        if quality not in [8, 16, 24, 32]:
+            logger.error("wav sample width has to be one of 8, 16, 24 or 32")
+            return False
+
+    elif mime_type == "audio/ogg; codecs=opus":
+        # source: https://wiki.hydrogenaud.io/index.php?title=Opus
+        if quality < 6 or quality > 510:
+            logger.error("opus bitrate should be between 6 and 510")
+            return False
+
+    return True
+
+
+def set_quality(gio_settings, quality_setting):
+    """Write the quality of the output-mime-type into the settings.
+
+    Parameters
+    ----------
+    gio_settings : Gio.Settings
+    quality_setting : float
+        -q, uses the default of the format if None
+    """
+    if quality_setting is None:
+        mime_type = gio_settings.get_string("output-mime-type")
+        quality_setting = get_default_quality(mime_type)
+
+    setting_name = get_quality_setting_name(gio_settings)
+    # here is the very long and incredible way to set a variable as gio
+    # settings value with the correct type as defined in the schema:
+    type_string = (
+        gio_settings.props.settings_schema.get_key(setting_name)
+        .get_value_type()
+        .dup_string()
+    )
+    variant = GLib.Variant(type_string, float(quality_setting))
+    gio_settings.set_value(setting_name, variant)
+
+
+def create_extra_output_settings(gio_settings, spec):
+    """Copy the settings and apply the format, quality and path of spec.
+
+    Parameters
+    ----------
+    gio_settings : Gio.Settings
+        The settings of the main output
+    spec : string
+        The value of --extra-output, see parse_extra_output
+    """
+    mime_type, quality, output_path = parse_extra_output(spec)
+    backend = Gio.memory_settings_backend_new()
+    extra_settings = Gio.Settings.new_with_backend("org.soundconverter", backend)
+    for key in gio_settings.props.settings_schema.list_keys():
+        extra_settings.set_value(key, gio_settings.get_value(key))
+
+    extra_settings.set_string("output-mime-type", mime_type)
+    extra_settings.set_string("selected-folder", filename_to_uri(output_path))
+    set_quality(extra_settings, quality)
+    return extra_settings
+
 
 def validate_args(options):
     """Check if required command line args are provided.
@@ -143,6 +330,55 @@ def validate_args(options):
         logger.error(f"unknown main {main}")
         return False
 
+    discovery_timeout = options.get("discovery-timeout")
+    if discovery_timeout is not None and discovery_timeout < 0:
+        logger.error("--discovery-timeout should not be negative")
+        return False
+
+    block_size = options.get("block-size")
+    if block_size is not None and block_size < 0:
+        logger.error("--block-size should not be negative")
+        return False
+
+    if options.get("watch") and (options.get("sync") or options.get("resume")):
+        logger.error("--watch can't be used together with --sync or --resume")
+        return False
+
+    planning = options.get("dry-run") or options.get("write-plan")
+    if options.get("watch") and planning:
+        logger.error("--watch can't be used together with --dry-run or --write-plan")
+        return False
+
+    if options.get("plan") and (
+        planning or options.get("watch") or options.get("sync") or options.get("resume")
+    ):
+        logger.error(
+            "--plan can't be used together with --dry-run, --write-plan, "
+            "--watch, --sync or --resume",
+        )
+        return False
+
+    if options.get("extra-output") and (planning or options.get("plan")):
+        # plans only contain the target of the main output
+        logger.error(
+            "--extra-output can't be used together with --dry-run, "
+            "--write-plan or --plan",
+        )
+        return False
+
+    if options.get("sync-delete") and not options.get("sync"):
+        logger.error("--sync-delete only works together with --sync")
+        return False
+
+    for option in ("min-size", "max-size"):
+        size = options.get(option)
+        if size is not None:
+            try:
+                parse_size(size)
+            except ValueError as error:
+                logger.error(f"--{option}: {error}")
+                return False
+
     if main not in ["gui", "check", "tags"]:
         # not needed for --check and --tags
         if not options.get("output-path"):
@@ -177,57 +413,32 @@ def validate_args(options):
             )
             return False
 
+        task_order = options.get("task-order")
+        if task_order:
+            task_orders = [TaskQueue.FIFO, TaskQueue.LONGEST_FIRST]
+            if task_order not in task_orders:
+                logger.error(
+                    "--order should be one of {}".format(", ".join(task_orders)),
+                )
+                return False
+
         mode = options.get("mode")
         if mode and mode not in ["abr", "cbr", "vbr"]:
             logger.error("mode should be one of abr, cbr or vbr (default)")
             return False
 
         # validate if the quality setting makes sense
-        quality = options.get("quality")
-
-        if quality is not None:
-            # optional; otherwise default quality values will be used
-            if mime_type == "audio/mpeg":
-                if mode in ["abr", "cbr"]:
-                    if quality > 320 or quality < 64:
-                        logger.error("mp3 cbr/abr bitrate should be between 64 and 320")
-                        return False
-                else:
-                    if quality > 9 or quality < 0:
-                        logger.error(
-                            "mp3 vbr quality should be between 9 (low) and 0 (hight)",
-                        )
-                        return False
-
-            elif mime_type == "audio/x-vorbis":
-                if quality < 0 or quality > 1:
-                    logger.error("ogg quality should be between 0.0 and 1.0")
-                    return False
-
-            elif mime_type == "audio/x-m4a":
-                # supports arbitrary bitrates
-                # source: https://en.wikipedia.org/wiki/Advanced_Audio_Coding
-                # Our used encoder seems to cap somewhere between 400 and
-                # 440 kbps though
-                if quality < 0:
-                    logger.error("m4a bitrate should be larger than 0")
-                    return False
-
-            elif mime_type == "audio/x-flac":
-                if quality < 0 or quality > 8:
-                    logger.error("flac compression strength should be between 0 and 8")
-                    return False
-
-            elif mime_type == "audio/x-wav":
-                if quality not in [8, 16, 24, 32]:
-                    logger.error("wav sample width has to be one of 8, 16, 24 or 32")
-                    return False
-
-            elif mime_type == "audio/ogg; codecs=opus":
-                # source: https://wiki.hydrogenaud.io/index.php?title=Opus
-                if quality < 6 or quality > 510:
-                    logger.error("opus bitrate should be between 6 and 510")
-                    return False
+        if not validate_quality(mime_type, mode, options.get("quality")):
+            return False
+
+        for spec in options.get("extra-output") or []:
+            try:
+                extra_mime_type, extra_quality, _ = parse_extra_output(spec)
+            except ValueError as error:
+                logger.error(f"--extra-output: {error}")
+                return False
+            if not validate_quality(extra_mime_type, mode, extra_quality):
+                return False
 
     resample = options.get("output-resample", None)
 
@@ -242,67 +453,51 @@ def validate_args(options):
     return True
 
 
-def prepare_files_list(input_files):
-    """Create a list of all URIs in a list of paths.
-
-    Also returns a list of relative directories. This is used to reconstruct
-    the directory structure in the output path.
-
-    If input_path is a/b/c/ and the file is at a/b/c/e/f/d.mp3,
-    the subdirectries entry will be subdirectories c/e/f/.
-
-    If input_files is ['/a/b', '/c']
-    and files are found at ['file:///a/b/d.mp3', '[file:///c/e/f/g.mp3'],
-    subdirectories will be ['b/d', 'c/e/f']
+def iter_files_list(input_files):
+    """Yield the URIs of all files in a list of paths while walking them.
 
-    Subdirectories might be different for various files because
-    multiple paths can be provided in the args.
+    Yields tuples of (uri, subdirectory). The subdirectory is used to
+    reconstruct the directory structure in the output path, see
+    prepare_files_list.
 
     Parameters
     ----------
     input_files : string[]
         Array of paths (not uris)
     """
-    # The GUI has its own way of going through subdirectories.
+    # The GUI goes through subdirectories with vfs_walk, which uses the
+    # same iter_walk.
 
     # If one of the files is a directory, walk over the files in that
-    # and append each one to parsed_files if -r is provided.
-    subdirectories = []
-    parsed_files = []
+    # and yield each one if -r is provided.
+    # --include, --exclude and so on
+    walk_filter = get_walk_filter()
+
     for input_path in input_files:
         # accept tilde (~) to point to home directories, get absolute path
         input_path = os.path.realpath(os.path.expanduser(input_path))
 
         if os.path.isfile(input_path):
-            # for every appended file, also append to
-            # subdirectories
-            subdirectories.append("")
-            parsed_files.append(input_path)
+            if walk_filter is None or walk_filter.accepts_file(
+                os.path.basename(input_path), lambda: os.path.getsize(input_path)
+            ):
+                yield filename_to_uri(input_path), ""
         elif not os.path.isdir(input_path):
             logger.error(f"path {input_path} does not exist")
 
         # walk over directories to add the files of all the subdirectories
         elif os.path.isdir(input_path):
-            if input_path[-1] == os.sep:
-                input_path = input_path[:-1]
-
-            if input_path.rfind(os.sep) != -1:
-                parent = input_path[: input_path.rfind(os.sep)]
-            else:
-                parent = input_path
+            # the files end up in a directory named like the input_path
+            basename = os.path.basename(input_path.rstrip(os.sep))
+            base = f"{basename}/" if basename else ""
 
             # but only if -r option was provided
             if settings.get("recursive"):
-                for dirpath, _, filenames in os.walk(input_path):
-                    for filename in filenames:
-                        if dirpath[-1] != os.sep:
-                            dirpath += os.sep
-                        # dirpath: for example a/b/c/e/f/
-                        parsed_files.append(dirpath + filename)
-                        subdir = os.path.relpath(dirpath, parent) + os.sep
-                        if subdir == "./":
-                            subdir = ""
-                        subdirectories.append(subdir)
+                for uri, relative in iter_walk(
+                    filename_to_uri(input_path), walk_filter=walk_filter
+                ):
+                    # for example c/e/f/
+                    yield uri, base + relative
             else:
                 # else it didn't go into any directory.
                 # Provide some information about how to
@@ -311,7 +506,33 @@ def prepare_files_list(input_files):
                 )
         # if not a file and not a dir it doesn't exist. skip
 
-    parsed_files = list(map(filename_to_uri, parsed_files))
+
+def prepare_files_list(input_files):
+    """Create a list of all URIs in a list of paths.
+
+    Also returns a list of relative directories. This is used to reconstruct
+    the directory structure in the output path.
+
+    If input_path is a/b/c/ and the file is at a/b/c/e/f/d.mp3,
+    the subdirectries entry will be subdirectories c/e/f/.
+
+    If input_files is ['/a/b', '/c']
+    and files are found at ['file:///a/b/d.mp3', '[file:///c/e/f/g.mp3'],
+    subdirectories will be ['b/d', 'c/e/f']
+
+    Subdirectories might be different for various files because
+    multiple paths can be provided in the args.
+
+    Parameters
+    ----------
+    input_files : string[]
+        Array of paths (not uris)
+    """
+    subdirectories = []
+    parsed_files = []
+    for uri, subdirectory in iter_files_list(input_files):
+        parsed_files.append(uri)
+        subdirectories.append(subdirectory)
 
     return parsed_files, subdirectories
 
@@ -319,6 +540,17 @@ def prepare_files_list(input_files):
 class CLIConvert:
     """Main class that runs the conversion."""
 
+    # how many discovered files may wait for a free conversion job. Together
+    # with the bounded queues of the DiscoveryStream, this keeps the memory
+    # usage flat no matter how many files are being converted.
+    max_pending = 100
+
+    # milliseconds between moving discovered files into the conversion queue
+    feed_interval = 50
+
+    # seconds between printing the progress and remaining time
+    progress_interval = 10
+
     def __init__(self, input_files):
         """Start the conversion of all the files specified in input_files.
 
@@ -326,65 +558,313 @@ class CLIConvert:
         line arguments have to be provided which are stored in the global
         'settings' variable.
 
+        Files are walked over, discovered and converted at the same time, so
+        the first conversions start right away.
+
         input_files is an array of string paths.
         """
-        logger.info("checking files and walking dirs in the specified paths…")
+        gio_settings = get_gio_settings()
+        self.name_generator = TargetNameGenerator()
+        self.extra_outputs = [
+            ExtraOutput(extra_settings)
+            for extra_settings in settings.get("extra-output-settings", [])
+        ]
+
+        # --sync only converts sources that are new or changed since the
+        # previous run into the same output
+        self.manifest = None
+        if settings.get("sync"):
+            self.manifest = Manifest(
+                get_manifest_path(
+                    gio_settings.get_string("selected-folder"),
+                    gio_settings.get_string("output-mime-type"),
+                ),
+                get_settings_fingerprint(),
+                self.name_generator.target_index,
+            )
+
+        # the target of each file is decided when it is queued, so that two
+        # files with the same target don't race for it
+        plan_path = settings.get("plan")
+        if plan_path:
+            try:
+                self.plan = ConversionPlan.load(plan_path, self.name_generator)
+            except (OSError, ValueError) as error:
+                logger.error(f"cannot use the plan: {error}")
+                exit(1)
+        else:
+            # when converting while discovering, each entry is applied right
+            # away and doesn't have to be kept around
+            self.plan = ConversionPlan(
+                self.name_generator,
+                keep_entries=bool(
+                    settings.get("dry-run") or settings.get("write-plan")
+                ),
+                manifest=self.manifest,
+            )
+
+        if not plan_path:
+            logger.info("checking files and walking dirs in the specified paths…")
+
+        self.num_files = 0
+        self.num_skipped = 0
+
+        if settings.get("dry-run") or settings.get("write-plan"):
+            self._make_plan(input_files)
+            return
 
-        # CLICheck will exit(1) if no input_files available and resolve
-        # all files in input_files and also figure out which files can be
-        # converted.
-        file_checker = CLICheck(input_files)
+        journal = Journal(
+            get_journal_path(
+                input_files,
+                gio_settings.get_string("selected-folder"),
+                gio_settings.get_string("output-mime-type"),
+            ),
+        )
+        self.journal = journal
+        completed = set()
+        if settings.get("resume"):
+            if not journal.exists():
+                # converting everything again is not what was asked for
+                logger.error(
+                    "there is no interrupted conversion of the same input "
+                    "paths into the same output folder and format that could "
+                    "be resumed"
+                )
+                exit(1)
+            completed = journal.resume()
+        else:
+            journal.start()
 
         loop = GLib.MainLoop()
         context = loop.get_context()
 
-        name_generator = TargetNameGenerator()
-        suffix = name_generator.suffix
-        name_generator.suffix = suffix
+        # finished conversions are forgotten to keep the memory usage flat
+        conversions = TaskQueue(
+            gio_settings.get_string("task-order"),
+            gio_settings.get_boolean("adaptive-jobs"),
+            keep_tasks=False,
+        )
+        conversions.open()
+        self.conversions = conversions
 
-        conversions = TaskQueue()
+        speed_history = SpeedHistory()
+        speed_history.load()
+        self.eta = EtaEstimator(conversions, speed_history)
 
         self.started_tasks = 0
         self.num_conversions = 0
 
-        sound_files = file_checker.get_sound_files()
-        for sound_file in sound_files:
-            if not sound_file.readable:
-                filename = beautify_uri(sound_file.uri)
-                logger.info(f"skipping '{filename}': not an audiofile")
-                continue
+        if plan_path:
+            # the files were discovered and named when the plan was made
+            self.num_files = len(self.plan.entries)
+            self.discovery = PlanStream(self.plan)
+        else:
+            # only the tags that are used in the target names have to be read
+            self.discovery = DiscoveryStream(
+                self._iter_sound_files(input_files, completed),
+                self.max_pending,
+                self._get_needed_tags(),
+            )
+        self.discovery.start()
 
-            converter = Converter(sound_file, name_generator)
+        def finished(_=None):
+            if self.num_skipped > 0:
+                logger.info(f"skipped {self.num_skipped} already converted files")
+            if self.num_conversions > 0:
+                total_time = conversions.get_duration()
+                logger.info(
+                    f"converted {self.num_conversions} files in "
+                    f"{format_time(total_time)}",
+                )
+            if self.plan.num_collisions > 0:
+                logger.info(
+                    f"{self.plan.num_collisions} files got a number appended, "
+                    "because their target was already taken by another file",
+                )
+            self.name_generator.target_index.log_statistics()
+            # remember the speed for the estimates of the next run
+            self.eta.update()
+            speed_history.save()
+            # failed conversions can be retried with --resume
+            failed = conversions.num_failed > 0
+            journal.close(remove=not failed)
+            if self.manifest is not None:
+                # Only now that everything is converted, the targets of
+                # removed sources can be told apart from targets that other
+                # sources of this run took over
+                self.manifest.remove_missing(settings.get("sync-delete"))
+                self.manifest.close()
 
-            converter.existing_behaviour = settings.get("existing")
+        conversions.connect("done", finished)
 
-            conversions.add(converter)
+        logger.info("starting conversion while discovering files…")
+        conversions.run()
+        GLib.timeout_add(self.feed_interval, self._feed)
+        GLib.timeout_add_seconds(self.progress_interval, self._print_progress)
 
-            self.num_conversions += 1
+        while not conversions.finished:
+            # make the eventloop of glibs async stuff run until finished:
+            context.iteration(may_block=True)
+
+        # do another one to print the queue done message
+        context.iteration(may_block=False)
 
         if self.num_conversions == 0:
+            if self.num_files == 0:
+                # iter_files_list will print something like
+                # "use -r to go into subdirectories"
+                logger.info("no files found…")
+                exit(1)
+            if self.num_skipped > 0:
+                logger.info("all files have already been converted")
+                return
             logger.info("no audio files for conversion found…")
             exit(2)
 
-        logger.info(f"starting conversion of {len(sound_files)} files…")
-        self.conversions = conversions
+    def _get_needed_tags(self):
+        """Get the tags that the names of all outputs need."""
+        needed_tags = self.name_generator.get_needed_tags()
+        for output in self.extra_outputs:
+            needed_tags |= output.name_generator.get_needed_tags()
+        return needed_tags
 
-        def finished(_=None):
-            total_time = conversions.get_duration()
+    def _make_plan(self, input_files):
+        """Discover all files and decide their targets, without converting.
+
+        For --dry-run and --write-plan.
+        """
+        discovery = DiscoveryStream(
+            self._iter_sound_files(input_files, set()),
+            self.max_pending,
+            self.name_generator.get_needed_tags(),
+        )
+        discovery.start()
+        sound_files = []
+        while not discovery.finished:
+            discovered = discovery.get_discovered(self.max_pending)
+            if not discovered:
+                time.sleep(self.feed_interval / 1000)
+            for sound_file in discovered:
+                if not sound_file.readable:
+                    filename = beautify_uri(sound_file.uri)
+                    logger.info(f"skipping '{filename}': not an audiofile")
+                    continue
+                sound_files.append(sound_file)
+        flush_metadata_cache()
+
+        # independent of the order in which the files were discovered, the
+        # same one gets a number appended if targets collide
+        for sound_file in sorted(sound_files, key=lambda s: s.uri):
+            self.plan.add(sound_file, settings.get("existing"))
+        if self.manifest is not None:
+            self.manifest.close()
+
+        if settings.get("dry-run"):
+            self.plan.log()
+        plan_path = settings.get("write-plan")
+        if plan_path:
+            self.plan.write(plan_path)
             logger.info(
-                f"converted {len(sound_files)} files in {format_time(total_time)}",
+                f"wrote the plan for {len(self.plan.entries)} files to {plan_path}, "
+                "run it with --plan",
             )
 
-        conversions.connect("done", finished)
+        if self.num_files == 0:
+            logger.info("no files found…")
+            exit(1)
 
-        conversions.run()
+    def _iter_sound_files(self, input_files, skip):
+        """Yield a SoundFile for each file to convert.
 
-        while not conversions.finished:
-            # make the eventloop of glibs async stuff run until finished:
-            context.iteration(may_block=True)
+        Runs in the thread of the DiscoveryStream.
+        """
+        for uri, subdirectory in iter_files_list(input_files):
+            self.num_files += 1
+            if uri in skip:
+                self.num_skipped += 1
+                continue
+            if self.manifest is not None and self.manifest.check(uri) == UNCHANGED:
+                # not even discovered
+                self.num_skipped += 1
+                continue
 
-        # do another one to print the queue done message
-        context.iteration(may_block=False)
+            sound_file = SoundFile(uri)
+            # by storing it in subfolders, the original subfolder structure
+            # (relative to the directory that was provided as input in the
+            # cli) can be restored in the target dir
+            sound_file.subfolders = subdirectory
+            yield sound_file
+
+    def _sync(self, converter):
+        """Write down the targets of converted sources."""
+        manifest = self.manifest
+        uri = converter.sound_file.uri
+
+        def on_done(converter):
+            if converter.error:
+                return
+            target = converter.output_uri
+            if target is None and converter.existing_behaviour == Converter.SKIP:
+                # an existing target was taken over
+                target = converter.newname
+            if target is not None:
+                manifest.record(uri, target, delete_old=settings.get("sync-delete"))
+
+        converter.connect("done", on_done)
+
+    def _print_progress(self):
+        """Print how many files are done and how long it will take.
+
+        Can be used in GLib.timeout_add.
+        """
+        conversions = self.conversions
+        if conversions.finished:
+            return False
+
+        self.eta.update()
+        message = f"converted {conversions.num_done} of {self.num_conversions} files"
+        if not self.discovery.finished:
+            message += " found so far"
+        remaining = self.eta.get_remaining()
+        if remaining is not None:
+            message += f", {format_time(remaining)} left"
+        logger.info(message)
+        return True
+
+    def _feed(self):
+        """Move discovered files into the conversion queue.
+
+        Can be used in GLib.timeout_add.
+        """
+        conversions = self.conversions
+        limit = self.max_pending - conversions.pending.qsize()
+        for sound_file in self.discovery.get_discovered(limit):
+            if not sound_file.readable:
+                filename = beautify_uri(sound_file.uri)
+                logger.info(f"skipping '{filename}': not an audiofile")
+                continue
+
+            # not needed for converting, don't keep it around
+            sound_file.info = None
+
+            converter = Converter(sound_file, self.name_generator, self.extra_outputs)
+            converter.existing_behaviour = settings.get("existing")
+            entry = self.plan.get(sound_file.uri)
+            if entry is None:
+                entry = self.plan.add(sound_file, converter.existing_behaviour)
+            entry.apply(converter)
+            if self.manifest is not None:
+                self._sync(converter)
+            conversions.add(converter)
+            self.journal.add(converter)
+            self.num_conversions += 1
+
+        if self.discovery.finished:
+            flush_metadata_cache()
+            conversions.close()
+            return False
+
+        return True
 
 
 class CLICheck:
@@ -437,6 +917,7 @@ class CLICheck:
             # calling this like crazy is the fastest way
             context.iteration(True)
 
+        flush_metadata_cache()
         self.discoverers = discoverers.all_tasks
         sound_files = []
         for discoverer in self.discoverers:
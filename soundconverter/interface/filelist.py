@@ -33,8 +33,10 @@ from soundconverter.util.error import show_error
 from soundconverter.util.fileoperations import unquote_filename, vfs_walk
 from soundconverter.util.formatting import format_time
 from soundconverter.util.logger import logger
+from soundconverter.util.metadatacache import flush_metadata_cache
 from soundconverter.util.soundfile import SoundFile
 from soundconverter.util.taskqueue import TaskQueue
+from soundconverter.util.walkfilter import WalkFilter
 
 # Names of columns in the file list
 MODEL = [
@@ -142,6 +144,9 @@ class FileList:
         self.window.progressbarstatus.show()
         self.window.progressbarstatus.set_fraction(0)
 
+        # files of other types are not even listed while walking
+        walk_filter = WalkFilter(extensions=extensions) if extensions else None
+
         for uri in uris:
             gtk_iteration()
             if not uri:
@@ -165,15 +170,7 @@ class FileList:
 
                 # get a list of all the files as URIs in
                 # that directory and its subdirectories
-                filelist = vfs_walk(uri)
-
-                accepted = []
-                if extensions:
-                    for filename in filelist:
-                        for extension in extensions:
-                            if filename.lower().endswith(extension):
-                                accepted.append(filename)
-                    filelist = accepted
+                filelist = vfs_walk(uri, walk_filter)
                 files.extend(filelist)
             else:
                 files.append(uri)
@@ -326,6 +323,7 @@ class FileList:
 
     def discoverer_queue_ended(self, queue):
         # all tasks done
+        flush_metadata_cache()
         self.window.set_sensitive()
         self.window.conversion_ended()
 
@@ -39,6 +39,7 @@ from soundconverter.util.namegenerator import (
 )
 from soundconverter.util.settings import get_gio_settings
 from soundconverter.util.soundfile import SoundFile
+from soundconverter.util.taskqueue import TaskQueue
 
 encoders = [
     ("audio/x-vorbis", "vorbisenc", "Ogg Vorbis (.ogg)"),
@@ -248,6 +249,10 @@ class PreferencesDialog(GladeWindow):
         self.jobs.set_active(self.settings.get_boolean("limit-jobs"))
         self.jobs_spinbutton.set_value(self.settings.get_int("number-of-jobs"))
 
+        self.longest_first.set_active(
+            self.settings.get_string("task-order") == TaskQueue.LONGEST_FIRST,
+        )
+
         self.update_example()
 
     def update_selected_folder(self):
@@ -537,3 +542,9 @@ class PreferencesDialog(GladeWindow):
 
     def on_jobs_spinbutton_value_changed(self, jspinbutton):
         self.settings.set_int("number-of-jobs", int(jspinbutton.get_value()))
+
+    def on_longest_first_toggled(self, button):
+        if button.get_active():
+            self.settings.set_string("task-order", TaskQueue.LONGEST_FIRST)
+        else:
+            self.settings.set_string("task-order", TaskQueue.FIFO)
@@ -31,11 +31,13 @@ from soundconverter.interface.mainloop import gtk_iteration, gtk_sleep
 from soundconverter.interface.preferences import PreferencesDialog
 from soundconverter.interface.theme import theme_switcher
 from soundconverter.util.error import set_error_handler
+from soundconverter.util.eta import EtaEstimator, SpeedHistory
 from soundconverter.util.fileoperations import filename_to_uri
 from soundconverter.util.formatting import format_time
 from soundconverter.util.logger import logger
 from soundconverter.util.namegenerator import TargetNameGenerator, filepattern
-from soundconverter.util.settings import settings
+from soundconverter.util.plan import ConversionPlan
+from soundconverter.util.settings import get_gio_settings, settings
 from soundconverter.util.taskqueue import TaskQueue
 
 
@@ -126,6 +128,8 @@ class SoundConverterWindow(GladeWindow):
         # self.aboutdialog.set_transient_for(self.widget)
 
         self.converter_queue = None
+        self.num_done_shown = 0
+        self.eta = None
 
         self.sensitive_widgets = {}
         for name in self.sensitive_names:
@@ -258,13 +262,29 @@ class SoundConverterWindow(GladeWindow):
         """Start the conversion."""
         name_generator = TargetNameGenerator()
         files = self.filelist.get_files()
-        self.converter_queue = TaskQueue()
+        gio_settings = get_gio_settings()
+        self.converter_queue = TaskQueue(
+            gio_settings.get_string("task-order"),
+            gio_settings.get_boolean("adaptive-jobs"),
+        )
         self.converter_queue.connect("done", self.on_queue_finished)
+        speed_history = SpeedHistory()
+        speed_history.load()
+        self.eta = EtaEstimator(self.converter_queue, speed_history)
+        # decide all targets first, so that files with the same target get
+        # the same names every time
+        plan = ConversionPlan(name_generator)
+        for sound_file in sorted(files, key=lambda s: s.uri):
+            plan.add(sound_file, Converter.INCREMENT)
         for sound_file in files:
             gtk_iteration()
-            self.converter_queue.add(Converter(sound_file, name_generator))
+            converter = Converter(sound_file, name_generator)
+            plan.get(sound_file.uri).apply(converter)
+            self.converter_queue.add(converter)
         # all was OK
         self.set_status()
+        # how many of converter_queue.done already have a full progress bar
+        self.num_done_shown = 0
         self.converter_queue.run()
 
         # try to make the progress bars look smooth by calling this often
@@ -306,16 +326,20 @@ class SoundConverterWindow(GladeWindow):
                 self.widget.set_title(title)
                 return None
 
-            # how long it has already been running
-            duration = converter_queue.get_duration()
-            if duration < 1:
-                # wait a bit not to display crap
-                self.progressbar.set_text(_("Estimating…"))
-                self.progressbar.set_show_text(True)
-                return None
+            # remaining duration, based on the speed of previous conversions
+            self.eta.update()
+            remaining = self.eta.get_remaining()
+
+            if remaining is None:
+                # how long it has already been running
+                duration = converter_queue.get_duration()
+                if duration < 1:
+                    # wait a bit not to display crap
+                    self.progressbar.set_text(_("Estimating…"))
+                    self.progressbar.set_show_text(True)
+                    return None
 
-            # remainign duration
-            remaining = converter_queue.get_remaining()
+                remaining = converter_queue.get_remaining()
             if remaining is not None:
                 seconds = max(remaining % 60, 1)
                 minutes = remaining / 60
@@ -345,9 +369,18 @@ class SoundConverterWindow(GladeWindow):
 
         if not paused and running:
             # if paused, don't refresh the progress
-            total_progress, task_progress = self.converter_queue.get_progress()
+            converter_queue = self.converter_queue
+            total_progress, task_progress = converter_queue.get_progress(
+                only_running=True
+            )
             self.progressbar.set_fraction(total_progress)
 
+            # only look at tasks that finished since the last refresh, in
+            # order to not slow down with many files
+            for task in converter_queue.done[self.num_done_shown :]:
+                self.set_file_progress(task.sound_file, 1)
+            self.num_done_shown = len(converter_queue.done)
+
             for task, progress in task_progress:
                 if progress == 0:
                     # otherwise the ui becomes really laggy with too many files
@@ -417,6 +450,10 @@ class SoundConverterWindow(GladeWindow):
 
         logger.info(msg)
 
+        # remember the speed for the estimates of the next conversion
+        self.eta.update()
+        self.eta.history.save()
+
         self.conversion_ended(msg)
 
     def conversion_ended(self, msg=None):
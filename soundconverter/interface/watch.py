@@ -0,0 +1,333 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Convert files as soon as they appear in watched directories."""
+
+import os
+import time
+
+from gi.repository import Gio, GLib
+
+from soundconverter.gstreamer.converter import Converter, ExtraOutput
+from soundconverter.gstreamer.discoverer import Discoverer
+from soundconverter.util.fileoperations import (
+    beautify_uri,
+    filename_to_uri,
+    unquote_filename,
+)
+from soundconverter.util.logger import logger
+from soundconverter.util.metadatacache import flush_metadata_cache
+from soundconverter.util.namegenerator import TargetNameGenerator
+from soundconverter.util.settings import get_gio_settings, settings
+from soundconverter.util.soundfile import SoundFile
+from soundconverter.util.taskqueue import TaskQueue
+from soundconverter.util.walkfilter import get_walk_filter
+
+
+class Debouncer:
+    """Wait until files are not being written to anymore."""
+
+    def __init__(self, settle_time):
+        """Create a new Debouncer.
+
+        Parameters
+        ----------
+        settle_time : float
+            How many seconds a file has to stay the same before it is
+            considered to be complete
+        """
+        self.settle_time = settle_time
+        # path to (time of the last change, (size, mtime), data)
+        self.pending = {}
+
+    def touch(self, path, data=None, now=None):
+        """Write down that the file was created or changed just now."""
+        now = time.monotonic() if now is None else now
+        self.pending[path] = (now, self._stat(path), data)
+
+    def discard(self, path):
+        """Forget about the file, because it was removed or renamed."""
+        self.pending.pop(path, None)
+
+    def collect(self, now=None):
+        """Get the files that didn't change for long enough.
+
+        Returns a list of (path, data) tuples and forgets about them.
+        """
+        now = time.monotonic() if now is None else now
+        settled = []
+        for path, (changed, stat, data) in list(self.pending.items()):
+            if now - changed < self.settle_time:
+                continue
+
+            current = self._stat(path)
+            if current is None:
+                # gone without a notification
+                del self.pending[path]
+            elif current != stat:
+                # still being written without the monitor noticing, for
+                # example on network shares
+                self.pending[path] = (now, current, data)
+            else:
+                del self.pending[path]
+                settled.append((path, data))
+        return settled
+
+    def _stat(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+
+class CLIWatch:
+    """Convert new files in directories until ctrl+c is pressed.
+
+    Existing files are left alone, use --sync for them.
+    """
+
+    # seconds a file has to stay unchanged before it is converted
+    settle_time = 2
+
+    # milliseconds between looking for settled files
+    check_interval = 500
+
+    def __init__(self, input_files):
+        """Start watching the directories in input_files.
+
+        Call run afterwards. To control the conversion, command line
+        arguments have to be provided which are stored in the global
+        'settings' variable.
+
+        input_files is an array of string paths.
+        """
+        gio_settings = get_gio_settings()
+        self.name_generator = TargetNameGenerator()
+        self.extra_outputs = [
+            ExtraOutput(extra_settings)
+            for extra_settings in settings.get("extra-output-settings", [])
+        ]
+        self.walk_filter = get_walk_filter()
+        self.recursive = settings.get("recursive")
+        self.debouncer = Debouncer(self.settle_time)
+        # path of each watched directory to its Gio.FileMonitor
+        self.monitors = {}
+        self.num_conversions = 0
+
+        output_uri = gio_settings.get_string("selected-folder")
+        self.output_path = None
+        if output_uri.startswith("file://"):
+            self.output_path = unquote_filename(output_uri[len("file://") :])
+
+        # watching may go on for a long time, so finished conversions are
+        # forgotten
+        self.conversions = TaskQueue(
+            gio_settings.get_string("task-order"),
+            gio_settings.get_boolean("adaptive-jobs"),
+            keep_tasks=False,
+        )
+        # never closed, more files may always come
+        self.conversions.open()
+        self.conversions.run()
+
+        for input_path in input_files:
+            input_path = os.path.realpath(os.path.expanduser(input_path))
+            if not os.path.isdir(input_path):
+                logger.error(f"{input_path} is not a directory, can't watch it")
+                continue
+
+            # like in iter_files_list, the files end up in a directory named
+            # like the input_path
+            basename = os.path.basename(input_path.rstrip(os.sep))
+            root = (input_path, f"{basename}/" if basename else "")
+            self._watch_tree(input_path, root)
+
+    def run(self):
+        """Convert new files until interrupted."""
+        if len(self.monitors) == 0:
+            logger.info("nothing to watch…")
+            exit(1)
+
+        GLib.timeout_add(self.check_interval, self._check_pending)
+        logger.info(
+            f"watching {len(self.monitors)} directories for new files, "
+            "press ctrl+c to stop"
+        )
+        loop = GLib.MainLoop()
+        try:
+            loop.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Stop watching and cancel running conversions."""
+        for monitor in self.monitors.values():
+            monitor.cancel()
+        self.monitors = {}
+        finished = self.conversions.num_done
+        logger.info(f"{finished} of {self.num_conversions} conversions finished")
+        self.name_generator.target_index.log_statistics()
+        self.conversions.cancel()
+        flush_metadata_cache()
+
+    def _monitor(self, path, root):
+        """Get notified about changes in the directory."""
+        gfile = Gio.File.new_for_path(path)
+        monitor = gfile.monitor_directory(Gio.FileMonitorFlags.WATCH_MOVES, None)
+        monitor.connect("changed", self._on_changed, root)
+        return monitor
+
+    def _get_relative_path(self, path, root):
+        return os.path.relpath(path, root[0])
+
+    def _watch_tree(self, path, root, add_files=False):
+        """Watch a directory and, if recursive, its subdirectories.
+
+        If add_files is True, the files in them are converted as well,
+        because the directory was only just moved or copied there.
+        """
+        for directory, subdirectories, filenames in os.walk(path):
+            if directory in self.monitors or self._is_output(directory):
+                subdirectories.clear()
+                continue
+
+            try:
+                self.monitors[directory] = self._monitor(directory, root)
+            except GLib.Error as error:
+                logger.error(f'cannot watch "{directory}": {error}')
+
+            if add_files:
+                for filename in filenames:
+                    self._add(os.path.join(directory, filename), root)
+
+            if not self.recursive:
+                break
+
+            if self.walk_filter is not None:
+                subdirectories[:] = [
+                    subdirectory
+                    for subdirectory in subdirectories
+                    if self.walk_filter.accepts_directory(
+                        self._get_relative_path(
+                            os.path.join(directory, subdirectory), root
+                        )
+                    )
+                ]
+
+    def _is_output(self, path):
+        """Check if the path is in the output directory."""
+        if self.output_path is None:
+            return False
+        return path == self.output_path or path.startswith(self.output_path + "/")
+
+    def _on_changed(self, _, gfile, other_gfile, event_type, root):
+        """Handle the "changed" signal of a Gio.FileMonitor."""
+        path = gfile.get_path()
+        events = Gio.FileMonitorEvent
+        if event_type in (events.CREATED, events.CHANGED, events.MOVED_IN):
+            self._add(path, root)
+        elif event_type == events.CHANGES_DONE_HINT:
+            # might come late for a file that was already converted
+            if path in self.debouncer.pending:
+                self._add(path, root)
+        elif event_type == events.RENAMED:
+            # for example a download that is moved to its final name
+            self._remove(path)
+            self._add(other_gfile.get_path(), root)
+        elif event_type in (events.DELETED, events.MOVED_OUT):
+            self._remove(path)
+
+    def _add(self, path, root):
+        """Convert the file once it is complete, or watch the directory."""
+        if path.endswith("~SC~") or self._is_output(path):
+            # our own temporary or converted files
+            return
+
+        if os.path.isdir(path):
+            if self.recursive and path not in self.monitors:
+                relative_path = self._get_relative_path(path, root)
+                if self.walk_filter is None or self.walk_filter.accepts_directory(
+                    relative_path
+                ):
+                    self._watch_tree(path, root, add_files=True)
+            return
+
+        self.debouncer.touch(path, root)
+
+    def _remove(self, path):
+        """Stop caring about a file or directory that is gone."""
+        self.debouncer.discard(path)
+        for directory in list(self.monitors):
+            if directory == path or directory.startswith(path + "/"):
+                self.monitors.pop(directory).cancel()
+
+    def _check_pending(self):
+        """Discover files that are complete.
+
+        Can be used in GLib.timeout_add.
+        """
+        sound_files = []
+        for path, root in self.debouncer.collect():
+            relative_path = self._get_relative_path(path, root)
+            if self.walk_filter is not None and not self.walk_filter.accepts_file(
+                relative_path, lambda: os.path.getsize(path)
+            ):
+                continue
+
+            sound_file = SoundFile(filename_to_uri(path))
+            # rebuild the directory structure of the input in the output
+            relative_directory = os.path.dirname(relative_path)
+            if relative_directory:
+                relative_directory += "/"
+            sound_file.subfolders = root[1] + relative_directory
+            sound_files.append(sound_file)
+
+        if sound_files:
+            discoverer = Discoverer(sound_files)
+            discoverer.connect("done", self._on_discovered)
+            discoverer.run()
+
+        return True
+
+    def _on_discovered(self, discoverer):
+        """Convert the discovered files."""
+        flush_metadata_cache()
+        # the output may have changed since the last files came in
+        self.name_generator.target_index.clear()
+        for output in self.extra_outputs:
+            output.name_generator.target_index.clear()
+        for sound_file in discoverer.sound_files:
+            if not sound_file.readable:
+                filename = beautify_uri(sound_file.uri)
+                logger.info(f"skipping '{filename}': not an audiofile")
+                continue
+
+            # not needed for converting, don't keep it around
+            sound_file.info = None
+
+            converter = Converter(sound_file, self.name_generator, self.extra_outputs)
+            converter.existing_behaviour = settings.get("existing")
+            self.conversions.add(converter)
+            self.num_conversions += 1
@@ -0,0 +1,232 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Estimate the remaining time of a TaskQueue from remembered speeds."""
+
+import json
+import math
+import os
+
+from gi.repository import GLib
+
+from soundconverter.util.logger import logger
+
+
+def get_speed_history_path():
+    """Get where the speeds of previous runs are stored."""
+    return os.path.join(GLib.get_user_cache_dir(), "soundconverter", "speeds.json")
+
+
+class SpeedHistory:
+    """Smoothed processing speed for each kind of task, kept between runs.
+
+    The speed is the weight, e.g. seconds of audio, that a single task
+    processes per second.
+    """
+
+    # seconds of measurements after which an old speed has lost most of
+    # its influence
+    time_constant = 10
+
+    def __init__(self, path=None):
+        self.path = path or get_speed_history_path()
+        self.speeds = {}
+
+    def load(self):
+        """Read the speeds of previous runs, if there are any."""
+        try:
+            with open(self.path, encoding="utf-8") as history:
+                speeds = json.load(history)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as error:
+            logger.warning(f"could not read speed history {self.path}: {error}")
+            return
+
+        self.speeds = {
+            key: speed
+            for key, speed in speeds.items()
+            if isinstance(speed, (int, float)) and speed > 0
+        }
+
+    def save(self):
+        """Write the speeds down for the next run."""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as history:
+                json.dump(self.speeds, history)
+            os.replace(temporary, self.path)
+        except OSError as error:
+            logger.warning(f"could not write speed history {self.path}: {error}")
+
+    def get(self, key):
+        """Get the speed of a kind of task, or None if it is unknown."""
+        return self.speeds.get(key)
+
+    def add(self, key, speed, duration):
+        """Add a measured speed.
+
+        Parameters
+        ----------
+        key : string
+            What kind of task was measured, see Task.get_speed_key
+        speed : float
+            The processed weight per second
+        duration : float
+            The seconds over which the speed was measured. Longer
+            measurements have a stronger influence.
+        """
+        previous = self.speeds.get(key)
+        if previous is None:
+            self.speeds[key] = speed
+            return
+
+        factor = 1 - math.exp(-duration / self.time_constant)
+        self.speeds[key] = previous + factor * (speed - previous)
+
+
+class EtaEstimator:
+    """Estimate the remaining time of a TaskQueue.
+
+    Call update regularly while the queue is running to measure the speed
+    of the running tasks. Only looks at tasks that were added, started or
+    finished since the previous update, so it doesn't slow down with many
+    tasks.
+    """
+
+    def __init__(self, task_queue, history):
+        """Create a new EtaEstimator.
+
+        Parameters
+        ----------
+        task_queue : TaskQueue
+            The queue whose remaining time should be estimated. Tasks that
+            were added before the estimator was created are not known to it.
+        history : SpeedHistory
+            Known speeds, will be updated with the measured speeds
+        """
+        self.task_queue = task_queue
+        self.history = history
+        # weight of all tasks that are not done, for each speed key
+        self.remaining_weights = {}
+        # tasks that were added and finished since the previous update
+        self.added = []
+        self.done = []
+        task_queue.connect("task-added", self._on_task_added)
+        task_queue.connect("task-done", self._on_task_done)
+        # processed weight and duration of each running task at the
+        # previous update
+        self.positions = {}
+
+    def _on_task_added(self, _, task):
+        self.added.append(task)
+
+    def _on_task_done(self, _, task):
+        self.done.append(task)
+
+    def _measure(self, task, measurements):
+        """Add the progress of a task since the previous update."""
+        progress, weight = task.get_progress()
+        processed = progress * (weight or 0)
+        duration = task.timer.get_duration()
+        previous_processed, previous_duration = self.positions.get(task, (0, 0))
+        self.positions[task] = (processed, duration)
+
+        key = task.get_speed_key()
+        total_processed, total_duration = measurements.get(key, (0, 0))
+        measurements[key] = (
+            total_processed + processed - previous_processed,
+            total_duration + duration - previous_duration,
+        )
+
+    def update(self):
+        """Measure the speed of the tasks since the previous update."""
+        task_queue = self.task_queue
+        remaining_weights = self.remaining_weights
+
+        added, self.added = self.added, []
+        for task in added:
+            key = task.get_speed_key()
+            weight = task.get_progress()[1] or 0
+            remaining_weights[key] = remaining_weights.get(key, 0) + weight
+
+        measurements = {}
+
+        done, self.done = self.done, []
+        for task in done:
+            if not getattr(task, "error", None):
+                # failed tasks don't tell anything about the speed
+                self._measure(task, measurements)
+            self.positions.pop(task, None)
+            key = task.get_speed_key()
+            remaining_weights[key] -= task.get_progress()[1] or 0
+
+        for task in task_queue.running:
+            self._measure(task, measurements)
+
+        for key, (processed, duration) in measurements.items():
+            if duration > 0 and processed > 0:
+                self.history.add(key, processed / duration, duration)
+
+    def _get_speed(self, key):
+        speed = self.history.get(key)
+        if speed is None and len(self.history.speeds) > 0:
+            # never seen this kind of task, the average is better than nothing
+            speed = sum(self.history.speeds.values()) / len(self.history.speeds)
+        return speed
+
+    def get_remaining(self):
+        """Calculate how many seconds are left until the queue is done.
+
+        Returns None if there is no idea about the speed yet.
+        """
+        task_queue = self.task_queue
+        if len(task_queue.running) == 0:
+            return None
+
+        remaining_weights = dict(self.remaining_weights)
+
+        # a single long task might take longer than all the others together
+        longest = 0
+        for task in task_queue.running:
+            key = task.get_speed_key()
+            progress, weight = task.get_progress()
+            processed = progress * (weight or 0)
+            remaining_weights[key] = remaining_weights.get(key, 0) - processed
+            speed = self._get_speed(key)
+            if speed is None:
+                return None
+            longest = max(longest, ((weight or 0) - processed) / speed)
+
+        # how many seconds all the tasks still need, if run one after another
+        total = 0
+        for key, weight in remaining_weights.items():
+            if weight <= 0:
+                continue
+            speed = self._get_speed(key)
+            if speed is None:
+                return None
+            total += weight / speed
+
+        jobs = max(len(task_queue.running), task_queue.num_jobs or 1)
+        return max(total / jobs, longest)
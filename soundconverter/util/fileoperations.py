@@ -21,11 +21,13 @@
 
 import os
 import re
+import time
 import urllib.error
 import urllib.parse
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 
-from gi.repository import Gio
+from gi.repository import Gio, GLib
 
 from soundconverter.interface.mainloop import gtk_iteration
 from soundconverter.util.logger import logger
@@ -55,41 +57,186 @@ def beautify_uri(uri):
     return path
 
 
-def vfs_walk(uri):
-    """Similar to os.path.walk, but with Gio.
+# the only attributes the walker needs, querying "*" is slow
+WALK_ATTRIBUTES = "standard::name,standard::type,id::file"
+# how many children are requested from gio at once
+WALK_BATCH_SIZE = 256
 
-    uri -- the base folder uri.
-    return a list of uri.
-    """
-    filelist = []
 
+def _identify_local(path):
+    """Get something that is the same for all paths of a directory."""
+    stat = os.stat(path)
+    return stat.st_dev, stat.st_ino
+
+
+def _scan_local(path, relative, walk_filter):
+    """List the files and subdirectories of a local directory.
+
+    Returns a list of file URIs and a list of (path, name, key) tuples for
+    the subdirectories.
+    """
+    files = []
+    directories = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    # symlinks are followed, loops are handled by the walker
+                    if entry.is_dir():
+                        if walk_filter is None or walk_filter.accepts_directory(
+                            relative + entry.name
+                        ):
+                            key = _identify_local(entry.path)
+                            directories.append((entry.path, entry.name, key))
+                    elif entry.is_file():
+                        if walk_filter is None or walk_filter.accepts_file(
+                            relative + entry.name, lambda: entry.stat().st_size
+                        ):
+                            # escaped like the uris of gio, which the GUI
+                            # and _scan_gio produce
+                            files.append(GLib.filename_to_uri(entry.path, None))
+                except OSError as error:
+                    logger.error(f'Failed to read "{entry.path}": "{error}"')
+    except OSError as error:
+        logger.error(f'Failed to walk "{path}": "{error}"')
+    return files, directories
+
+
+def _identify_gio(uri):
+    """Get something that is the same for all URIs of a directory."""
+    info = Gio.File.new_for_uri(uri).query_info(
+        "id::file",
+        Gio.FileQueryInfoFlags.NONE,
+        None,
+    )
+    return info.get_attribute_string("id::file") or uri
+
+
+def _scan_gio(uri, relative, walk_filter):
+    """List the files and subdirectories of a directory with Gio.
+
+    Returns a list of file URIs and a list of (uri, name, key) tuples for
+    the subdirectories.
+    """
+    files = []
+    directories = []
     try:
-        dirlist = Gio.file_parse_name(uri).enumerate_children(
-            "*",
-            Gio.FileMonitorFlags.NONE,
+        attributes = WALK_ATTRIBUTES
+        if walk_filter is not None and walk_filter.needs_size():
+            attributes += ",standard::size"
+        enumerator = Gio.File.new_for_uri(uri).enumerate_children(
+            attributes,
+            Gio.FileQueryInfoFlags.NONE,
             None,
         )
+        try:
+            while True:
+                infos = enumerator.next_files(WALK_BATCH_SIZE, None)
+                if not infos:
+                    break
+                for info in infos:
+                    file_type = info.get_file_type()
+                    name = info.get_name()
+                    if file_type == Gio.FileType.DIRECTORY:
+                        if walk_filter is None or walk_filter.accepts_directory(
+                            relative + name
+                        ):
+                            child_uri = enumerator.get_child(info).get_uri()
+                            key = info.get_attribute_string("id::file") or child_uri
+                            directories.append((child_uri, name, key))
+                    elif file_type == Gio.FileType.REGULAR:
+                        if walk_filter is None or walk_filter.accepts_file(
+                            relative + name, info.get_size
+                        ):
+                            files.append(enumerator.get_child(info).get_uri())
+        finally:
+            enumerator.close(None)
+    except Exception as error:
+        # this is impossible to write unittests for, because this only happens
+        # when the owner of this directory is e.g. root
+        logger.error(f'Failed to walk "{uri}": "{error}"')
+    return files, directories
 
-        for file_info in dirlist:
-            info = dirlist.get_child(file_info).query_file_type(
-                Gio.FileMonitorFlags.NONE,
-                None,
-            )
 
-            uri = dirlist.get_child(file_info).get_uri()
+def iter_walk(uri, max_workers=None, walk_filter=None):
+    """Yield the URIs of all files in a directory and its subdirectories.
 
-            if info == Gio.FileType.DIRECTORY:
-                filelist.extend(vfs_walk(uri))
-                gtk_iteration()
+    The order is the same as the one of os.walk, but the directories are
+    already scanned in a thread pool while the files of the previous ones
+    are being yielded. Local directories are scanned with os.scandir,
+    others with Gio. Symbolic links are followed, but each directory is
+    only walked once. Directories that can't be read are logged and
+    skipped.
 
-            if info == Gio.FileType.REGULAR:
-                filelist.append(str(uri))
+    Yields tuples of (uri, relative directory). The relative directory
+    is "" for files directly in uri and ends with a "/" otherwise, for
+    example "b/c/".
 
-    except Exception as e:
-        # this is impossible to write unittests for, because this only happens
-        # when the owner of this directory is e.g. root
-        logger.error('Failed to walk "%s": "%s"', uri, e)
+    Parameters
+    ----------
+    uri : string
+        The base folder uri
+    max_workers : int
+        How many directories may be scanned at the same time. The default
+        of ThreadPoolExecutor is used if None.
+    walk_filter : WalkFilter
+        If set, only files it accepts are yielded, and directories it
+        doesn't accept are not looked into at all.
+    """
+    if uri.startswith("file://"):
+        location = unquote_filename(uri[len("file://") :])
+        scan, identify = _scan_local, _identify_local
+    else:
+        location = uri
+        scan, identify = _scan_gio, _identify_gio
+
+    try:
+        visited = {identify(location)}
+    except Exception as error:
+        logger.error(f'Failed to walk "{uri}": "{error}"')
+        return
 
+    executor = ThreadPoolExecutor(max_workers)
+    try:
+        stack = [("", executor.submit(scan, location, "", walk_filter))]
+        while stack:
+            relative, future = stack.pop()
+            files, directories = future.result()
+            for file_uri in sorted(files):
+                yield file_uri, relative
+
+            children = []
+            for child, name, key in sorted(directories):
+                if key in visited:
+                    # a symlink loop, or a second link to the same directory
+                    logger.info(f'Skipping "{child}", it was already walked')
+                    continue
+                visited.add(key)
+                child_relative = f"{relative}{name}/"
+                future = executor.submit(scan, child, child_relative, walk_filter)
+                children.append((child_relative, future))
+            # the first child is taken next
+            stack.extend(reversed(children))
+    finally:
+        # don't scan the rest if the caller stopped iterating
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def vfs_walk(uri, walk_filter=None):
+    """Get the URIs of all files in a directory, see iter_walk.
+
+    uri -- the base folder uri.
+    walk_filter -- optional WalkFilter
+    return a list of uri.
+    """
+    filelist = []
+    last_iteration = time.monotonic()
+    for file_uri, _ in iter_walk(uri, walk_filter=walk_filter):
+        filelist.append(file_uri)
+        if time.monotonic() - last_iteration > 0.05:
+            # keep the ui responsive
+            gtk_iteration()
+            last_iteration = time.monotonic()
     return filelist
 
 
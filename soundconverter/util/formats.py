@@ -80,9 +80,16 @@ def get_file_extension(mime):
     return suffix
 
 
-def get_quality_setting_name():
-    """Get the settings name for quality for the set output-mime-type."""
-    settings = get_gio_settings()
+def get_quality_setting_name(settings=None):
+    """Get the settings name for quality for the set output-mime-type.
+
+    Parameters
+    ----------
+    settings : Gio.Settings
+        Defaults to get_gio_settings()
+    """
+    if settings is None:
+        settings = get_gio_settings()
     mime_type = settings.get_string("output-mime-type")
     if mime_type == "audio/mpeg":
         mode = settings.get_string("mp3-mode")
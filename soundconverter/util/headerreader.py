@@ -0,0 +1,615 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Read tags and durations of common formats without gstreamer.
+
+Building a gstreamer pipeline only to read the tags and the duration of a
+file is slow, while for FLAC, MP3, Ogg, MP4 and WAV files that information
+sits in a few kilobytes of headers. Files are memory-mapped, so only the
+parts that are looked at are actually read from the disk.
+
+Whenever a file contains anything that is not fully understood, the
+reader gives up and the file is left to the Discoverer.
+"""
+
+import mmap
+import re
+import struct
+
+from soundconverter.util.fileoperations import unquote_filename
+
+
+class Unsupported(Exception):
+    """The file has to be discovered by gstreamer instead."""
+
+
+# tag names are the same as the ones gstreamer uses
+VORBIS_COMMENTS = {
+    "TITLE": "title",
+    "ARTIST": "artist",
+    "ALBUM": "album",
+    "ALBUMARTIST": "album-artist",
+    "ALBUM ARTIST": "album-artist",
+    "GENRE": "genre",
+    "TRACKNUMBER": "track-number",
+    "TRACKTOTAL": "track-count",
+    "TOTALTRACKS": "track-count",
+    "DISCNUMBER": "album-disc-number",
+    "DISCTOTAL": "album-disc-count",
+    "TOTALDISCS": "album-disc-count",
+    "DATE": "date",
+}
+
+ID3_FRAMES = {
+    "TIT2": "title",
+    "TPE1": "artist",
+    "TALB": "album",
+    "TPE2": "album-artist",
+    "TCON": "genre",
+    "TRCK": "track-number",
+    "TPOS": "album-disc-number",
+    "TDRC": "date",
+    "TYER": "date",
+}
+
+MP4_ATOMS = {
+    b"\xa9nam": "title",
+    b"\xa9ART": "artist",
+    b"\xa9alb": "album",
+    b"aART": "album-artist",
+    b"\xa9gen": "genre",
+    b"\xa9day": "date",
+}
+
+RIFF_INFO = {
+    b"INAM": "title",
+    b"IART": "artist",
+    b"IPRD": "album",
+    b"IGNR": "genre",
+    b"ICRD": "date",
+    b"ITRK": "track-number",
+}
+
+# which tags hold a total in "number/total" notation
+COUNTS = {
+    "track-number": "track-count",
+    "album-disc-number": "album-disc-count",
+}
+
+DATE_PATTERN = re.compile(r"^(\d{4})(-\d\d(-\d\d)?)?")
+
+# MPEG audio frame headers, indexed by the version bits
+MPEG_SAMPLE_RATES = {
+    0b11: (44100, 48000, 32000),
+    0b10: (22050, 24000, 16000),
+    0b00: (11025, 12000, 8000),
+}
+MPEG1_BITRATES = {
+    0b11: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    0b10: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    0b01: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+}
+MPEG2_BITRATES = {
+    0b11: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    0b10: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    0b01: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+
+def read_header(sound_file, needed_tags=None):
+    """Fill tags, duration, codec and readable of a SoundFile.
+
+    Returns True if the file was fully understood. Otherwise the
+    SoundFile is not modified and False is returned, so that it can be
+    handed to the Discoverer.
+
+    Parameters
+    ----------
+    sound_file : SoundFile
+        The file to read
+    needed_tags : set
+        If set, only those tags are added to the SoundFile
+    """
+    if not sound_file.uri.startswith("file://"):
+        return False
+    path = unquote_filename(sound_file.uri[len("file://") :])
+
+    try:
+        with (
+            open(path, "rb") as file,
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data,
+        ):
+            codec, duration, tags = parse(data)
+    except (OSError, ValueError, IndexError, struct.error, Unsupported):
+        # ValueError also covers empty files, which can't be mapped, and
+        # UnicodeDecodeError
+        return False
+
+    if duration <= 0:
+        return False
+
+    if needed_tags is not None:
+        tags = {tag: value for tag, value in tags.items() if tag in needed_tags}
+
+    sound_file.codec = codec
+    sound_file.duration = duration
+    sound_file.tags.update(tags)
+    sound_file.readable = True
+    return True
+
+
+def parse(data):
+    """Get the codec, duration and tags of a file in a bytes-like object."""
+    if data[:4] == b"fLaC":
+        return parse_flac(data)
+    if data[:4] == b"OggS":
+        return parse_ogg(data)
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return parse_wav(data)
+    if data[4:8] == b"ftyp":
+        return parse_mp4(data)
+    if data[:3] == b"ID3" or (data[0] == 0xFF and data[1] & 0xE0 == 0xE0):
+        return parse_mp3(data)
+    raise Unsupported()
+
+
+def add_tag(tags, tag, value):
+    """Add a text value like gstreamer would, for example "3/12" tracks."""
+    value = value.strip("\0").strip()
+    if not value:
+        return
+
+    if tag == "date":
+        match = DATE_PATTERN.match(value)
+        if match is None:
+            raise Unsupported()
+        tags["year"] = int(match.group(1))
+        tags["date"] = match.group(0)
+        return
+
+    if tag in COUNTS or tag in COUNTS.values():
+        number, _, count = value.partition("/")
+        if not number.strip().isdigit():
+            raise Unsupported()
+        tags[tag] = str(int(number))
+        if count.strip().isdigit() and tag in COUNTS:
+            tags[COUNTS[tag]] = str(int(count))
+        return
+
+    if tag in tags:
+        # multiple values are joined, like gstreamer does for strings
+        tags[tag] = f"{tags[tag]}, {value}"
+    else:
+        tags[tag] = value
+
+
+def parse_vorbis_comment(data, offset, end):
+    """Read a vorbis comment block, as used by FLAC, Vorbis and Opus."""
+    tags = {}
+    (vendor_length,) = struct.unpack_from("<I", data, offset)
+    offset += 4 + vendor_length
+    (count,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    for _ in range(count):
+        (length,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        if offset + length > end:
+            raise Unsupported()
+        comment = bytes(data[offset : offset + length]).decode("utf-8")
+        offset += length
+        key, _, value = comment.partition("=")
+        tag = VORBIS_COMMENTS.get(key.upper())
+        if tag is not None:
+            add_tag(tags, tag, value)
+    return tags
+
+
+def parse_flac(data):
+    """Read the STREAMINFO and VORBIS_COMMENT blocks of a FLAC file."""
+    duration = None
+    tags = {}
+    offset = 4
+    last = False
+    while not last:
+        header = data[offset]
+        last = header & 0x80
+        block_type = header & 0x7F
+        length = int.from_bytes(data[offset + 1 : offset + 4], "big")
+        offset += 4
+        if block_type == 0:
+            (info,) = struct.unpack_from(">Q", data, offset + 10)
+            sample_rate = info >> 44
+            samples = info & 0xFFFFFFFFF
+            if sample_rate == 0 or samples == 0:
+                raise Unsupported()
+            duration = samples / sample_rate
+        elif block_type == 4:
+            tags = parse_vorbis_comment(data, offset, offset + length)
+        offset += length
+
+    if duration is None:
+        raise Unsupported()
+    return "audio/x-flac", duration, tags
+
+
+def read_ogg_packets(data, count):
+    """Read the first packets of an ogg file that has a single stream."""
+    packets = []
+    packet = b""
+    offset = 0
+    serial = None
+    while len(packets) < count:
+        if data[offset : offset + 4] != b"OggS":
+            raise Unsupported()
+        page_serial, _, _, segments = struct.unpack_from("<IIIB", data, offset + 14)
+        if serial is None:
+            serial = page_serial
+        elif page_serial != serial:
+            # multiplexed streams, like audio with a video
+            raise Unsupported()
+        lacing = data[offset + 27 : offset + 27 + segments]
+        offset += 27 + segments
+        for lace in lacing:
+            packet += data[offset : offset + lace]
+            offset += lace
+            if lace < 255:
+                packets.append(packet)
+                packet = b""
+    return serial, packets
+
+
+def get_last_granule(data, serial):
+    """Find the granule position of the last page of an ogg stream."""
+    offset = data.rfind(b"OggS", max(0, len(data) - 65536))
+    while offset >= 0:
+        granule, page_serial = struct.unpack_from("<qI", data, offset + 6)
+        if page_serial != serial:
+            raise Unsupported()
+        if granule >= 0:
+            return granule
+        offset = data.rfind(b"OggS", max(0, len(data) - 65536), offset)
+    raise Unsupported()
+
+
+def parse_ogg(data):
+    """Read the identification and comment headers of Vorbis or Opus."""
+    serial, packets = read_ogg_packets(data, 2)
+    identification, comment = packets[:2]
+
+    if identification[:7] == b"\x01vorbis" and comment[:7] == b"\x03vorbis":
+        (sample_rate,) = struct.unpack_from("<I", identification, 12)
+        tags = parse_vorbis_comment(comment, 7, len(comment))
+        duration = get_last_granule(data, serial) / sample_rate
+        return "audio/x-vorbis", duration, tags
+
+    if identification[:8] == b"OpusHead" and comment[:8] == b"OpusTags":
+        (pre_skip,) = struct.unpack_from("<H", identification, 10)
+        tags = parse_vorbis_comment(comment, 8, len(comment))
+        # opus granule positions are always in 48 kHz
+        duration = (get_last_granule(data, serial) - pre_skip) / 48000
+        return "audio/x-opus", duration, tags
+
+    raise Unsupported()
+
+
+def parse_wav(data):
+    """Read the fmt, data and LIST INFO chunks of a WAV file."""
+    byte_rate = None
+    size = None
+    tags = {"container-format": "WAV"}
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = data[offset : offset + 4]
+        (length,) = struct.unpack_from("<I", data, offset + 4)
+        offset += 8
+        if chunk_id == b"fmt ":
+            format_tag, _, _, byte_rate = struct.unpack_from("<HHII", data, offset)
+            # only plain pcm and float, gstreamer knows all the others
+            if format_tag not in (1, 3) or byte_rate == 0:
+                raise Unsupported()
+        elif chunk_id == b"data":
+            # the size may be unknown if it was written as a stream
+            size = min(length, len(data) - offset)
+        elif chunk_id == b"LIST" and data[offset : offset + 4] == b"INFO":
+            position = offset + 4
+            while position + 8 <= offset + length:
+                info_id = data[position : position + 4]
+                (info_length,) = struct.unpack_from("<I", data, position + 4)
+                position += 8
+                if info_id in RIFF_INFO:
+                    value = data[position : position + info_length]
+                    add_tag(tags, RIFF_INFO[info_id], bytes(value).decode("utf-8"))
+                position += info_length + info_length % 2
+        # chunks are padded to an even size
+        offset += length + length % 2
+
+    if byte_rate is None or size is None:
+        raise Unsupported()
+    return "audio/x-raw", size / byte_rate, tags
+
+
+def iter_atoms(data, offset, end):
+    """Yield type, start and end of each MP4 atom in a range."""
+    while offset + 8 <= end:
+        (size,) = struct.unpack_from(">I", data, offset)
+        atom_type = bytes(data[offset + 4 : offset + 8])
+        header = 8
+        if size == 1:
+            (size,) = struct.unpack_from(">Q", data, offset + 8)
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            raise Unsupported()
+        yield atom_type, offset + header, offset + size
+        offset += size
+
+
+def find_atom(data, offset, end, *path):
+    """Find the start and end of the content of a nested MP4 atom."""
+    for name in path:
+        for atom_type, start, stop in iter_atoms(data, offset, end):
+            if atom_type == name:
+                offset, end = start, stop
+                break
+        else:
+            return None
+    return offset, end
+
+
+def parse_mp4(data):
+    """Read the movie header, the audio track and the iTunes metadata."""
+    moov = find_atom(data, 0, len(data), b"moov")
+    if moov is None:
+        raise Unsupported()
+
+    mvhd = find_atom(data, *moov, b"mvhd")
+    if mvhd is None:
+        raise Unsupported()
+    start = mvhd[0]
+    if data[start] == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, start + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, start + 12)
+    if timescale == 0:
+        raise Unsupported()
+
+    codec = None
+    for atom_type, start, stop in iter_atoms(data, *moov):
+        if atom_type != b"trak":
+            continue
+        hdlr = find_atom(data, start, stop, b"mdia", b"hdlr")
+        if hdlr is None:
+            raise Unsupported()
+        handler = data[hdlr[0] + 8 : hdlr[0] + 12]
+        if handler == b"soun" and codec is None:
+            stsd = find_atom(data, start, stop, b"mdia", b"minf", b"stbl", b"stsd")
+            if stsd is None:
+                raise Unsupported()
+            # skip version, flags and the number of entries
+            entry = data[stsd[0] + 12 : stsd[0] + 16]
+            codecs = {b"mp4a": "audio/mpeg", b"alac": "audio/x-alac"}
+            if entry not in codecs:
+                raise Unsupported()
+            codec = codecs[entry]
+        elif handler not in (b"soun", b"text"):
+            # a video or something, better ask gstreamer
+            raise Unsupported()
+
+    if codec is None:
+        raise Unsupported()
+
+    tags = {}
+    meta = find_atom(data, *moov, b"udta", b"meta")
+    if meta is not None:
+        # meta is a full atom with 4 bytes of version and flags
+        ilst = find_atom(data, meta[0] + 4, meta[1], b"ilst")
+        if ilst is not None:
+            parse_ilst(data, ilst, tags)
+
+    return codec, duration / timescale, tags
+
+
+def parse_ilst(data, ilst, tags):
+    """Read iTunes metadata items."""
+    for atom_type, start, stop in iter_atoms(data, *ilst):
+        content = find_atom(data, start, stop, b"data")
+        if content is None:
+            continue
+        # skip the type and the locale
+        value = data[content[0] + 8 : content[1]]
+        if atom_type in MP4_ATOMS:
+            add_tag(tags, MP4_ATOMS[atom_type], bytes(value).decode("utf-8"))
+        elif atom_type in (b"trkn", b"disk"):
+            number, count = struct.unpack_from(">HH", value, 2)
+            tag = "track-number" if atom_type == b"trkn" else "album-disc-number"
+            if number:
+                tags[tag] = str(number)
+            if count:
+                tags[COUNTS[tag]] = str(count)
+        elif atom_type == b"gnre":
+            # a numbered id3 genre
+            raise Unsupported()
+
+
+def decode_id3_text(frame):
+    """Decode the content of an ID3v2 text frame."""
+    encoding = frame[0]
+    text = frame[1:]
+    if encoding == 0:
+        return text.decode("latin-1")
+    if encoding == 1:
+        return text.decode("utf-16")
+    if encoding == 2:
+        return text.decode("utf-16-be")
+    if encoding == 3:
+        return text.decode("utf-8")
+    raise Unsupported()
+
+
+def parse_id3v2(data, tags):
+    """Read the text frames of an ID3v2.3 or ID3v2.4 tag.
+
+    Returns where the audio starts.
+    """
+    version, _, flags = data[3], data[4], data[5]
+    if version not in (3, 4):
+        raise Unsupported()
+    # unsynchronisation would have to be reverted first
+    if flags & 0x80:
+        raise Unsupported()
+
+    size = syncsafe(data[6:10])
+    offset = 10
+    end = 10 + size
+    if flags & 0x40:
+        # skip the extended header
+        if version == 4:
+            offset += syncsafe(data[10:14])
+        else:
+            offset += 4 + struct.unpack_from(">I", data, 10)[0]
+
+    while offset + 10 <= end:
+        frame_id = bytes(data[offset : offset + 4])
+        if frame_id[0] == 0:
+            # padding
+            break
+        if version == 4:
+            frame_size = syncsafe(data[offset + 4 : offset + 8])
+        else:
+            (frame_size,) = struct.unpack_from(">I", data, offset + 4)
+        (frame_flags,) = struct.unpack_from(">H", data, offset + 8)
+        offset += 10
+        tag = ID3_FRAMES.get(frame_id.decode("latin-1"))
+        if tag is not None:
+            # compressed, encrypted or unsynchronised frames
+            if frame_flags & 0x00FF:
+                raise Unsupported()
+            text = decode_id3_text(bytes(data[offset : offset + frame_size]))
+            if tag == "genre" and re.match(r"^\(\d+\)|^\d+$", text):
+                # a numbered id3v1 genre
+                raise Unsupported()
+            # ID3v2.4 separates multiple values with null bytes
+            for value in text.split("\0"):
+                add_tag(tags, tag, value)
+        offset += frame_size
+
+    if flags & 0x10:
+        # footer
+        end += 10
+    return end
+
+
+def syncsafe(data):
+    """Decode a 28 bit integer that is spread over 4 bytes."""
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def parse_id3v1(data, tags):
+    """Add the tags of an ID3v1 tag that are missing in the ID3v2 tag."""
+    values = {
+        "title": data[3:33],
+        "artist": data[33:63],
+        "album": data[63:93],
+        "date": data[93:97],
+    }
+    for tag, value in values.items():
+        if tag not in tags:
+            add_tag(tags, tag, bytes(value).decode("latin-1"))
+    if data[125] == 0 and data[126] != 0 and "track-number" not in tags:
+        tags["track-number"] = str(data[126])
+    if data[127] != 255 and "genre" not in tags:
+        # a numbered genre
+        raise Unsupported()
+
+
+def parse_mpeg_frame(data, offset):
+    """Get samples per frame, sample rate, bitrate and length of a frame."""
+    (header,) = struct.unpack_from(">I", data, offset)
+    if header >> 21 != 0x7FF:
+        raise Unsupported()
+    version = (header >> 19) & 0b11
+    layer = (header >> 17) & 0b11
+    bitrate_index = (header >> 12) & 0b1111
+    sample_rate_index = (header >> 10) & 0b11
+    padding = (header >> 9) & 1
+    if version == 0b01 or layer == 0 or sample_rate_index == 3:
+        raise Unsupported()
+    if bitrate_index in (0, 15):
+        # free format
+        raise Unsupported()
+
+    sample_rate = MPEG_SAMPLE_RATES[version][sample_rate_index]
+    if version == 0b11:
+        bitrate = MPEG1_BITRATES[layer][bitrate_index] * 1000
+    else:
+        bitrate = MPEG2_BITRATES[layer][bitrate_index] * 1000
+
+    if layer == 0b11:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 0b01 and version != 0b11:
+        samples = 576
+        length = 72 * bitrate // sample_rate + padding
+    else:
+        samples = 1152
+        length = 144 * bitrate // sample_rate + padding
+
+    return samples, sample_rate, bitrate, length
+
+
+def parse_mp3(data):
+    """Read the ID3 tags and the duration of an MPEG audio file."""
+    tags = {}
+    start = 0
+    if data[:3] == b"ID3":
+        start = parse_id3v2(data, tags)
+
+    end = len(data)
+    if end >= 128 and data[end - 128 : end - 125] == b"TAG":
+        parse_id3v1(data[end - 128 : end], tags)
+        end -= 128
+
+    samples, sample_rate = parse_mpeg_frame(data, start)[:2]
+
+    # a Xing or Info header in the first frame knows the number of frames
+    (header,) = struct.unpack_from(">I", data, start)
+    version = (header >> 19) & 0b11
+    mono = (header >> 6) & 0b11 == 0b11
+    if version == 0b11:
+        xing = start + (21 if mono else 36)
+    else:
+        xing = start + (13 if mono else 21)
+    if data[xing : xing + 4] in (b"Xing", b"Info"):
+        (flags,) = struct.unpack_from(">I", data, xing + 4)
+        if not flags & 1:
+            raise Unsupported()
+        (frames,) = struct.unpack_from(">I", data, xing + 8)
+        return "audio/mpeg", frames * samples / sample_rate, tags
+    if data[start + 36 : start + 40] == b"VBRI":
+        (frames,) = struct.unpack_from(">I", data, start + 50)
+        return "audio/mpeg", frames * samples / sample_rate, tags
+
+    # Without such a header, the size only tells the duration if the bitrate
+    # is constant. Two frames with the same bitrate don't prove that, and
+    # checking all of them would mean reading the whole file.
+    raise Unsupported()
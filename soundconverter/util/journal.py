@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+"""Append-only record of the conversions of a batch run.
+
+If a batch run gets interrupted, the journal tells which files were already
+converted and which temporary files are left behind, so that the run can be
+continued with --resume without discovering and checking every file again.
+"""
+
+import hashlib
+import json
+import os
+
+from gi.repository import GLib
+
+from soundconverter.util.fileoperations import beautify_uri, vfs_exists, vfs_unlink
+from soundconverter.util.logger import logger
+
+QUEUED = "queued"
+STARTED = "started"
+MOVING = "moving"
+FINISHED = "finished"
+FAILED = "failed"
+
+
+def get_journal_path(input_files, output_uri, mime_type):
+    """Get where the journal of converting input_files into output_uri is stored.
+
+    Parameters
+    ----------
+    input_files : list
+        Paths or uris as they were passed on the command line. Their order
+        doesn't matter, and relative paths are made absolute.
+    output_uri : string
+    mime_type : string
+    """
+    inputs = sorted(
+        path if "://" in path else os.path.abspath(path) for path in input_files
+    )
+    key = json.dumps([inputs, output_uri, mime_type])
+    key = hashlib.sha1(key.encode()).hexdigest()
+    return os.path.join(
+        GLib.get_user_cache_dir(),
+        "soundconverter",
+        "journals",
+        f"{key}.jsonl",
+    )
+
+
+class Journal:
+    """Write down the state of each Converter of a batch run."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def read(self):
+        """Get the last known state of each input uri.
+
+        Returns a dict of uri to the last journal entry of that uri. Entries
+        of renamed files keep the entry of the start of their conversion and
+        list the final uris in "moved".
+        """
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+
+        with open(self.path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # the last line may be incomplete after a crash
+                    continue
+                if entry["event"] == MOVING:
+                    started = entries.get(entry["uri"], {})
+                    moved = started.get("moved", []) + [entry["target"]]
+                    entry = {**started, "event": MOVING, "moved": moved}
+                entries[entry["uri"]] = entry
+        return entries
+
+    def exists(self):
+        """Check if there is a journal that can be resumed."""
+        return os.path.exists(self.path)
+
+    def start(self):
+        """Start a new journal, dropping the previous one."""
+        if os.path.exists(self.path):
+            logger.info("discarding the journal of a previous run")
+        self._open("w")
+
+    def resume(self):
+        """Continue the journal of an interrupted run.
+
+        Removes temporary files of conversions that were interrupted. Returns
+        the set of input uris that have already been converted.
+        """
+        entries = self.read()
+        completed = set()
+        for uri, entry in entries.items():
+            if entry["event"] == FINISHED:
+                completed.add(uri)
+            elif entry["event"] == MOVING and self._was_moved(entry):
+                # interrupted after renaming, but before writing that down
+                completed.add(uri)
+            elif entry["event"] in (STARTED, MOVING):
+                for temp in self._get_temps(entry):
+                    if vfs_exists(temp):
+                        logger.info(
+                            f"removing stale temporary file {beautify_uri(temp)}"
+                        )
+                        vfs_unlink(temp)
+
+        logger.info(
+            f"resuming: {len(completed)} of {len(entries)} files already converted"
+        )
+        self._open("a")
+        return completed
+
+    def _get_temps(self, entry):
+        """Get the temporary files of all outputs of a started conversion."""
+        if "temps" in entry:
+            return entry["temps"]
+        # journals of older versions only knew a single output
+        return [entry["temp"]] if entry.get("temp") else []
+
+    def _was_moved(self, entry):
+        """Check if all temporary files of the entry reached their target."""
+        if any(vfs_exists(temp) for temp in self._get_temps(entry)):
+            return False
+        return all(vfs_exists(target) for target in entry["moved"])
+
+    def _open(self, mode):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.path, mode, encoding="utf-8")
+
+    def _write(self, event, converter, flush=True, target=None):
+        entry = {"event": event, "uri": converter.sound_file.uri}
+        if target is not None:
+            entry["target"] = target
+        elif converter.newname is not None:
+            entry["target"] = converter.newname
+        if event == STARTED:
+            # extra outputs write temporary files of their own
+            entry["temps"] = converter.get_temporary_filenames()
+        if event == FINISHED and converter.output_uri is not None:
+            entry["target"] = converter.output_uri
+        self.file.write(json.dumps(entry) + "\n")
+        if flush:
+            self.file.flush()
+
+    def add(self, converter):
+        """Track the Converter and write down that it is queued."""
+        # queued entries are only interesting together with later entries,
+        # so don't flush for each of the possibly many files.
+        self._write(QUEUED, converter, flush=False)
+        converter.connect("started", self.on_started)
+        converter.connect("moving", self.on_moving)
+        converter.connect("done", self.on_done)
+
+    def on_started(self, converter):
+        self._write(STARTED, converter)
+
+    def on_moving(self, converter, target):
+        self._write(MOVING, converter, target=target)
+
+    def on_done(self, converter):
+        self._write(FAILED if converter.error else FINISHED, converter)
+
+    def close(self, remove=False):
+        """Close the journal, and delete it if nothing is left to resume."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
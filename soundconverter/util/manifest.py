@@ -0,0 +1,365 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Remember which target was generated from which source for --sync.
+
+A source is only converted again if its size or mtime changed since, or if
+its target is gone. Unchanged sources are skipped before they are
+discovered, so a run over an unchanged library only stats files.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from threading import Lock
+
+from gi.repository import GLib
+
+from soundconverter.util.fileoperations import (
+    beautify_uri,
+    unquote_filename,
+    vfs_exists,
+    vfs_unlink,
+)
+from soundconverter.util.logger import logger
+from soundconverter.util.settings import get_gio_settings
+
+# what Manifest.check found out about a source
+NEW = "new"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+
+# increase this if the stored information changes, to discard old manifests
+SCHEMA_VERSION = 2
+
+# gio settings that change the targets. If one of them is different from
+# the previous run, all sources are converted again.
+TARGET_SETTINGS = (
+    ("output-mime-type", "string"),
+    ("selected-folder", "string"),
+    ("same-folder-as-input", "boolean"),
+    ("create-subfolders", "boolean"),
+    ("subfolder-pattern-index", "int"),
+    ("name-pattern-index", "int"),
+    ("custom-filename-pattern", "string"),
+    ("replace-messy-chars", "boolean"),
+    ("vorbis-oga-extension", "boolean"),
+    ("output-resample", "boolean"),
+    ("resample-rate", "int"),
+    ("force-mono", "boolean"),
+    ("mp3-mode", "string"),
+    ("mp3-cbr-quality", "int"),
+    ("mp3-abr-quality", "int"),
+    ("mp3-vbr-quality", "int"),
+    ("vorbis-quality", "double"),
+    ("aac-quality", "int"),
+    ("opus-bitrate", "int"),
+    ("flac-compression", "int"),
+    ("wav-sample-width", "int"),
+    ("wma-bitrate", "int"),
+)
+
+
+def get_manifest_path(output_uri, mime_type):
+    """Get where the manifest of conversions into output_uri is stored."""
+    key = hashlib.sha1(f"{output_uri} {mime_type}".encode()).hexdigest()
+    return os.path.join(
+        GLib.get_user_cache_dir(),
+        "soundconverter",
+        "manifests",
+        f"{key}.db",
+    )
+
+
+def get_settings_fingerprint():
+    """Get a hash of all gio settings that change the targets."""
+    gio_settings = get_gio_settings()
+    values = [
+        getattr(gio_settings, f"get_{kind}")(key) for key, kind in TARGET_SETTINGS
+    ]
+    return hashlib.sha1(json.dumps(values).encode()).hexdigest()
+
+
+def get_local_path(uri):
+    """Get the path of a file:// uri, or None for other uris."""
+    if not uri.startswith("file://"):
+        return None
+    return unquote_filename(uri[len("file://") :])
+
+
+def target_exists(uri):
+    """Check if a target is still there, without gio for local files."""
+    path = get_local_path(uri)
+    if path is not None:
+        return os.path.exists(path)
+    return vfs_exists(uri)
+
+
+class Manifest:
+    """SQLite database of sources and the targets that were made of them.
+
+    check is called while walking over the sources, record and
+    remove_missing in the main thread. remove_missing should only be called
+    after all conversions are done, so that no target is deleted that a
+    conversion of this run still writes.
+    """
+
+    # how many new entries are collected before they are committed
+    commit_interval = 500
+
+    def __init__(self, path, fingerprint, target_index=None):
+        """Open the manifest, and create it if it doesn't exist yet.
+
+        Parameters
+        ----------
+        path : string
+            Path of the database file
+        fingerprint : string
+            Identifies the settings that the targets are made with, see
+            get_settings_fingerprint. If it differs from the one of the
+            previous run, every source counts as changed.
+        target_index : TargetIndex
+            If set, deleted targets are removed from it
+        """
+        self.path = path
+        self.target_index = target_index
+        self.lock = Lock()
+        self.uncommitted = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.connection.execute("DROP TABLE IF EXISTS sources")
+            self.connection.execute("DROP TABLE IF EXISTS fingerprint")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            "uri TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, target TEXT)"
+        )
+        # for finding other sources of a target without scanning all of them
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS sources_target ON sources (target)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprint (value TEXT)",
+        )
+        self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+        # size, mtime and state of the sources seen in this run. Not kept in
+        # a dict, because that would grow with the size of the library.
+        self.connection.execute("PRAGMA temp_store = FILE")
+        self.connection.execute(
+            "CREATE TEMP TABLE seen ("
+            "uri TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, state TEXT)"
+        )
+        # targets that were recorded in this run, they are never deleted
+        self.connection.execute("CREATE TEMP TABLE recorded (target TEXT PRIMARY KEY)")
+
+        row = self.connection.execute("SELECT value FROM fingerprint").fetchone()
+        if row is not None and row[0] != fingerprint:
+            logger.info("the output settings changed, converting everything again")
+            # keep the targets around, so that they can be replaced
+            self.connection.execute("UPDATE sources SET size = -1")
+        self.connection.execute("DELETE FROM fingerprint")
+        self.connection.execute("INSERT INTO fingerprint VALUES (?)", (fingerprint,))
+        self.connection.commit()
+
+    def check(self, uri):
+        """Find out if the source has to be converted.
+
+        Returns NEW, CHANGED or UNCHANGED. Sources that are not local files
+        are always NEW, because they can't be checked cheaply.
+        """
+        path = get_local_path(uri)
+        if path is None:
+            return NEW
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return NEW
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT size, mtime, target FROM sources WHERE uri = ?",
+                (uri,),
+            ).fetchone()
+
+        if row is None:
+            state = NEW
+        elif tuple(row[:2]) == (stat.st_size, stat.st_mtime_ns) and target_exists(
+            row[2]
+        ):
+            state = UNCHANGED
+        else:
+            state = CHANGED
+
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO seen VALUES (?, ?, ?, ?)",
+                (uri, stat.st_size, stat.st_mtime_ns, state),
+            )
+        return state
+
+    def _get_seen(self, uri):
+        return self.connection.execute(
+            "SELECT size, mtime, state FROM seen WHERE uri = ?",
+            (uri,),
+        ).fetchone()
+
+    def get_state(self, uri):
+        """Get what check returned for the uri, or None if not checked."""
+        with self.lock:
+            seen = self._get_seen(uri)
+        return None if seen is None else seen[2]
+
+    def get_target(self, uri):
+        """Get the target that was recorded for the source, or None."""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT target FROM sources WHERE uri = ?",
+                (uri,),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def get_owner(self, target, uri):
+        """Get another source that still exists and was converted to target.
+
+        Returns None if there is none besides uri.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT uri FROM sources WHERE target = ? AND uri != ?",
+                (target, uri),
+            ).fetchall()
+        for (owner,) in rows:
+            path = get_local_path(owner)
+            if path is None or os.path.exists(path):
+                return owner
+        return None
+
+    def record(self, uri, target, delete_old=False):
+        """Write down that the source was converted to the target.
+
+        Parameters
+        ----------
+        uri : string
+            The source, which has to have been checked before
+        target : string
+            The uri of the converted file
+        delete_old : bool
+            If the source used to have a different target, delete that one
+        """
+        with self.lock:
+            seen = self._get_seen(uri)
+            if seen is None:
+                return
+
+            if delete_old:
+                row = self.connection.execute(
+                    "SELECT target FROM sources WHERE uri = ?",
+                    (uri,),
+                ).fetchone()
+                if row is not None and row[0] != target:
+                    self._delete_target(row[0], uri)
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+                (uri, seen[0], seen[1], target),
+            )
+            self.connection.execute(
+                "INSERT OR IGNORE INTO recorded VALUES (?)",
+                (target,),
+            )
+            self.uncommitted += 1
+            if self.uncommitted >= self.commit_interval:
+                self.connection.commit()
+                self.uncommitted = 0
+
+    def remove_missing(self, delete=False):
+        """Forget sources that don't exist anymore.
+
+        Only sources that were not seen in this run and that are really gone
+        are removed, not those that were filtered out or couldn't be walked
+        over. Returns how many there were.
+
+        Parameters
+        ----------
+        delete : bool
+            Also delete their targets, unless another source has the same
+            target. For example after a source was renamed.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT uri, target FROM sources "
+                "WHERE uri NOT IN (SELECT uri FROM seen)"
+            )
+            missing = []
+            for uri, target in rows:
+                path = get_local_path(uri)
+                if path is None or os.path.exists(path):
+                    continue
+                missing.append((uri, target))
+
+            for uri, target in missing:
+                if delete:
+                    self._delete_target(target, uri)
+                self.connection.execute("DELETE FROM sources WHERE uri = ?", (uri,))
+            self.connection.commit()
+            self.uncommitted = 0
+
+        if missing:
+            action = "deleted the targets of" if delete else "forgot"
+            logger.info(f"{action} {len(missing)} removed source files")
+        return len(missing)
+
+    def _is_referenced(self, target, uri):
+        """Check if a source other than uri still owns the target."""
+        row = self.connection.execute(
+            "SELECT 1 FROM sources WHERE target = ? AND uri != ? "
+            "UNION ALL SELECT 1 FROM recorded WHERE target = ?",
+            (target, uri, target),
+        ).fetchone()
+        return row is not None
+
+    def _delete_target(self, target, uri):
+        """Delete the target that was made of uri, unless it is still used."""
+        if self._is_referenced(target, uri):
+            return
+        if not target_exists(target):
+            return
+        logger.info(f"deleting '{beautify_uri(target)}'")
+        try:
+            vfs_unlink(target)
+        except Exception as error:
+            logger.error(f"cannot remove '{beautify_uri(target)}': {error}")
+            return
+        if self.target_index is not None:
+            self.target_index.remove(target)
+
+    def close(self):
+        """Commit and close the database."""
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
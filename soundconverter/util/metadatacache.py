@@ -0,0 +1,229 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Remember what the Discoverer found out about files between runs."""
+
+import json
+import os
+import sqlite3
+from threading import Lock
+
+from gi.repository import GLib
+
+from soundconverter.util.fileoperations import unquote_filename
+from soundconverter.util.logger import logger
+from soundconverter.util.settings import settings
+
+# values of settings["metadata-cache"]
+USE = "use"
+BYPASS = "bypass"
+REBUILD = "rebuild"
+
+# increase this if the stored information changes, to discard old caches
+SCHEMA_VERSION = 2
+
+
+def get_metadata_cache_path():
+    """Get where the metadata of previously discovered files is stored."""
+    return os.path.join(GLib.get_user_cache_dir(), "soundconverter", "metadata.db")
+
+
+def get_file_key(uri):
+    """Get what identifies a version of a local file.
+
+    Returns a tuple of (path, size, mtime, inode), or None if the uri
+    is not a local file that exists.
+    """
+    if not uri.startswith("file://"):
+        return None
+    path = unquote_filename(uri[len("file://") :])
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return path, stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+class MetadataCache:
+    """SQLite database of discovered tags, durations and readability.
+
+    Entries are only used if the size, mtime and inode of the file are
+    still the same as when it was discovered. Can be used from multiple
+    threads.
+    """
+
+    # how many new entries are collected before they are committed
+    commit_interval = 500
+
+    def __init__(self, path, rebuild=False):
+        """Open the cache, and create it if it doesn't exist yet.
+
+        Parameters
+        ----------
+        path : string
+            Path of the database file
+        rebuild : bool
+            If True, forget everything that is in the cache
+        """
+        self.path = path
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.uncommitted = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if rebuild or version != SCHEMA_VERSION:
+            self.connection.execute("DROP TABLE IF EXISTS files")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, inode INTEGER, "
+            "readable INTEGER, duration REAL, codec TEXT, tags TEXT, "
+            "needed_tags TEXT)"
+        )
+        self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.connection.commit()
+
+    def load(self, sound_file, needed_tags=None):
+        """Fill the SoundFile with cached information.
+
+        Returns True if the cache knew the file, False if it has to be
+        discovered.
+
+        Parameters
+        ----------
+        sound_file : SoundFile
+            The file to look up
+        needed_tags : set
+            If set, entries that were discovered with only some of the tags
+            are good enough, as long as they contain those. Otherwise all
+            tags are needed.
+        """
+        key = get_file_key(sound_file.uri)
+        if key is None:
+            return False
+
+        path, size, mtime, inode = key
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT size, mtime, inode, readable, duration, codec, tags, "
+                "needed_tags FROM files WHERE path = ?",
+                (path,),
+            ).fetchone()
+
+            if row is None or tuple(row[:3]) != (size, mtime, inode):
+                self.misses += 1
+                return False
+
+            if row[7] is not None and (
+                needed_tags is None or not needed_tags.issubset(json.loads(row[7]))
+            ):
+                # discovered with fewer tags than needed now
+                self.misses += 1
+                return False
+
+            self.hits += 1
+
+        sound_file.readable = bool(row[3])
+        sound_file.duration = row[4]
+        sound_file.codec = row[5]
+        sound_file.tags.update(json.loads(row[6]))
+        return True
+
+    def store(self, sound_file, needed_tags=None):
+        """Write down what was discovered about the SoundFile.
+
+        Parameters
+        ----------
+        sound_file : SoundFile
+            The discovered file
+        needed_tags : set
+            If set, the file was discovered with only those tags instead of
+            all of them
+        """
+        key = get_file_key(sound_file.uri)
+        if key is None:
+            return
+
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    *key,
+                    int(bool(sound_file.readable)),
+                    sound_file.duration,
+                    sound_file.codec,
+                    json.dumps(sound_file.tags),
+                    None if needed_tags is None else json.dumps(sorted(needed_tags)),
+                ),
+            )
+            self.uncommitted += 1
+            if self.uncommitted >= self.commit_interval:
+                self.connection.commit()
+                self.uncommitted = 0
+
+    def flush(self):
+        """Commit new entries and log how useful the cache was.
+
+        Should be called after each discovery run.
+        """
+        with self.lock:
+            self.connection.commit()
+            self.uncommitted = 0
+            if self.hits or self.misses:
+                logger.info(
+                    f"metadata cache: {self.hits} hits, {self.misses} misses",
+                )
+            self.hits = 0
+            self.misses = 0
+
+
+_metadata_cache = [None]
+
+
+def get_metadata_cache():
+    """Get the MetadataCache, or None if it shouldn't be used.
+
+    Opened on first use, as configured in settings["metadata-cache"].
+    """
+    mode = settings.get("metadata-cache", USE)
+    if mode == BYPASS:
+        return None
+
+    if _metadata_cache[0] is None:
+        path = get_metadata_cache_path()
+        try:
+            _metadata_cache[0] = MetadataCache(path, rebuild=mode == REBUILD)
+        except sqlite3.Error as error:
+            logger.warning(f"cannot use the metadata cache {path}: {error}")
+            settings["metadata-cache"] = BYPASS
+            return None
+
+    return _metadata_cache[0]
+
+
+def flush_metadata_cache():
+    """Commit and log the statistics of the cache, if it is in use."""
+    if _metadata_cache[0] is not None:
+        _metadata_cache[0].flush()
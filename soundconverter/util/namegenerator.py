@@ -41,6 +41,7 @@ from soundconverter.util.fileoperations import (
 )
 from soundconverter.util.formats import get_file_extension
 from soundconverter.util.settings import get_gio_settings
+from soundconverter.util.targetindex import TargetIndex
 
 basename_patterns = [
     ("{inputname}", _("Same as input, but replacing the suffix")),
@@ -123,15 +124,21 @@ def process_custom_pattern(pattern):
     return pattern
 
 
-def get_basename_pattern():
+def get_basename_pattern(settings=None):
     """Get the currently selected or custom filename pattern.
 
     For example '{artist}-{title}', without target extension.
 
     A custom-filename-pattern can also serve the purpose of a subfolder-pattern
     by having forward slashes.
+
+    Parameters
+    ----------
+    settings : Gio.Settings
+        Defaults to get_gio_settings()
     """
-    settings = get_gio_settings()
+    if settings is None:
+        settings = get_gio_settings()
 
     index = settings.get_int("name-pattern-index")
     if index >= len(basename_patterns) or index < -1:
@@ -145,21 +152,118 @@ def get_basename_pattern():
     return basename_patterns[index][0]
 
 
-def get_subfolder_pattern():
+def get_subfolder_pattern(settings=None):
     """Get the currently selected subfolder pattern.
 
     For example '{album-artist}/{album}', to create those new
     subfolders in the slected_folder based on tags.
+
+    Parameters
+    ----------
+    settings : Gio.Settings
+        Defaults to get_gio_settings()
     """
     # Since it is not a free text input on the ui, process_custom_pattern
     # doesn't have to be used
-    settings = get_gio_settings()
+    if settings is None:
+        settings = get_gio_settings()
     index = settings.get_int("subfolder-pattern-index")
     if index >= len(subfolder_patterns) or index < -1:
         index = 0
     return subfolder_patterns[index][0]
 
 
+class PatternTemplate:
+    """A filename pattern that is parsed once and then filled for each file.
+
+    Filling it only looks at the tags that the pattern needs.
+    """
+
+    # fields that are filled from the name of the input file
+    filename_fields = ("filename", "inputname", "title", "ext")
+
+    def __init__(self, pattern, target_ext):
+        """Parse the pattern.
+
+        Parameters
+        ----------
+        pattern : string
+            For example '{album-artist}/{album}/{title}'
+        target_ext : string
+            The extension of the output files, for {target-ext}
+        """
+        self.pattern = pattern
+
+        # the names of the tags in the pattern, without format specs
+        self.fields = []
+        for parsed in string.Formatter().parse(pattern):
+            field_name = parsed[1]
+            if not field_name:
+                continue
+            field = re.split(r"[.\[]", field_name)[0]
+            if field not in self.fields:
+                self.fields.append(field)
+
+        defaults = {
+            "target-ext": target_ext,
+            "album": _("Unknown Album"),
+            "artist": _("Unknown Artist"),
+            "album-artist": _("Unknown Artist"),
+            "track-number": 0,
+            "track-count": 0,
+            "genre": _("Unknown Genre"),
+            "year": _("Unknown Year"),
+            "date": _("Unknown Date"),
+            "album-disc-number": 0,
+            "album-disc-count": 0,
+        }
+        # what is used if the file doesn't have the tag. Fields that depend
+        # on the file are overwritten in fill.
+        self.fallbacks = {
+            field: defaults.get(field, f"Unknown {field.capitalize()}")
+            for field in self.fields
+        }
+        self.uses_filename = any(field in self.filename_fields for field in self.fields)
+        self.uses_timestamp = "timestamp" in self.fields
+        self.uses_album_artist = "album-artist" in self.fields
+
+    def fill(self, sound_file):
+        """Fill the tags of the SoundFile into the pattern."""
+        tags = sound_file.tags
+        mapping = self.fallbacks.copy()
+
+        if self.uses_filename:
+            filename = beautify_uri(sound_file.uri)
+            filename = os.path.basename(filename)
+            filename, ext = os.path.splitext(filename)
+            assert "/" not in filename
+            for field in self.filename_fields:
+                if field in mapping:
+                    mapping[field] = ext[1:] if field == "ext" else filename
+
+        for field in self.fields:
+            if field not in tags:
+                continue
+            value = tags[field]
+            if isinstance(value, str):
+                # take care of tags containing slashes
+                value = value.replace("/", "-")
+                if field.endswith("-number"):
+                    value = int(value)
+            mapping[field] = value
+
+        # when artist set & album-artist not, use artist for album-artist
+        if self.uses_album_artist and "artist" in tags and "album-artist" not in tags:
+            mapping["album-artist"] = tags["artist"]
+
+        if self.uses_timestamp:
+            # this could be split into more entries for more fine-grained
+            # control over the string by the user...
+            mapping["timestamp"] = time.strftime("%Y%m%d_%H_%M_%S")
+
+        return self.pattern.format(**mapping)
+
+
 class TargetNameGenerator:
     """Generator for creating the target name from an input name.
 
@@ -171,18 +275,32 @@ class TargetNameGenerator:
     queue, there is no need to create one TargetNameGenerator per Converter.
     """
 
-    def __init__(self):
+    def __init__(self, settings=None):
+        """Remember the settings for the names of the current queue.
+
+        Parameters
+        ----------
+        settings : Gio.Settings
+            Defaults to get_gio_settings(). Other ones are used for the
+            additional outputs of --extra-output.
+        """
         # remember settings from when TargetNameGenerator was created:
-        settings = get_gio_settings()
+        if settings is None:
+            settings = get_gio_settings()
         self.same_folder_as_input = settings.get_boolean("same-folder-as-input")
         self.selected_folder = settings.get_string("selected-folder")
         self.output_mime_type = settings.get_string("output-mime-type")
         self.vorbis_oga_extension = settings.get_boolean("vorbis-oga-extension")
         self.create_subfolders = settings.get_boolean("create-subfolders")
         self.replace_messy_chars = settings.get_boolean("replace-messy-chars")
-        self.subfolder_pattern = get_subfolder_pattern()
-        self.basename_pattern = get_basename_pattern()
+        self.subfolder_pattern = get_subfolder_pattern(settings)
+        self.basename_pattern = get_basename_pattern(settings)
         self.suffix = get_file_extension(self.output_mime_type)
+        # (pattern, suffix) to PatternTemplate
+        self.templates = {}
+        # the files in the output, instead of asking the filesystem for each
+        # name over and over again
+        self.target_index = TargetIndex()
 
         # Enforcing such rules helps to avoid undefined and untested
         # behaviour of functions and to reduce their complexity.
@@ -218,7 +336,7 @@ class TargetNameGenerator:
         return (scheme or "") + "".join([c if c in nice_chars else "_" for c in name])
 
     @staticmethod
-    def safe_uri(parent, child):
+    def safe_uri(parent, child, exists=vfs_exists):
         """Replace all unusual characters in child for non-existing folders.
 
         Replace all characters that are not ascii, digits or '.' '-' '_' '/'
@@ -241,6 +359,8 @@ class TargetNameGenerator:
             will not be modified (" " won't be replaced with "_" then, They
             will be escaped to %20 though to fit the URI format)
             For example "music/artist/file.mp3"
+        exists : function
+            Checks if an URI exists, for example TargetIndex.exists
         """
         # some validation of input parameters
         if not is_uri(parent):
@@ -279,7 +399,7 @@ class TargetNameGenerator:
         safe = ""
         while len(split) > 0:
             part = split.pop(0)
-            if vfs_exists(parent + safe + part):
+            if exists(parent + safe + part):
                 safe += part
             else:
                 # put the remaining unknown non-existing path back together
@@ -318,6 +438,25 @@ class TargetNameGenerator:
                 variables.append(variable)
         return variables
 
+    def get_needed_tags(self):
+        """Get the names of all tags that fill_pattern needs for target names.
+
+        Discovering only those is enough for converting.
+        """
+        patterns = [self.basename_pattern]
+        if self.create_subfolders:
+            patterns.append(self.subfolder_pattern)
+
+        needed_tags = set()
+        for pattern in patterns:
+            needed_tags.update(self.get_template(pattern).fields)
+
+        if "album-artist" in needed_tags:
+            # falls back to the artist
+            needed_tags.add("artist")
+
+        return needed_tags
+
     def fill_pattern(self, sound_file, pattern):
         """Fill tags into a filename pattern for a SoundFile.
 
@@ -330,68 +469,37 @@ class TargetNameGenerator:
             For example '{album-artist}/{album}/{title}'. Should not
             be an URI
         """
-        tags = sound_file.tags
+        return self.get_template(pattern).fill(sound_file)
 
-        filename = beautify_uri(sound_file.uri)
-        filename = os.path.basename(filename)
-        filename, ext = os.path.splitext(filename)
-        assert "/" not in filename
-        mapping = {
-            "filename": filename,
-            "inputname": filename,
-            "ext": ext[1:],
-            "target-ext": self.suffix,
-            "album": _("Unknown Album"),
-            "artist": _("Unknown Artist"),
-            "album-artist": _("Unknown Artist"),
-            "title": filename,
-            "track-number": 0,
-            "track-count": 0,
-            "genre": _("Unknown Genre"),
-            "year": _("Unknown Year"),
-            "date": _("Unknown Date"),
-            "album-disc-number": 0,
-            "album-disc-count": 0,
-        }
-
-        for key in tags:
-            mapping[key] = tags[key]
-            if isinstance(mapping[key], str):
-                # take care of tags containing slashes
-                mapping[key] = mapping[key].replace("/", "-")
-                if key.endswith("-number"):
-                    mapping[key] = int(mapping[key])
-
-        # when artist set & album-artist not, use artist for album-artist
-        if "artist" in tags and "album-artist" not in tags:
-            mapping["album-artist"] = tags["artist"]
-
-        # add timestamp to substitution dict -- this could be split into more
-        # entries for more fine-grained control over the string by the user...
-        timestamp_string = time.strftime("%Y%m%d_%H_%M_%S")
-        mapping["timestamp"] = timestamp_string
-
-        # if some tag is called "venue", map it to "Unknown Venue"
-        tags_in_pattern = self.find_format_string_tags(pattern)
-        unknown_tags = [tag for tag in tags_in_pattern if tag not in mapping]
-        for tag in unknown_tags:
-            mapping[tag] = f"Unknown {tag.capitalize()}"
-
-        # now fill the tags in the pattern with values:
-        return pattern.format(**mapping)
+    def get_template(self, pattern):
+        """Get the PatternTemplate of a pattern, which is parsed only once."""
+        key = (pattern, self.suffix)
+        template = self.templates.get(key)
+        if template is None:
+            template = PatternTemplate(pattern, self.suffix)
+            self.templates[key] = template
+        return template
 
     def generate_temp_path(self, sound_file):
-        """Generate a random filename that doesn't exist yet."""
+        """Generate a random filename that doesn't exist yet.
+
+        It is added to the target_index, so that it isn't used twice.
+        """
         basename = os.path.split(sound_file.uri)[1]
         parent_uri = self._get_common_target_uri(sound_file)
         while True:
             rand = str(random())[-6:]
             if self.replace_messy_chars:
                 filename = basename + "~" + rand + "~SC~"
-                final_uri = TargetNameGenerator.safe_uri(parent_uri, filename)
+                final_uri = TargetNameGenerator.safe_uri(
+                    parent_uri,
+                    filename,
+                    self.target_index.exists,
+                )
             else:
                 final_uri = parent_uri + basename + "~" + rand + "~SC~"
-            if not vfs_exists(final_uri):
+            if not self.target_index.exists(final_uri):
+                self.target_index.add(final_uri)
                 return final_uri
 
     def _get_target_subfolder(self, sound_file):
@@ -436,6 +544,12 @@ class TargetNameGenerator:
         # It's the deepest part of the target path though.
         return f"{self.fill_pattern(sound_file, self.basename_pattern)}.{self.suffix}"
 
+    def get_incremented_uri(self, uri, number):
+        """Append a number like " (1)" to the name, to get a different target."""
+        path, extension = os.path.splitext(uri)
+        space = "_" if self.replace_messy_chars else " "
+        return f"{path}{space}({number}){extension}"
+
     def generate_target_uri(self, sound_file, for_display=False):
         """Generate a target filename in URI format based on the settings.
 
@@ -469,7 +583,7 @@ class TargetNameGenerator:
 
         # subfolder and basename need to be cleaned
         if self.replace_messy_chars:
-            path = self.safe_uri(parent_uri, child)
+            path = self.safe_uri(parent_uri, child, self.target_index.exists)
         else:
             path = os.path.join(parent_uri, child)
 
@@ -0,0 +1,290 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Decide the target of each file before it is converted.
+
+Two inputs that would end up with the same target get different names when
+they are planned, instead of whichever finishes last getting " (1)". Plans
+can be printed with --dry-run, or written to a file with --write-plan and
+executed later with --plan, without discovering the files and generating
+their names again.
+"""
+
+import json
+import os
+from itertools import islice
+
+from soundconverter.util.fileoperations import beautify_uri
+from soundconverter.util.logger import logger
+from soundconverter.util.manifest import get_settings_fingerprint
+from soundconverter.util.soundfile import SoundFile
+
+# what happens with the target of a PlanEntry. SKIP and OVERWRITE are the
+# same as the existing behaviours of the Converter.
+CONVERT = "convert"
+OVERWRITE = "overwrite"
+SKIP = "skip"
+
+# increase this if the format of plan files changes
+PLAN_VERSION = 2
+
+
+class PlanEntry:
+    """The target of a single source and what to do with it.
+
+    Also remembers the duration and codec of the source, which the progress,
+    the remaining time and the task order are based on.
+    """
+
+    __slots__ = ("source", "target", "action", "duration", "codec")
+
+    def __init__(self, source, target, action, duration=None, codec=None):
+        self.source = source
+        self.target = target
+        self.action = action
+        self.duration = duration
+        self.codec = codec
+
+    def apply(self, converter):
+        """Make the Converter write to the planned target."""
+        converter.newname = self.target
+        if self.action != CONVERT:
+            converter.existing_behaviour = self.action
+
+
+class ConversionPlan:
+    """Targets of all files of a conversion.
+
+    Only to be used from the main thread.
+    """
+
+    def __init__(self, name_generator, keep_entries=True, manifest=None):
+        """Create an empty plan.
+
+        Parameters
+        ----------
+        name_generator : TargetNameGenerator
+            Makes the targets. Its target_index knows which of them exist.
+        keep_entries : bool
+            If False, added entries are only returned and not stored in
+            entries, for plans that are executed while they are made.
+        manifest : Manifest
+            With --sync, targets that other sources were converted to are
+            not replaced, and changed sources overwrite their own target.
+        """
+        self.name_generator = name_generator
+        self.keep_entries = keep_entries
+        self.manifest = manifest
+        # source uri to PlanEntry, in the order they were planned
+        self.entries = {}
+        # targets that are going to be written, to the source uri. Needed
+        # to tell collisions apart from existing files, so unlike entries
+        # it is always kept. It grows like the target_index, which knows
+        # all targets that were written anyway.
+        self.claimed = {}
+        self.num_collisions = 0
+
+    def add(self, sound_file, existing_behaviour):
+        """Plan the target of a discovered SoundFile.
+
+        Targets that are already claimed by a planned source get a number
+        appended. Which of two sources gets the number depends on the
+        order in which they are added, see add_all.
+
+        Parameters
+        ----------
+        sound_file : SoundFile
+        existing_behaviour : string
+            One of "increment", "overwrite" or "skip", what to do if the
+            target already exists
+        """
+        target_index = self.name_generator.target_index
+        target = self.name_generator.generate_target_uri(sound_file)
+        action = CONVERT
+
+        # With --sync, the output of a previous version of the source is
+        # replaced, and targets of unchanged sources, which are not planned,
+        # are taken.
+        own_target = None
+        other = self.claimed.get(target)
+        if self.manifest is not None:
+            own_target = self.manifest.get_target(sound_file.uri)
+            if other is None and target != own_target and target_index.exists(target):
+                other = self.manifest.get_owner(target, sound_file.uri)
+
+        if other is not None:
+            self.num_collisions += 1
+            logger.info(
+                f"'{beautify_uri(sound_file.uri)}' and '{beautify_uri(other)}' "
+                f"both have the target '{beautify_uri(target)}'",
+            )
+        elif target_index.exists(target) and target != own_target:
+            if existing_behaviour == SKIP:
+                action = SKIP
+            elif existing_behaviour == OVERWRITE:
+                action = OVERWRITE
+
+        if action == CONVERT:
+            number = 1
+            candidate = target
+            while candidate in self.claimed or (
+                candidate != own_target and target_index.exists(candidate)
+            ):
+                candidate = self.name_generator.get_incremented_uri(target, number)
+                number += 1
+            target = candidate
+            if target == own_target and target_index.exists(target):
+                action = OVERWRITE
+
+        entry = PlanEntry(
+            sound_file.uri,
+            target,
+            action,
+            sound_file.duration,
+            sound_file.codec,
+        )
+        if self.keep_entries:
+            self.entries[entry.source] = entry
+        if action != SKIP:
+            self.claimed[target] = entry.source
+        return entry
+
+    def add_all(self, sound_files, existing_behaviour):
+        """Plan many SoundFiles, ordered by their uri.
+
+        Colliding targets are resolved the same way every time, no matter
+        in which order the files were discovered.
+        """
+        for sound_file in sorted(sound_files, key=lambda s: s.uri):
+            self.add(sound_file, existing_behaviour)
+
+    def get(self, uri):
+        """Get the PlanEntry of a source uri, or None if not planned."""
+        return self.entries.get(uri)
+
+    def iter_sound_files(self):
+        """Yield a SoundFile for each planned source."""
+        for entry in self.entries.values():
+            sound_file = SoundFile(entry.source)
+            # it was discovered when the plan was made
+            sound_file.readable = True
+            sound_file.duration = entry.duration
+            sound_file.codec = entry.codec
+            yield sound_file
+
+    def log(self):
+        """Print what the plan would do."""
+        for entry in self.entries.values():
+            logger.info(
+                f"{entry.action}: '{beautify_uri(entry.source)}' -> "
+                f"'{beautify_uri(entry.target)}'",
+            )
+        skipped = len([e for e in self.entries.values() if e.action == SKIP])
+        logger.info(
+            f"{len(self.entries) - skipped} files would be converted, "
+            f"{skipped} skipped, {self.num_collisions} target collisions resolved",
+        )
+
+    def write(self, path):
+        """Write the plan into a file, see load."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as plan_file:
+            header = {
+                "version": PLAN_VERSION,
+                "fingerprint": get_settings_fingerprint(),
+            }
+            plan_file.write(json.dumps(header) + "\n")
+            for entry in self.entries.values():
+                line = {
+                    "source": entry.source,
+                    "target": entry.target,
+                    "action": entry.action,
+                    "duration": entry.duration,
+                    "codec": entry.codec,
+                }
+                plan_file.write(json.dumps(line) + "\n")
+
+    @classmethod
+    def load(cls, path, name_generator):
+        """Read a plan that was written with write.
+
+        Raises a ValueError if the file is not a plan, if one of its lines
+        is broken, or if it was made with different output settings than
+        the current ones.
+        """
+        plan = cls(name_generator)
+        with open(path, encoding="utf-8") as plan_file:
+            try:
+                header = json.loads(plan_file.readline())
+            except ValueError:
+                header = None
+            if not isinstance(header, dict) or header.get("version") != PLAN_VERSION:
+                raise ValueError(f'"{path}" is not a plan of this version')
+            if header.get("fingerprint") != get_settings_fingerprint():
+                raise ValueError(
+                    f'"{path}" was made with different output settings, '
+                    "use the same format, quality and output as for --write-plan",
+                )
+
+            # the header is line 1
+            for number, line in enumerate(plan_file, start=2):
+                try:
+                    line = json.loads(line)
+                    entry = PlanEntry(
+                        line["source"],
+                        line["target"],
+                        line["action"],
+                        line["duration"],
+                        line["codec"],
+                    )
+                except (ValueError, KeyError, TypeError) as error:
+                    raise ValueError(
+                        f'line {number} of "{path}" is broken: {error}'
+                    ) from error
+                plan.entries[entry.source] = entry
+                if entry.action != SKIP:
+                    plan.claimed[entry.target] = entry.source
+        return plan
+
+
+class PlanStream:
+    """Provide the SoundFiles of a plan like a DiscoveryStream.
+
+    They are not discovered again, that happened when the plan was made.
+    """
+
+    def __init__(self, plan):
+        self.sound_files = plan.iter_sound_files()
+        self.finished = False
+
+    def start(self):
+        """Nothing to do in the background."""
+
+    def get_discovered(self, limit):
+        """Get up to limit of the planned SoundFiles."""
+        if limit <= 0 or self.finished:
+            return []
+        sound_files = list(islice(self.sound_files, limit))
+        self.finished = len(sound_files) < limit
+        return sound_files
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Reject files that are obviously not audio before gstreamer sees them."""
+
+import codecs
+import os
+
+from soundconverter.util.fileoperations import unquote_filename
+from soundconverter.util.settings import get_gio_settings
+
+# file signatures of things that are commonly found next to music
+SIGNATURES = (
+    (b"\xff\xd8\xff", "JPEG image"),
+    (b"\x89PNG\r\n\x1a\n", "PNG image"),
+    (b"GIF87a", "GIF image"),
+    (b"GIF89a", "GIF image"),
+    (b"II*\x00", "TIFF image"),
+    (b"MM\x00*", "TIFF image"),
+    (b"%PDF-", "PDF document"),
+    (b"PK\x03\x04", "ZIP archive"),
+    (b"Rar!\x1a\x07", "RAR archive"),
+    (b"7z\xbc\xaf\x27\x1c", "7z archive"),
+    (b"\x1f\x8b", "gzip archive"),
+    (b"\x7fELF", "executable"),
+    (b"SQLite format 3\x00", "database"),
+)
+
+# how many bytes are looked at
+SNIFF_SIZE = 512
+
+
+def get_prefilter():
+    """Get the Prefilter that is configured in the gio settings.
+
+    Returns None if files should not be prefiltered.
+    """
+    gio_settings = get_gio_settings()
+    if not gio_settings.get_boolean("prefilter"):
+        return None
+    return Prefilter(gio_settings.get_strv("ignored-extensions"))
+
+
+def is_text(data):
+    """Check if the beginning of a file looks like a text file."""
+    if len(data) == 0 or b"\x00" in data:
+        return False
+    try:
+        # the last character might be cut off, so don't decode it finally
+        codecs.getincrementaldecoder("utf-8")().decode(data, final=False)
+    except UnicodeDecodeError:
+        return False
+    return all(byte >= 0x20 or byte in b"\t\n\r\f" for byte in data)
+
+
+class Prefilter:
+    """Reject files by their extension and by their first few bytes."""
+
+    def __init__(self, ignored_extensions):
+        """Create a new Prefilter.
+
+        Parameters
+        ----------
+        ignored_extensions : string[]
+            Files with those extensions are rejected without looking into
+            them, for example ["jpg", "cue"]
+        """
+        self.ignored_extensions = {
+            f".{extension.lower().lstrip('.')}" for extension in ignored_extensions
+        }
+
+    def check(self, sound_file):
+        """Get why a file is not audio, or None if it might be audio."""
+        filename = unquote_filename(sound_file.filename)
+        extension = os.path.splitext(filename)[1].lower()
+        if extension in self.ignored_extensions:
+            return f"ignored extension {extension}"
+
+        if not sound_file.uri.startswith("file://"):
+            # only local files are sniffed, remote ones are left to gstreamer
+            return None
+
+        path = unquote_filename(sound_file.uri[len("file://") :])
+        try:
+            with open(path, "rb") as file:
+                data = file.read(SNIFF_SIZE)
+        except OSError:
+            # gstreamer will come to the same conclusion, and maybe it
+            # knows better
+            return None
+
+        if len(data) == 0:
+            return "empty file"
+
+        for signature, description in SIGNATURES:
+            if data.startswith(signature):
+                return description
+
+        if is_text(data):
+            return "text file"
+
+        return None
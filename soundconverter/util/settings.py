@@ -70,3 +70,14 @@ def get_num_jobs():
         if _gio_settings.get_boolean("limit-jobs")
         else cpu_count()
     )
+
+
+def get_max_jobs():
+    """Return the upper limit of jobs when adapting it to the throughput.
+
+    Conversions that wait for slow storage benefit from having more jobs
+    than cpu cores.
+    """
+    if _gio_settings.get_boolean("limit-jobs"):
+        return _gio_settings.get_int("number-of-jobs")
+    return cpu_count() * 2
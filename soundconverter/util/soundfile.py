@@ -38,6 +38,7 @@ class SoundFile:
         "subfolders",
         "readable",
         "duration",
+        "codec",
         "info",
     ]
 
@@ -82,6 +83,8 @@ class SoundFile:
         self.tags = {}
         self.readable = False
         self.duration = None
+        # media type of the first audio stream, like "audio/x-flac"
+        self.codec = None
         self.info = None
 
     @property
@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Know which files exist in the output without asking the filesystem.
+
+Each output directory is listed once, and the files that the conversions
+create and remove are written down. Checking if a target exists is then
+a set lookup instead of a round trip, which is slow on network shares.
+"""
+
+import os
+import posixpath
+
+from gi.repository import Gio, GLib
+
+from soundconverter.util.fileoperations import split_uri, unquote_filename, vfs_exists
+from soundconverter.util.logger import logger
+
+# listing of a directory that couldn't be read, its children are checked
+# one by one
+UNKNOWN = None
+
+# how many children are requested from gio at once
+LIST_BATCH_SIZE = 256
+
+
+class TargetIndex:
+    """Directory listings of the output, plus the changes made to it.
+
+    Only meant to be used for the length of a single queue and only from
+    the main thread, files that other programs create in the meantime are
+    not noticed.
+    """
+
+    def __init__(self):
+        # (scheme, unquoted directory path) to a set of names, or UNKNOWN
+        self.listings = {}
+        # how many existence checks were answered
+        self.checks = 0
+        # how many times the filesystem had to be asked for that
+        self.probes = 0
+
+    def clear(self):
+        """Forget all listings, so that they are read again."""
+        self.listings = {}
+
+    def _split(self, uri):
+        """Get the key of the parent directory and the name of the file."""
+        scheme, path = split_uri(uri)
+        path = unquote_filename(path)
+        if len(path) > 1:
+            path = path.rstrip("/")
+        directory, name = posixpath.split(path)
+        return (scheme or "", directory), name
+
+    def _list(self, key):
+        """Read the names in the directory, or UNKNOWN if that failed."""
+        self.probes += 1
+        scheme, directory = key
+        if scheme in ("", "file://"):
+            try:
+                return set(os.listdir(directory))
+            except (FileNotFoundError, NotADirectoryError):
+                return set()
+            except OSError as error:
+                logger.debug(f'cannot list "{directory}": {error}')
+                return UNKNOWN
+
+        gfile = Gio.File.new_for_uri(scheme + directory)
+        names = set()
+        try:
+            enumerator = gfile.enumerate_children(
+                "standard::name",
+                Gio.FileQueryInfoFlags.NONE,
+                None,
+            )
+            try:
+                while True:
+                    infos = enumerator.next_files(LIST_BATCH_SIZE, None)
+                    if not infos:
+                        break
+                    names.update(info.get_name() for info in infos)
+            finally:
+                enumerator.close(None)
+        except GLib.Error as error:
+            if error.matches(Gio.io_error_quark(), Gio.IOErrorEnum.NOT_FOUND):
+                return set()
+            logger.debug(f'cannot list "{scheme + directory}": {error}')
+            return UNKNOWN
+        return names
+
+    def exists(self, uri):
+        """Check if the file or directory exists, like vfs_exists."""
+        if not split_uri(uri)[0]:
+            # gio does not support relative path syntax
+            uri = os.path.realpath(uri)
+
+        self.checks += 1
+        key, name = self._split(uri)
+        if key not in self.listings:
+            self.listings[key] = self._list(key)
+
+        listing = self.listings[key]
+        if listing is UNKNOWN:
+            self.probes += 1
+            return vfs_exists(uri)
+        return name in listing
+
+    def add(self, uri):
+        """Write down that the file or directory was created.
+
+        Its parent directories are added as well, because they are created
+        when they don't exist yet.
+        """
+        key, name = self._split(uri)
+        while name:
+            listing = self.listings.get(key, UNKNOWN)
+            if listing is not UNKNOWN:
+                if name in listing:
+                    # so are its parents
+                    return
+                listing.add(name)
+            # directories that were not listed yet are read from the disk
+            # later, when they are created already
+            key, name = self._split(key[0] + key[1])
+
+    def remove(self, uri):
+        """Write down that the file was deleted or moved away."""
+        key, name = self._split(uri)
+        listing = self.listings.get(key, UNKNOWN)
+        if listing is not UNKNOWN:
+            listing.discard(name)
+
+    def log_statistics(self):
+        """Log how many filesystem round trips were saved."""
+        if self.checks == 0:
+            return
+        saved = max(0, self.checks - self.probes)
+        logger.info(
+            f"target index: {self.checks} existence checks, "
+            f"{self.probes} filesystem probes, {saved} saved",
+        )
@@ -40,6 +40,23 @@ class Task(GObject.Object):
         """
         raise NotImplementedError()
 
+    def get_cost(self):
+        """Estimate how expensive running the task is going to be.
+
+        Used to decide which task to start first. Only the relation to
+        the costs of other tasks in the same TaskQueue matters. Defaults to
+        the weight of get_progress.
+        """
+        return self.get_progress()[1] or 0
+
+    def get_speed_key(self):
+        """Get what kind of work the task does.
+
+        Tasks with the same key are expected to process their weight at a
+        similar speed, which is used to estimate the remaining time.
+        """
+        return None
+
     def cancel(self):
         """Cancel the execution of the task."""
         raise NotImplementedError()
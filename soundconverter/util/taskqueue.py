@@ -20,28 +20,109 @@
 # USA
 
 import time
+from heapq import heapify, heappop, heappush
+from itertools import count
+from multiprocessing import cpu_count
 from queue import Queue
 
 from gi.repository import GLib, GObject
 
 from soundconverter.interface.mainloop import gtk_iteration
-from soundconverter.util.settings import get_num_jobs
+from soundconverter.util.logger import logger
+from soundconverter.util.settings import get_max_jobs, get_num_jobs
+
+
+class LongestFirstQueue(Queue):
+    """Queue that hands out the most expensive pending task first.
+
+    Tasks with the same cost are returned in the order they were added.
+    """
+
+    def _init(self, maxsize):
+        self.queue = []
+        self._counter = count()
+
+    def _qsize(self):
+        return len(self.queue)
+
+    def _put(self, task):
+        # heapq is a min-heap, so negate the cost
+        heappush(self.queue, (-task.get_cost(), next(self._counter), task))
+
+    def _get(self):
+        return heappop(self.queue)[2]
 
 
 class TaskQueue(GObject.Object):
     """Executes multiple tasks in parallel."""
 
-    def __init__(self):
+    # scheduling policies, in which order pending tasks are started
+    FIFO = "fifo"
+    LONGEST_FIRST = "longest-first"
+
+    # the lazily cleaned up heap of pending weights is rebuilt when it holds
+    # this many times more entries than there are pending tasks
+    max_heap_overhead = 2
+
+    def __init__(self, order=FIFO, adaptive=False, keep_tasks=True):
+        """Create a new TaskQueue.
+
+        Parameters
+        ----------
+        order : string
+            One of TaskQueue.FIFO or TaskQueue.LONGEST_FIRST. When starting
+            the longest tasks first, one long task added last won't keep
+            a single core busy while all the others are already idle.
+        adaptive : bool
+            If True, the number of tasks running in parallel is adjusted
+            while running to maximize the throughput, up to get_max_jobs.
+        keep_tasks : bool
+            If False, all_tasks and done stay empty and finished tasks are
+            forgotten, so that the memory usage doesn't grow with the number
+            of tasks. num_added, num_done and num_failed are counted either
+            way, and the task-added and task-done signals tell about each
+            task.
+        """
         self._on_queue_finished = None
 
+        if order not in (TaskQueue.FIFO, TaskQueue.LONGEST_FIRST):
+            raise ValueError(f"unknown task order {order}")
+        self.order = order
+        self.adaptive = adaptive
+        self.keep_tasks = keep_tasks
+
         # state
         self.all_tasks = []
-        self.pending = Queue()
+        if order == TaskQueue.LONGEST_FIRST:
+            self.pending = LongestFirstQueue()
+        else:
+            self.pending = Queue()
         self.running = []
         self.done = []
+        self.num_added = 0
+        self.num_done = 0
+        self.num_failed = 0
         self.finished = False
         self.paused = False
+        self.num_jobs = None
+        # as long as the queue is open, more tasks may be added while it
+        # is running, so it won't finish when it runs empty.
+        self.closed = True
         self._timer = Timer()
+        # the ConcurrencyController of adaptive queues while running
+        self._controller = None
+
+        # Totals that are updated when tasks change their state, so that
+        # asking for the progress doesn't require to look at every task.
+        # The weight of a task is expected not to change once it is added.
+        # Only tasks that are pending or running have a weight in there.
+        self._weights = {}
+        self._total_weight = 0
+        self._done_weight = 0
+        self._done_duration = 0
+        # lazily cleaned up max-heap of weights of tasks that might be pending
+        self._pending_weights = []
+        self._counter = count()
 
         super().__init__()
 
@@ -54,32 +135,62 @@ class TaskQueue(GObject.Object):
             Any object inheriting from Task
         """
         task.timer = Timer()
-        self.all_tasks.append(task)
+        if self.keep_tasks:
+            self.all_tasks.append(task)
+        self.num_added += 1
         self.pending.put(task)
 
+        weight = task.get_progress()[1] or 0
+        self._weights[task] = weight
+        self._total_weight += weight
+        heappush(self._pending_weights, (-weight, next(self._counter), task))
+        self.emit("task-added", task)
+
+        if self.num_jobs is not None and not self.finished and not self.paused:
+            # already running, start it right away if there is room
+            self._start_pending()
+
+    def open(self):
+        """Keep the queue running when it runs out of tasks.
+
+        Tasks can be added to an open queue at any time and will start
+        as soon as there is room. Call close when no more tasks will be
+        added, so that the queue can finish.
+        """
+        self.closed = False
+
+    def close(self):
+        """Finish the queue once the remaining tasks are done."""
+        self.closed = True
+        running = self.num_jobs is not None and not self.finished
+        if running and self.pending.qsize() == 0 and len(self.running) == 0:
+            self._finish()
+
     def get_progress(self, only_running=False):
         """Get the fraction of tasks that have been completed.
 
         returns a tuple of (total progress, task progress)
         with "task progress" being a list of (task, progress) tuples.
+
+        If only_running is True, "task progress" only contains the running
+        tasks, which is much cheaper for large queues. The total progress
+        always covers all tasks. Without keep_tasks, "task progress" only
+        contains the running tasks either way.
         """
         # some tasks may take longer, in order to communicate that they
         # provide a weight attribute.
-        if len(self.all_tasks) == 0:
+        if self.num_added == 0:
             return None
-        total_weight = 0
-        total_progress = 0
-        tasks = self.running if only_running else self.all_tasks
 
-        task_progress = []
+        if only_running:
+            task_progress = [(task, task.get_progress()[0]) for task in self.running]
+        else:
+            task_progress = [(task, task.get_progress()[0]) for task in self.all_tasks]
 
-        for task in tasks:
-            progress, weight = task.get_progress()
-            total_progress += progress * weight
-            total_weight += weight
-            task_progress.append((task, progress))
+        if self._total_weight == 0:
+            return 0, task_progress
 
-        return total_progress / total_weight, task_progress
+        return self.get_processed_weight() / self._total_weight, task_progress
 
     def pause(self):
         """Pause all tasks."""
@@ -96,6 +207,9 @@ class TaskQueue(GObject.Object):
             task.timer.resume()
             task.resume()
         self.paused = False
+        if self.num_jobs is not None and not self.finished:
+            # tasks might have been added in the meantime
+            self._start_pending()
 
     def cancel(self):
         """Stop all tasks."""
@@ -105,6 +219,8 @@ class TaskQueue(GObject.Object):
             # from the beginning. The proper way would be to call pause and
             # resume for such a functionality though.
             self.pending.put(task)
+            weight = self._weights[task]
+            heappush(self._pending_weights, (-weight, next(self._counter), task))
             task.timer.stop()
             task.cancel()
         self._timer.reset()
@@ -123,7 +239,7 @@ class TaskQueue(GObject.Object):
         # avoid adding duplicate signal handlers if the queue is restarted
         task.disconnect_by_func(self.task_done)
 
-        if task in self.done:
+        if task not in self._weights:
             raise Exception("Duplicate task_done call")
 
         if self.finished:
@@ -131,15 +247,39 @@ class TaskQueue(GObject.Object):
 
         task.timer.stop()
 
-        self.done.append(task)
+        if self.keep_tasks:
+            self.done.append(task)
+        self.num_done += 1
+        if getattr(task, "error", None):
+            self.num_failed += 1
+        self._done_weight += self._weights.pop(task)
+        self._done_duration += task.timer.get_duration()
         self.running.remove(task)
+        self._compact_pending_weights()
+        self.emit("task-done", task)
 
         if self.pending.qsize() > 0:
+            # the number of jobs might have changed in the meantime
+            while self.pending.qsize() > 0 and len(self.running) < self.num_jobs:
+                self.start_next()
+        elif len(self.running) == 0 and self.closed:
+            self._finish()
+
+    def _finish(self):
+        self.finished = True
+        self._timer.stop()
+        self._stop_controller()
+        self.emit("done")
+
+    def _stop_controller(self):
+        if self._controller is not None:
+            self._controller.stop()
+            self._controller = None
+
+    def _start_pending(self):
+        """Start pending tasks until num_jobs are running."""
+        while self.pending.qsize() > 0 and len(self.running) < self.num_jobs:
             self.start_next()
-        elif len(self.running) == 0:
-            self.finished = True
-            self._timer.stop()
-            self.emit("done")
 
     def start_next(self, _=None):
         """Start the next task if available."""
@@ -149,6 +289,9 @@ class TaskQueue(GObject.Object):
             task.connect("done", self.task_done)
 
             self.running.append(task)
+            # drop started tasks from the top of the heap now, instead of
+            # doing all of that during the next get_remaining call
+            self._get_max_pending_weight()
 
             # - Just looping over self.pending causes too many tasks to be running in
             # parallel
@@ -166,15 +309,33 @@ class TaskQueue(GObject.Object):
         """Run all tasks."""
         self.finished = False
         self._timer.start()
-        num_jobs = get_num_jobs()
-
-        while self.pending.qsize() > 0 and len(self.running) < num_jobs:
+        self.num_jobs = get_num_jobs()
+
+        if self.adaptive:
+            # start with one job per core and figure out the rest while running
+            max_jobs = get_max_jobs()
+            self.num_jobs = min(cpu_count(), max_jobs)
+            # the controller of a previous run would fight against the new one
+            self._stop_controller()
+            self._controller = ConcurrencyController(self, max_jobs)
+            self._controller.start()
+
+        while self.pending.qsize() > 0 and len(self.running) < self.num_jobs:
             # Run as many tasks as the configured number of jobs. Finished tasks will
             # trigger running the next task via a event
             self.start_next()
 
         gtk_iteration()
 
+    def set_num_jobs(self, num_jobs):
+        """Change how many tasks may run in parallel.
+
+        If lowered, running tasks are not stopped, but no new task is started
+        until fewer than num_jobs are running.
+        """
+        self.num_jobs = num_jobs
+        self._start_pending()
+
     def get_duration(self):
         """Get for how many seconds the queue has been actively running.
 
@@ -182,38 +343,68 @@ class TaskQueue(GObject.Object):
         """
         return self._timer.get_duration()
 
+    def get_processed_weight(self):
+        """Get how much weight, e.g. seconds of audio, has been processed."""
+        processed_weight = self._done_weight
+        for task in self.running:
+            progress, weight = task.get_progress()
+            processed_weight += progress * (weight or 0)
+        return processed_weight
+
+    def _is_pending(self, task):
+        return task in self._weights and task not in self.running
+
+    def _get_max_pending_weight(self):
+        """Get the weight of the largest task that didn't start yet."""
+        heap = self._pending_weights
+        while len(heap) > 0:
+            task = heap[0][2]
+            if self._is_pending(task):
+                return -heap[0][0]
+            # started in the meantime
+            heappop(heap)
+        return 0
+
+    def _compact_pending_weights(self):
+        """Drop entries of started tasks that are buried in the heap.
+
+        Otherwise the heap would keep every task that was ever added.
+        """
+        heap = self._pending_weights
+        if len(heap) <= self.max_heap_overhead * (self.pending.qsize() + 1):
+            return
+        self._pending_weights = [entry for entry in heap if self._is_pending(entry[2])]
+        heapify(self._pending_weights)
+
     def get_remaining(self):
         """Calculate how many seconds are left until the queue is done."""
         if len(self.running) == 0:
             # cannot be estimated yet
             return None
 
-        total_duration = 0
-        total_remaining_weight = 0
-        total_processed_weight = 0
-
-        max_remaining_weight = -1
-        for task in self.all_tasks:
-            # duration is the time the timer has been running, not the
-            # audio duration.
-            duration = task.timer.get_duration()
-            # total_duration would be 12s if 12 tasks run for 1s
-            total_duration += duration
-
-            # weight is actually the audio duration, but it's unit is going
-            # to be canceled in the remaining_duration calculation. It could
-            # be anything as long as all tasks have the same unit of weight.
+        # duration is the time the timer has been running, not the
+        # audio duration. total_duration would be 12s if 12 tasks run for 1s
+        total_duration = self._done_duration
+        # weight is actually the audio duration, but it's unit is going
+        # to be canceled in the remaining_duration calculation. It could
+        # be anything as long as all tasks have the same unit of weight.
+        total_processed_weight = self._done_weight
+
+        max_remaining_weight = self._get_max_pending_weight()
+        for task in self.running:
+            total_duration += task.timer.get_duration()
             progress, weight = task.get_progress()
+            weight = weight or 0
             remaining_weight = (1 - progress) * weight
             max_remaining_weight = max(remaining_weight, max_remaining_weight)
-            total_remaining_weight += remaining_weight
-            processed_weight = progress * weight
-            total_processed_weight += processed_weight
+            total_processed_weight += progress * weight
 
         if total_processed_weight == 0:
             # cannot be calculated yet
             return None
 
+        total_remaining_weight = self._total_weight - total_processed_weight
+
         # how many seconds per weight. This remains pretty stable, even when
         # less processes are running in parallel, because total_duration
         # is the sum of all task durations and not the queues duration.
@@ -227,17 +418,110 @@ class TaskQueue(GObject.Object):
         # remaining_duration which especially happens when the conversion
         # comes to an end while one very large file is being converted,
         # take that one.
-        if max_remaining_weight != -1:
-            max_remaining = speed * max_remaining_weight
-            remaining = max(max_remaining, remaining_duration)
-        else:
-            remaining = remaining_duration
-
-        return remaining
+        max_remaining = speed * max_remaining_weight
+        return max(max_remaining, remaining_duration)
 
 
 GObject.signal_new("done", TaskQueue, GObject.SignalFlags.RUN_FIRST, None, [])
 
+# emitted with the task when one is added or done
+GObject.signal_new(
+    "task-added",
+    TaskQueue,
+    GObject.SignalFlags.RUN_FIRST,
+    None,
+    [GObject.TYPE_PYOBJECT],
+)
+GObject.signal_new(
+    "task-done",
+    TaskQueue,
+    GObject.SignalFlags.RUN_FIRST,
+    None,
+    [GObject.TYPE_PYOBJECT],
+)
+
+
+class ConcurrencyController:
+    """Adjust the number of parallel tasks of a TaskQueue to its throughput.
+
+    Every few seconds the processed weight per second is compared to the
+    previous measurement. As long as it improves, the number of jobs keeps
+    moving in the same direction, otherwise it turns around. If nothing
+    changes, fewer jobs are preferred.
+    """
+
+    # seconds between two decisions
+    interval = 5
+    # relative change of the throughput that is considered noise
+    tolerance = 0.03
+
+    def __init__(self, task_queue, max_jobs):
+        self.task_queue = task_queue
+        self.max_jobs = max_jobs
+        self.direction = 1
+        self.last_throughput = None
+        self.last_processed_weight = 0
+        self.last_duration = 0
+        # id of the GLib timeout that calls update
+        self.source_id = None
+
+    def start(self):
+        """Start measuring and adjusting the running TaskQueue."""
+        self.last_processed_weight = self.task_queue.get_processed_weight()
+        self.last_duration = self.task_queue.get_duration()
+        self.source_id = GLib.timeout_add(self.interval * 1000, self.update)
+
+    def stop(self):
+        """Stop adjusting the TaskQueue."""
+        if self.source_id is not None:
+            GLib.source_remove(self.source_id)
+            self.source_id = None
+
+    def update(self):
+        """Measure the throughput and decide on the number of jobs.
+
+        Can be used in GLib.timeout_add.
+        """
+        task_queue = self.task_queue
+        if task_queue.finished:
+            # GLib removes the timeout
+            self.source_id = None
+            return False
+
+        # the duration doesn't grow while the queue is paused
+        duration = task_queue.get_duration()
+        elapsed = duration - self.last_duration
+        if elapsed <= 0:
+            return True
+
+        processed_weight = task_queue.get_processed_weight()
+        throughput = (processed_weight - self.last_processed_weight) / elapsed
+        self.last_processed_weight = processed_weight
+        self.last_duration = duration
+
+        last_throughput = self.last_throughput
+        self.last_throughput = throughput
+        if last_throughput is not None:
+            if throughput < last_throughput * (1 - self.tolerance):
+                # the previous step made it worse
+                self.direction = -self.direction
+            elif throughput <= last_throughput * (1 + self.tolerance):
+                # the previous step didn't help, so don't waste resources
+                self.direction = -1
+
+        num_jobs = task_queue.num_jobs
+        new_num_jobs = min(max(num_jobs + self.direction, 1), self.max_jobs)
+        if new_num_jobs == num_jobs:
+            # reached a limit, try the other way next time
+            self.direction = -self.direction
+
+        logger.info(
+            f"throughput {throughput:.1f}/s with {num_jobs} jobs, "
+            f"continuing with {new_num_jobs} jobs"
+        )
+        task_queue.set_num_jobs(new_num_jobs)
+        return True
+
 
 class Timer:
     """Time how long the TaskQueue took."""
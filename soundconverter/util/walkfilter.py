@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Decide which files and directories are walked over."""
+
+import os
+import re
+from fnmatch import fnmatchcase
+
+from soundconverter.util.settings import settings
+
+SIZE_UNITS = {"": 1, "k": 1000, "m": 1000**2, "g": 1000**3}
+
+
+def parse_size(size):
+    """Parse a size like "500k" or "20M" into bytes.
+
+    Raises a ValueError if it can't be parsed.
+    """
+    match = re.match(r"^\s*(\d+(?:\.\d+)?)\s*([kmg]?)b?\s*$", str(size).lower())
+    if match is None:
+        raise ValueError(f'Invalid size "{size}", use for example 500k or 20M')
+    return int(float(match[1]) * SIZE_UNITS[match[2]])
+
+
+def get_walk_filter():
+    """Get the WalkFilter of the command line options in settings.
+
+    Returns None if nothing should be filtered. Sizes are strings like
+    "20M", see parse_size.
+    """
+    min_size = settings.get("min-size")
+    max_size = settings.get("max-size")
+    walk_filter = WalkFilter(
+        include=settings.get("include"),
+        exclude=settings.get("exclude"),
+        extensions=settings.get("extensions"),
+        min_size=None if min_size is None else parse_size(min_size),
+        max_size=None if max_size is None else parse_size(max_size),
+    )
+    if walk_filter.is_empty():
+        return None
+    return walk_filter
+
+
+def matches(patterns, relative_path):
+    """Check if one of the glob patterns matches the path.
+
+    Patterns with a "/" are matched against the whole path relative to the
+    walked directory, the others only against the name.
+    """
+    name = os.path.basename(relative_path)
+    for pattern in patterns:
+        if fnmatchcase(relative_path if "/" in pattern else name, pattern):
+            return True
+    return False
+
+
+class WalkFilter:
+    """Skip files and whole directories while walking over them."""
+
+    def __init__(
+        self,
+        include=None,
+        exclude=None,
+        extensions=None,
+        min_size=None,
+        max_size=None,
+    ):
+        """Create a new WalkFilter.
+
+        Parameters
+        ----------
+        include : string[]
+            If set, only files that match one of those glob patterns are
+            used, for example ["*.flac", "live/*"]
+        exclude : string[]
+            Files and directories that match one of those glob patterns
+            are skipped. Nothing inside skipped directories is looked at.
+        extensions : string[]
+            If set, only files with one of those extensions are used,
+            for example ["flac", ".wav"]
+        min_size : int
+            Smaller files in bytes are skipped
+        max_size : int
+            Larger files in bytes are skipped
+        """
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.extensions = None
+        if extensions:
+            self.extensions = {
+                f".{extension.lower().lstrip('.')}" for extension in extensions
+            }
+        self.min_size = min_size
+        self.max_size = max_size
+
+    def is_empty(self):
+        """Check if this filter accepts everything."""
+        return (
+            not self.include
+            and not self.exclude
+            and self.extensions is None
+            and self.min_size is None
+            and self.max_size is None
+        )
+
+    def needs_size(self):
+        """Check if accepts_file needs to know the size of files."""
+        return self.min_size is not None or self.max_size is not None
+
+    def accepts_directory(self, relative_path):
+        """Check if the directory should be walked into.
+
+        Parameters
+        ----------
+        relative_path : string
+            Path of the directory relative to the walked directory,
+            without trailing slash, for example "a/b"
+        """
+        return not matches(self.exclude, relative_path)
+
+    def accepts_file(self, relative_path, get_size=None):
+        """Check if the file should be used.
+
+        Parameters
+        ----------
+        relative_path : string
+            Path of the file relative to the walked directory, for example
+            "a/b/c.flac"
+        get_size : function
+            Returns the size of the file in bytes. Only called if the name
+            of the file is accepted and if sizes are filtered.
+        """
+        if self.extensions is not None:
+            extension = os.path.splitext(relative_path)[1].lower()
+            if extension not in self.extensions:
+                return False
+
+        if self.include and not matches(self.include, relative_path):
+            return False
+
+        if matches(self.exclude, relative_path):
+            return False
+
+        if self.needs_size():
+            size = get_size()
+            if self.min_size is not None and size < self.min_size:
+                return False
+            if self.max_size is not None and size > self.max_size:
+                return False
+
+        return True
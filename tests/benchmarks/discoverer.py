@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Measure how many files per second can be discovered.
+
+Run from the repository root:
+
+    python3 tests/benchmarks/discoverer.py [directory] [--fresh]
+    python3 tests/benchmarks/discoverer.py --synthetic [number of files]
+
+--fresh creates a new GstPbutils.Discoverer for every file, like it used
+to be done, instead of one per thread.
+
+--synthetic doesn't look at any files, so that only the bookkeeping of the
+discovery is measured, like when adding a huge library in the gui. It
+defaults to 500000 files.
+
+Also prints how often and for how long the main loop had to handle events
+during discovery, time in which the gui can't react.
+"""
+
+import os
+import sys
+import time
+
+import gi
+
+gi.require_version("Gst", "1.0")
+gi.require_version("GstPbutils", "1.0")
+from gi.repository import Gio, GLib, Gst  # noqa: E402
+
+sys.path.insert(0, ".")
+
+from soundconverter.gstreamer.discoverer import (  # noqa: E402
+    DiscovererThread,
+    add_discoverers,
+)
+from soundconverter.util.fileoperations import filename_to_uri  # noqa: E402
+from soundconverter.util.settings import set_gio_settings  # noqa: E402
+from soundconverter.util.soundfile import SoundFile  # noqa: E402
+from soundconverter.util.taskqueue import TaskQueue  # noqa: E402
+
+
+def run_main_loop(queue):
+    """Run the queue and measure how busy the main loop was."""
+    context = GLib.MainLoop().get_context()
+    dispatches = 0
+    busy = 0
+    queue.run()
+    while not queue.finished:
+        start = time.perf_counter()
+        if context.iteration(True):
+            dispatches += 1
+            busy += time.perf_counter() - start
+    return dispatches, busy
+
+
+def main(directory, fresh, synthetic):
+    Gst.init(None)
+    # don't overwrite the users settings
+    backend = Gio.memory_settings_backend_new()
+    set_gio_settings(Gio.Settings.new_with_backend("org.soundconverter", backend))
+
+    if fresh:
+        get_discoverer = DiscovererThread._get_discoverer
+
+        def _get_discoverer(self):
+            self.discoverer = None
+            return get_discoverer(self)
+
+        DiscovererThread._get_discoverer = _get_discoverer
+
+    if synthetic:
+
+        def _analyse_file(self, sound_file):
+            sound_file.readable = True
+
+        DiscovererThread._analyse_file = _analyse_file
+        sound_files = [SoundFile(f"file:///{i}.mp3") for i in range(synthetic)]
+    else:
+        sound_files = [
+            SoundFile(filename_to_uri(os.path.join(directory, filename)))
+            for filename in sorted(os.listdir(directory))
+        ]
+
+    queue = TaskQueue()
+    add_discoverers(queue, sound_files)
+    start = time.perf_counter()
+    dispatches, busy = run_main_loop(queue)
+    duration = time.perf_counter() - start
+
+    readable = len([sound_file for sound_file in sound_files if sound_file.readable])
+    print(
+        f"discovered {len(sound_files)} files ({readable} readable) "
+        f"in {duration:.2f} s, {len(sound_files) / duration:.0f} files/s",
+    )
+    print(f"main loop: {dispatches} dispatches, busy for {busy:.3f} s")
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    synthetic = 0
+    if "--synthetic" in sys.argv:
+        synthetic = int(args.pop(0)) if args else 500000
+    main(
+        args[0] if args else "tests/bulk-test-data",
+        "--fresh" in sys.argv,
+        synthetic,
+    )
@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Compare how discovery threads and processes scale with more workers.
+
+Run from the repository root:
+
+    python3 tests/benchmarks/discoveryprocesses.py [directory] [max workers]
+
+The number of workers is doubled from 1 up to max workers, which defaults
+to the number of cpu cores. The metadata cache is not used.
+"""
+
+import os
+import sys
+import time
+from multiprocessing import cpu_count
+
+import gi
+
+gi.require_version("Gst", "1.0")
+gi.require_version("GstPbutils", "1.0")
+from gi.repository import Gio, Gst  # noqa: E402
+
+sys.path.insert(0, ".")
+
+from soundconverter.gstreamer.discoverer import DiscoveryStream  # noqa: E402
+from soundconverter.util.fileoperations import filename_to_uri  # noqa: E402
+from soundconverter.util.metadatacache import BYPASS  # noqa: E402
+from soundconverter.util.settings import set_gio_settings, settings  # noqa: E402
+from soundconverter.util.soundfile import SoundFile  # noqa: E402
+
+
+def discover(paths, processes):
+    settings["discovery-processes"] = processes
+    sound_files = (SoundFile(filename_to_uri(path)) for path in paths)
+    stream = DiscoveryStream(sound_files)
+    start = time.perf_counter()
+    stream.start()
+    discovered = 0
+    while not stream.finished:
+        discovered += len(stream.get_discovered(1000))
+        time.sleep(0.001)
+    return discovered / (time.perf_counter() - start)
+
+
+def main(directory, max_workers):
+    Gst.init(None)
+    # don't overwrite the users settings
+    backend = Gio.memory_settings_backend_new()
+    gio_settings = Gio.Settings.new_with_backend("org.soundconverter", backend)
+    set_gio_settings(gio_settings)
+    settings["metadata-cache"] = BYPASS
+
+    paths = [
+        os.path.join(directory, filename) for filename in sorted(os.listdir(directory))
+    ]
+
+    print(f"{len(paths)} files, files/s with threads and processes:")
+    workers = 1
+    while workers <= max_workers:
+        gio_settings.set_boolean("limit-jobs", True)
+        gio_settings.set_int("number-of-jobs", workers)
+        threads = discover(paths, False)
+        processes = discover(paths, True)
+        print(f"{workers:>4} workers: {threads:>8.0f} {processes:>8.0f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else "tests/bulk-test-data",
+        int(sys.argv[2]) if len(sys.argv) > 2 else cpu_count(),
+    )
@@ -0,0 +1,147 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Compare separate passes per format with decoding once for all of them.
+
+Run from the repository root:
+
+    python3 tests/benchmarks/extraoutputs.py [number of files] [seconds per file]
+
+Writes 20 generated wav files of 60 seconds by default into a temporary
+directory and makes a flac, an mp3 V0 and an opus 128k copy of each, once
+with a queue per format and once with --extra-output. The files are resampled
+to 48 kHz, so that decoding and resampling is not for free.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import wave
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import GLib, Gst  # noqa: E402
+
+sys.path.insert(0, ".")
+
+from soundconverter.gstreamer.converter import Converter, ExtraOutput  # noqa: E402
+from soundconverter.interface.batch import use_memory_gsettings  # noqa: E402
+from soundconverter.util.fileoperations import filename_to_uri  # noqa: E402
+from soundconverter.util.namegenerator import TargetNameGenerator  # noqa: E402
+from soundconverter.util.settings import settings  # noqa: E402
+from soundconverter.util.soundfile import SoundFile  # noqa: E402
+from soundconverter.util.taskqueue import TaskQueue  # noqa: E402
+
+SAMPLE_RATE = 44100
+
+# format, quality and output folder of each copy
+OUTPUTS = [("flac", 5, "flac"), ("mp3", 0, "mp3"), ("opus", 128, "opus")]
+
+
+def create_wavs(directory, count, seconds):
+    os.makedirs(directory)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"{i}.wav")
+        with wave.open(path, "wb") as clip:
+            clip.setnchannels(2)
+            clip.setsampwidth(2)
+            clip.setframerate(SAMPLE_RATE)
+            # a sawtooth, silence would be too easy for the encoders
+            frames = bytes((sample * 7 + i) % 256 for sample in range(4 * SAMPLE_RATE))
+            for _ in range(seconds):
+                clip.writeframes(frames)
+        paths.append(path)
+    return paths
+
+
+def use_outputs(directory, outputs):
+    """Write the settings of the first output and add the others as extra."""
+    (audio_format, quality, folder), *extra = outputs
+    use_memory_gsettings(
+        {
+            "main": "batch",
+            "format": audio_format,
+            "quality": quality,
+            "output-path": os.path.join(directory, folder),
+            "output-resample": 48000,
+            "extra-output": [
+                f"{extra_format}:{extra_quality}:{os.path.join(directory, folder)}"
+                for extra_format, extra_quality, folder in extra
+            ],
+        }
+    )
+
+
+def convert(paths):
+    name_generator = TargetNameGenerator()
+    extra_outputs = [
+        ExtraOutput(extra_settings)
+        for extra_settings in settings["extra-output-settings"]
+    ]
+    queue = TaskQueue()
+    for path in paths:
+        sound_file = SoundFile(filename_to_uri(path))
+        queue.add(Converter(sound_file, name_generator, extra_outputs))
+
+    context = GLib.MainLoop().get_context()
+    start = time.perf_counter()
+    queue.run()
+    while not queue.finished:
+        context.iteration(True)
+    errors = len([task for task in queue.done if task.error])
+    return time.perf_counter() - start, errors
+
+
+def main(count, seconds):
+    Gst.init(None)
+    directory = tempfile.mkdtemp()
+    output = os.path.join(directory, "output")
+    try:
+        paths = create_wavs(os.path.join(directory, "wav"), count, seconds)
+        print(f"{count} files of {seconds} s into {len(OUTPUTS)} formats:")
+
+        total = 0
+        errors = 0
+        for audio_format in OUTPUTS:
+            use_outputs(output, [audio_format])
+            duration, failed = convert(paths)
+            total += duration
+            errors += failed
+        print(f"  a pass per format: {total:.2f} s, {errors} errors")
+
+        shutil.rmtree(output)
+        use_outputs(output, OUTPUTS)
+        duration, errors = convert(paths)
+        print(f"  --extra-output:    {duration:.2f} s, {errors} errors")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 60,
+    )
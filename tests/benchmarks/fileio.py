@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Compare reading and writing local files over gio and with filesrc.
+
+Run from the repository root:
+
+    python3 tests/benchmarks/fileio.py [number of files] [seconds per file]
+
+Writes 20 generated wav files of 60 seconds by default into a temporary
+directory. They are converted to flac and the flac files back to wav,
+where the encoders are fast and most of the time is spent on reading and
+writing. Each is done with gio (--block-size 0) and with a few block sizes
+for filesrc and filesink.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import wave
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import Gio, GLib, Gst  # noqa: E402
+
+sys.path.insert(0, ".")
+
+from soundconverter.gstreamer.converter import Converter  # noqa: E402
+from soundconverter.util.fileoperations import filename_to_uri  # noqa: E402
+from soundconverter.util.namegenerator import TargetNameGenerator  # noqa: E402
+from soundconverter.util.settings import (  # noqa: E402
+    get_gio_settings,
+    set_gio_settings,
+    settings,
+)
+from soundconverter.util.soundfile import SoundFile  # noqa: E402
+from soundconverter.util.taskqueue import TaskQueue  # noqa: E402
+
+SAMPLE_RATE = 44100
+
+BLOCK_SIZES = [0, 64 * 1024, 256 * 1024, 1024 * 1024]
+
+
+def create_wavs(directory, count, seconds):
+    os.makedirs(directory)
+    for i in range(count):
+        with wave.open(os.path.join(directory, f"{i}.wav"), "wb") as clip:
+            clip.setnchannels(2)
+            clip.setsampwidth(2)
+            clip.setframerate(SAMPLE_RATE)
+            # a sawtooth, silence would be too easy for the encoder
+            frames = bytes((sample * 7 + i) % 256 for sample in range(4 * SAMPLE_RATE))
+            for _ in range(seconds):
+                clip.writeframes(frames)
+
+
+def convert(directory, output, mime_type, block_size):
+    settings["block-size"] = block_size
+    get_gio_settings().set_string("selected-folder", filename_to_uri(output))
+    get_gio_settings().set_string("output-mime-type", mime_type)
+    shutil.rmtree(output, ignore_errors=True)
+    os.makedirs(output)
+
+    name_generator = TargetNameGenerator()
+    queue = TaskQueue()
+    for filename in sorted(os.listdir(directory)):
+        sound_file = SoundFile(filename_to_uri(os.path.join(directory, filename)))
+        queue.add(Converter(sound_file, name_generator))
+
+    context = GLib.MainLoop().get_context()
+    start = time.perf_counter()
+    queue.run()
+    while not queue.finished:
+        context.iteration(True)
+    duration = time.perf_counter() - start
+
+    size = sum(
+        os.path.getsize(os.path.join(directory, filename))
+        for filename in os.listdir(directory)
+    )
+    errors = len([task for task in queue.done if task.error])
+    print(
+        f"  block-size {block_size:>8}: {duration:.2f} s, "
+        f"{size / duration / 1e6:.1f} MB/s read, {errors} errors",
+    )
+
+
+def main(count, seconds):
+    Gst.init(None)
+    # don't overwrite the users settings
+    backend = Gio.memory_settings_backend_new()
+    set_gio_settings(Gio.Settings.new_with_backend("org.soundconverter", backend))
+    gio_settings = get_gio_settings()
+    gio_settings.set_boolean("same-folder-as-input", False)
+
+    directory = tempfile.mkdtemp()
+    wavs = os.path.join(directory, "wav")
+    flacs = os.path.join(directory, "flac")
+    output = os.path.join(directory, "output")
+    try:
+        create_wavs(wavs, count, seconds)
+        print(f"wav to flac, {count} files of {seconds} s:")
+        for block_size in BLOCK_SIZES:
+            convert(wavs, flacs, "audio/x-flac", block_size)
+        print(f"flac to wav, {count} files of {seconds} s:")
+        for block_size in BLOCK_SIZES:
+            convert(flacs, output, "audio/x-wav", block_size)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 60,
+    )
@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Compare reading headers in python with discovering files in gstreamer.
+
+Run from the repository root:
+
+    python3 tests/benchmarks/headerreader.py [directory]
+
+Both run in a single thread, and files where both disagree about the
+duration or the tags are reported.
+"""
+
+import os
+import sys
+import time
+from unittest.mock import Mock
+
+import gi
+
+gi.require_version("Gst", "1.0")
+gi.require_version("GstPbutils", "1.0")
+from gi.repository import Gio, Gst  # noqa: E402
+
+sys.path.insert(0, ".")
+
+from soundconverter.gstreamer.discoverer import DiscovererThread  # noqa: E402
+from soundconverter.util.fileoperations import filename_to_uri  # noqa: E402
+from soundconverter.util.headerreader import read_header  # noqa: E402
+from soundconverter.util.settings import set_gio_settings  # noqa: E402
+from soundconverter.util.soundfile import SoundFile  # noqa: E402
+
+
+def get_sound_files(directory):
+    return [
+        SoundFile(filename_to_uri(os.path.join(directory, filename)))
+        for filename in sorted(os.listdir(directory))
+    ]
+
+
+def measure(name, sound_files, analyse):
+    start = time.perf_counter()
+    for sound_file in sound_files:
+        analyse(sound_file)
+    duration = time.perf_counter() - start
+    print(
+        f"{name}: {len(sound_files)} files in {duration:.2f} s, "
+        f"{len(sound_files) / duration:.0f} files/s",
+    )
+
+
+def main(directory):
+    Gst.init(None)
+    # don't overwrite the users settings
+    backend = Gio.memory_settings_backend_new()
+    set_gio_settings(Gio.Settings.new_with_backend("org.soundconverter", backend))
+
+    fast = get_sound_files(directory)
+    measure("header reader", fast, read_header)
+
+    slow = get_sound_files(directory)
+    thread = DiscovererThread([], Mock())
+    measure("gstreamer", slow, thread._discover)
+
+    understood = 0
+    for fast_file, slow_file in zip(fast, slow):
+        if fast_file.duration is None:
+            continue
+        understood += 1
+        tags = {key: slow_file.tags.get(key) for key in fast_file.tags}
+        if abs(fast_file.duration - (slow_file.duration or 0)) > 0.05 or (
+            tags != fast_file.tags
+        ):
+            print(
+                f"mismatch in {fast_file.filename_for_display}: "
+                f"{fast_file.duration} {fast_file.tags} != "
+                f"{slow_file.duration} {slow_file.tags}",
+            )
+    print(f"{understood} of {len(fast)} files were read without gstreamer")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "tests/bulk-test-data")
@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Measure how many target names per second can be generated.
+
+Run from the repository root:
+
+    python3 tests/benchmarks/namegenerator.py [number of files]
+
+Names synthetic SoundFiles, 1000000 by default, with the subfolder and
+filename patterns filled in. Nothing is looked up on the disk: the output
+goes into a directory that doesn't exist, which is listed only once.
+"""
+
+import sys
+import time
+
+from gi.repository import Gio
+
+sys.path.insert(0, ".")
+
+from soundconverter.util.namegenerator import TargetNameGenerator  # noqa: E402
+from soundconverter.util.settings import (  # noqa: E402
+    get_gio_settings,
+    set_gio_settings,
+)
+from soundconverter.util.soundfile import SoundFile  # noqa: E402
+
+
+def create_sound_files(count):
+    sound_files = []
+    for i in range(count):
+        sound_file = SoundFile(f"file:///music/{i // 1000}/{i} track.flac")
+        sound_file.tags.update(
+            {
+                "artist": f"Artist {i // 1000}",
+                "album": f"Album {i // 100}",
+                "title": f"Title {i}",
+                "track-number": i % 100,
+            }
+        )
+        sound_files.append(sound_file)
+    return sound_files
+
+
+def measure(name, function, sound_files):
+    start = time.perf_counter()
+    for sound_file in sound_files:
+        function(sound_file)
+    duration = time.perf_counter() - start
+    print(
+        f"{name}: {len(sound_files)} files in {duration:.2f} s, "
+        f"{len(sound_files) / duration:.0f} files/s",
+    )
+
+
+def main(count):
+    # don't overwrite the users settings
+    backend = Gio.memory_settings_backend_new()
+    set_gio_settings(Gio.Settings.new_with_backend("org.soundconverter", backend))
+    gio_settings = get_gio_settings()
+    gio_settings.set_string("selected-folder", "file:///nonexistent-benchmark/")
+    gio_settings.set_boolean("create-subfolders", True)
+    # track number - title
+    gio_settings.set_int("name-pattern-index", 2)
+
+    sound_files = create_sound_files(count)
+    generator = TargetNameGenerator()
+
+    def fill_patterns(sound_file):
+        generator.fill_pattern(sound_file, generator.subfolder_pattern)
+        generator.fill_pattern(sound_file, generator.basename_pattern)
+
+    measure("fill_pattern", fill_patterns, sound_files)
+    measure("generate_target_uri", generator.generate_target_uri, sound_files)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,126 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Compare converting many short files with new and reused pipelines.
+
+Run from the repository root:
+
+    python3 tests/benchmarks/pipelines.py [number of files]
+
+Writes 500 generated wav files of 1 to 3 seconds by default into a
+temporary directory and converts them to flac, once with a new pipeline
+for each file and once with --reuse-pipelines.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import wave
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import Gio, GLib, Gst  # noqa: E402
+
+sys.path.insert(0, ".")
+
+from soundconverter.gstreamer.converter import Converter  # noqa: E402
+from soundconverter.gstreamer.pipelinepool import get_pipeline_pool  # noqa: E402
+from soundconverter.util.fileoperations import filename_to_uri  # noqa: E402
+from soundconverter.util.namegenerator import TargetNameGenerator  # noqa: E402
+from soundconverter.util.settings import (  # noqa: E402
+    get_gio_settings,
+    set_gio_settings,
+    settings,
+)
+from soundconverter.util.soundfile import SoundFile  # noqa: E402
+from soundconverter.util.taskqueue import TaskQueue  # noqa: E402
+
+SAMPLE_RATE = 44100
+
+
+def create_clips(directory, count):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"{i}.wav")
+        seconds = 1 + i % 3
+        with wave.open(path, "wb") as clip:
+            clip.setnchannels(2)
+            clip.setsampwidth(2)
+            clip.setframerate(SAMPLE_RATE)
+            # a quiet sawtooth, silence would be too easy for the encoder
+            frame = bytes([i % 256, 0, i % 256, 0])
+            clip.writeframes(frame * (SAMPLE_RATE * seconds))
+        paths.append(path)
+    return paths
+
+
+def convert(paths, output, reuse):
+    settings["reuse-pipelines"] = reuse
+    shutil.rmtree(output, ignore_errors=True)
+    os.makedirs(output)
+    name_generator = TargetNameGenerator()
+    queue = TaskQueue()
+    for path in paths:
+        queue.add(Converter(SoundFile(filename_to_uri(path)), name_generator))
+
+    context = GLib.MainLoop().get_context()
+    start = time.perf_counter()
+    queue.run()
+    while not queue.finished:
+        context.iteration(True)
+    duration = time.perf_counter() - start
+
+    errors = len([task for task in queue.done if task.error])
+    print(
+        f"reuse-pipelines={reuse}: {len(paths)} files in {duration:.1f} s, "
+        f"{len(paths) / duration:.1f} files/s, {errors} errors",
+    )
+
+
+def main(count):
+    Gst.init(None)
+    # don't overwrite the users settings
+    backend = Gio.memory_settings_backend_new()
+    set_gio_settings(Gio.Settings.new_with_backend("org.soundconverter", backend))
+    directory = tempfile.mkdtemp()
+    output = os.path.join(directory, "output")
+    gio_settings = get_gio_settings()
+    gio_settings.set_boolean("same-folder-as-input", False)
+    gio_settings.set_string("selected-folder", filename_to_uri(output))
+    gio_settings.set_string("output-mime-type", "audio/x-flac")
+
+    try:
+        paths = create_clips(directory, count)
+        convert(paths, output, False)
+        convert(paths, output, True)
+        pool = get_pipeline_pool()
+        print(f"{pool.created} pipelines created, {pool.reused} reused")
+    finally:
+        get_pipeline_pool().clear()
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
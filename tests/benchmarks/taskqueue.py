@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+"""Measure how long one progress refresh of a huge TaskQueue takes.
+
+Run from the repository root:
+
+    python3 tests/benchmarks/taskqueue.py [number of tasks]
+
+Each refresh does what the UI does on its timers, get_progress of the
+running tasks and get_remaining. The time should stay the same while
+the queue works its way through the tasks.
+"""
+
+import sys
+import time
+
+from gi.repository import Gio, GLib
+
+sys.path.insert(0, ".")
+
+from soundconverter.util.settings import (  # noqa: E402
+    get_gio_settings,
+    set_gio_settings,
+)
+from soundconverter.util.task import Task  # noqa: E402
+from soundconverter.util.taskqueue import TaskQueue  # noqa: E402
+
+
+class InstantTask(Task):
+    """Task that is running until finish is called."""
+
+    def __init__(self):
+        self.progress = 0
+        super().__init__()
+
+    def get_progress(self):
+        return self.progress, 1
+
+    def run(self):
+        self.progress = 0.5
+
+    def cancel(self):
+        pass
+
+    def pause(self):
+        pass
+
+    def resume(self):
+        pass
+
+    def finish(self):
+        self.progress = 1
+        self.emit("done")
+
+
+def measure_tick(queue, repeat=100):
+    """Get the average seconds of one refresh."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        queue.get_progress(only_running=True)
+        queue.get_remaining()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(num_tasks):
+    # don't overwrite the users settings
+    backend = Gio.memory_settings_backend_new()
+    set_gio_settings(Gio.Settings.new_with_backend("org.soundconverter", backend))
+    get_gio_settings().set_boolean("limit-jobs", True)
+    get_gio_settings().set_int("number-of-jobs", 8)
+    context = GLib.MainLoop().get_context()
+
+    start = time.perf_counter()
+    queue = TaskQueue()
+    for _ in range(num_tasks):
+        queue.add(InstantTask())
+    print(f"adding {num_tasks} tasks took {time.perf_counter() - start:.1f} s")
+
+    start = time.perf_counter()
+    queue.run()
+    checkpoints = [int(num_tasks * fraction) for fraction in (0.001, 0.1, 0.5, 0.99)]
+    while not queue.finished:
+        # run the idle callbacks that start the tasks
+        while context.pending():
+            context.iteration(False)
+
+        if len(checkpoints) > 0 and len(queue.done) >= checkpoints[0]:
+            checkpoints.pop(0)
+            tick = measure_tick(queue)
+            print(f"{len(queue.done):>8} done: {tick * 1e6:.1f} µs per refresh")
+
+        for task in list(queue.running):
+            task.finish()
+
+    print(f"running all tasks took {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -15,7 +15,8 @@ gi.require_version("Gtk", "3.0")
 from gi.repository import Gst, Gtk, Gio  # noqa: E402, F401, I001
 
 from soundconverter.interface.mainloop import gtk_iteration  # noqa: E402
-from soundconverter.util.settings import set_gio_settings  # noqa: E402
+from soundconverter.util.metadatacache import BYPASS  # noqa: E402
+from soundconverter.util.settings import set_gio_settings, settings  # noqa: E402
 import util
 
 # don't overwrite the users settings during tests
@@ -23,6 +24,9 @@ backend = Gio.memory_settings_backend_new()
 gio_settings = Gio.Settings.new_with_backend("org.soundconverter", backend)
 set_gio_settings(gio_settings)
 
+# and don't read or write the users metadata cache either
+settings["metadata-cache"] = BYPASS
+
 # tests will control gtk main iterations for the ui
 Gtk.main = gtk_iteration
 Gtk.main_quit = lambda: None
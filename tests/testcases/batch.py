@@ -28,8 +28,8 @@ from soundconverter.interface.batch import (
     use_memory_gsettings,
     validate_args,
 )
-from soundconverter.util.fileoperations import vfs_exists
-from soundconverter.util.settings import get_gio_settings, settings
+from soundconverter.util.fileoperations import filename_to_uri, vfs_exists
+from soundconverter.util.settings import get_gio_settings, get_max_jobs, settings
 
 cwd = os.getcwd()
 
@@ -217,6 +217,28 @@ class BatchUtils(unittest.TestCase):
 
         self.assertEqual(subdirectories, ["", ""])
 
+    def test_walk_filter(self):
+        keys = ("exclude", "extensions", "min-size")
+        self.addCleanup(lambda: [settings.pop(key) for key in keys])
+        settings["recursive"] = True
+        settings["exclude"] = ["b"]
+        settings["extensions"] = ["WAV"]
+        settings["min-size"] = "1k"
+        parsed_files, subdirectories = prepare_files_list(
+            ["tests/test data/", "tests/test data/image.jpg"]
+        )
+        self.assertEqual(
+            parsed_files,
+            [
+                "file://" + os.path.realpath("tests/test%20data/audio/a.wav"),
+                "file://"
+                + urllib.parse.quote(
+                    os.path.realpath("tests/test data/audio/strângë chàrs фズ.wav")
+                ),
+            ],
+        )
+        self.assertEqual(subdirectories, ["test data/audio/", "test data/audio/"])
+
     def test_validate_args(self):
         # working example
         self.assertTrue(
@@ -331,6 +353,60 @@ class BatchUtils(unittest.TestCase):
             )
         )
         self.assertFalse(validate_args({"output-resample": 160}))
+        # task order
+        self.assertTrue(
+            validate_args(
+                {
+                    "main": "batch",
+                    "output-path": ".",
+                    "format": "mp3",
+                    "task-order": "longest-first",
+                }
+            )
+        )
+        self.assertFalse(
+            validate_args(
+                {
+                    "main": "batch",
+                    "output-path": ".",
+                    "format": "mp3",
+                    "task-order": "shortest-first",
+                }
+            )
+        )
+        # discovery timeout
+        self.assertTrue(validate_args({"main": "check", "discovery-timeout": 5}))
+        self.assertFalse(validate_args({"main": "check", "discovery-timeout": -1}))
+        # block size
+        self.assertTrue(validate_args({"main": "check", "block-size": 0}))
+        self.assertFalse(validate_args({"main": "check", "block-size": -1}))
+        # watch
+        self.assertFalse(validate_args({"main": "check", "watch": True, "sync": True}))
+        # plans
+        self.assertFalse(
+            validate_args({"main": "check", "watch": True, "dry-run": True})
+        )
+        self.assertFalse(
+            validate_args({"main": "check", "plan": "a", "write-plan": "b"})
+        )
+        self.assertFalse(validate_args({"main": "check", "plan": "a", "sync": True}))
+        self.assertTrue(validate_args({"main": "check", "dry-run": True, "sync": True}))
+        # extra outputs
+        batch = {"main": "batch", "output-path": ".", "format": "flac"}
+        self.assertTrue(
+            validate_args({**batch, "extra-output": ["mp3:0:mp3", "opus::o:pus"]})
+        )
+        self.assertFalse(validate_args({**batch, "extra-output": ["mp3:0"]}))
+        self.assertFalse(validate_args({**batch, "extra-output": ["mp4:0:mp4"]}))
+        self.assertFalse(validate_args({**batch, "extra-output": ["mp3:10:mp3"]}))
+        self.assertFalse(validate_args({**batch, "extra-output": ["mp3:high:mp3"]}))
+        self.assertFalse(validate_args({**batch, "extra-output": ["mp3:0:"]}))
+        self.assertFalse(
+            validate_args({**batch, "extra-output": ["mp3::mp3"], "dry-run": True})
+        )
+        # sizes
+        self.assertTrue(validate_args({"main": "check", "min-size": "1.5M"}))
+        self.assertFalse(validate_args({"main": "check", "max-size": "a lot"}))
 
     def test_use_memory_gsettings_cbr(self):
         use_memory_gsettings(
@@ -347,6 +423,29 @@ class BatchUtils(unittest.TestCase):
         self.assertEqual(gio_settings.get_string("output-mime-type"), "audio/mpeg")
         self.assertEqual(gio_settings.get_int("mp3-cbr-quality"), 320)
 
+    def test_use_memory_gsettings_extra_output(self):
+        use_memory_gsettings(
+            {
+                "output-path": "flac",
+                "main": "batch",
+                "format": "flac",
+                "quality": "8",
+                "output-resample": 48000,
+                "extra-output": ["mp3:2:mp3", "opus::file:///o:pus"],
+            }
+        )
+        self.assertEqual(get_gio_settings().get_int("flac-compression"), 8)
+        mp3, opus = settings["extra-output-settings"]
+        self.assertEqual(mp3.get_string("output-mime-type"), "audio/mpeg")
+        self.assertEqual(mp3.get_int("mp3-vbr-quality"), 2)
+        self.assertEqual(mp3.get_string("selected-folder"), filename_to_uri("mp3"))
+        self.assertEqual(mp3.get_int("resample-rate"), 48000)
+        self.assertEqual(opus.get_string("output-mime-type"), "audio/ogg; codecs=opus")
+        self.assertEqual(opus.get_int("opus-bitrate"), 192)
+        self.assertEqual(
+            opus.get_string("selected-folder"), filename_to_uri("file:///o:pus")
+        )
+
     def test_use_memory_gsettings_default_mp3_mode(self):
         use_memory_gsettings(
             {"output-path": ".", "main": "batch", "format": "mp3", "quality": "5"}
@@ -364,6 +463,47 @@ class BatchUtils(unittest.TestCase):
         self.assertEqual(gio_settings.get_string("output-mime-type"), "audio/x-vorbis")
         self.assertEqual(gio_settings.get_double("vorbis-quality"), 0.5)
 
+    def test_use_memory_gsettings_task_order(self):
+        use_memory_gsettings({"output-path": ".", "main": "batch", "format": "mp3"})
+        self.assertEqual(get_gio_settings().get_string("task-order"), "fifo")
+        use_memory_gsettings(
+            {
+                "output-path": ".",
+                "main": "batch",
+                "format": "mp3",
+                "task-order": "longest-first",
+            }
+        )
+        self.assertEqual(get_gio_settings().get_string("task-order"), "longest-first")
+
+    def test_use_memory_gsettings_adaptive_jobs(self):
+        use_memory_gsettings({"output-path": ".", "main": "batch", "format": "mp3"})
+        self.assertFalse(get_gio_settings().get_boolean("adaptive-jobs"))
+        use_memory_gsettings(
+            {
+                "output-path": ".",
+                "main": "batch",
+                "format": "mp3",
+                "adaptive-jobs": True,
+                "forced-jobs": 16,
+            }
+        )
+        gio_settings = get_gio_settings()
+        self.assertTrue(gio_settings.get_boolean("adaptive-jobs"))
+        self.assertEqual(get_max_jobs(), 16)
+
+    def test_use_memory_gsettings_discovery_timeout(self):
+        use_memory_gsettings({"output-path": ".", "main": "batch", "format": "mp3"})
+        self.assertEqual(get_gio_settings().get_int("discovery-timeout"), 30)
+        use_memory_gsettings({"main": "check", "discovery-timeout": 2})
+        self.assertEqual(get_gio_settings().get_int("discovery-timeout"), 2)
+
+    def test_use_memory_gsettings_prefilter(self):
+        use_memory_gsettings({"main": "check"})
+        self.assertTrue(get_gio_settings().get_boolean("prefilter"))
+        use_memory_gsettings({"main": "check", "prefilter": False})
+        self.assertFalse(get_gio_settings().get_boolean("prefilter"))
+
     def test_set_delete_original_false(self):
         gio_settings = get_gio_settings()
         gio_settings.set_boolean("delete-original", True)
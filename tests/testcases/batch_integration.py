@@ -21,6 +21,7 @@
 
 """Tests that start soundconverter and try to convert files."""
 
+import json
 import os
 import shutil
 import time
@@ -29,11 +30,13 @@ from unittest.mock import patch
 
 from util import launch, reset_settings
 
-from soundconverter.gstreamer.converter import available_elements
+from soundconverter.gstreamer.converter import Converter, available_elements
 from soundconverter.gstreamer.discoverer import Discoverer
 from soundconverter.interface.batch import cli_convert
 from soundconverter.interface.mainloop import gtk_iteration
-from soundconverter.util.fileoperations import filename_to_uri
+from soundconverter.util.fileoperations import filename_to_uri, vfs_rename
+from soundconverter.util.journal import get_journal_path
+from soundconverter.util.manifest import get_manifest_path
 from soundconverter.util.settings import get_gio_settings, settings
 from soundconverter.util.soundfile import SoundFile
 
@@ -56,6 +59,19 @@ class BatchIntegration(unittest.TestCase):
             shutil.rmtree("tests/tmp")
         available_elements.update(original_available_elements)
 
+    def launch_and_collect(self, argv):
+        """Launch and return the Converters, which the queue doesn't keep."""
+        converters = []
+        run = Converter.run
+
+        def collect(converter):
+            converters.append(converter)
+            return run(converter)
+
+        with patch.object(Converter, "run", autospec=True, side_effect=collect):
+            launch(argv)
+        return converters
+
     def test_single_file_m4a(self):
         launch(
             [
@@ -300,6 +316,304 @@ class BatchIntegration(unittest.TestCase):
         remaining_after = conversion_queue.get_remaining()
         self.assertEqual(remaining_before, remaining_after)
 
+    def test_worker_processes(self):
+        converters = self.launch_and_collect(
+            [
+                "-b",
+                "tests/test data/audio",
+                "-r",
+                "-o",
+                "tests/tmp",
+                "-f",
+                "flac",
+                "--worker-processes",
+            ]
+        )
+        self.assertTrue(settings["worker-processes"])
+        self.assertTrue(os.path.isfile("tests/tmp/audio/a.flac"))
+        self.assertTrue(os.path.isfile("tests/tmp/audio/b/c.flac"))
+        conversion_queue = cli_convert[0].conversions
+        self.assertEqual(conversion_queue.num_failed, 0)
+        self.assertEqual(conversion_queue.num_done, len(converters))
+        for task in converters:
+            self.assertIsNone(task.error)
+            self.assertIsNone(task.worker)
+        self.assertEqual(conversion_queue.get_progress()[0], 1)
+
+    def test_resume(self):
+        output = filename_to_uri("tests/tmp")
+        input_a = filename_to_uri("tests/test data/audio/a.wav")
+        input_c = filename_to_uri("tests/test data/audio/b/c.mp3")
+        journal_path = get_journal_path(
+            ["tests/test data/audio"], output, "audio/x-flac"
+        )
+
+        # pretend a previous run converted a.wav and crashed while converting
+        # c.mp3, leaving a temporary file behind
+        temp = "tests/tmp/audio/b/c.mp3~123456~SC~"
+        os.makedirs(os.path.dirname(temp))
+        open(temp, "w").close()
+        os.makedirs(os.path.dirname(journal_path), exist_ok=True)
+        with open(journal_path, "w") as journal:
+            for uri in [input_a, input_c]:
+                journal.write(json.dumps({"event": "queued", "uri": uri}) + "\n")
+            journal.write(json.dumps({"event": "finished", "uri": input_a}) + "\n")
+            journal.write(
+                json.dumps(
+                    {
+                        "event": "started",
+                        "uri": input_c,
+                        "temps": [filename_to_uri(temp)],
+                    }
+                )
+                + "\n"
+            )
+            # incomplete line of the crash
+            journal.write('{"event": "fin')
+
+        launch(
+            [
+                "-b",
+                "tests/test data/audio",
+                "-r",
+                "-o",
+                "tests/tmp",
+                "-f",
+                "flac",
+                "--resume",
+            ]
+        )
+        self.assertTrue(settings["resume"])
+        self.assertFalse(os.path.exists(temp))
+        self.assertTrue(os.path.isfile("tests/tmp/audio/b/c.flac"))
+        # skipped without looking at the target
+        self.assertFalse(os.path.isfile("tests/tmp/audio/a.flac"))
+        # all done, nothing left to resume
+        self.assertFalse(os.path.exists(journal_path))
+
+    def test_resume_without_journal(self):
+        journal_path = get_journal_path(
+            ["tests/test data/audio/a.wav"],
+            filename_to_uri("tests/tmp"),
+            "audio/x-flac",
+        )
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+        with self.assertRaises(SystemExit) as ctx:
+            launch(
+                [
+                    "-b",
+                    "tests/test data/audio/a.wav",
+                    "-o",
+                    "tests/tmp",
+                    "-f",
+                    "flac",
+                    "--resume",
+                ]
+            )
+        self.assertEqual(ctx.exception.code, 1)
+        self.assertFalse(os.path.isfile("tests/tmp/a.flac"))
+
+    def test_journal(self):
+        journal_path = get_journal_path(
+            ["tests/test data/audio/a.wav"],
+            filename_to_uri("tests/tmp"),
+            "audio/x-flac",
+        )
+        launch(
+            [
+                "-b",
+                "tests/test data/audio/a.wav",
+                "-o",
+                "tests/tmp",
+                "-f",
+                "flac",
+            ]
+        )
+        journal = cli_convert[0].journal
+        self.assertEqual(journal.path, journal_path)
+        self.assertIsNone(journal.file)
+        self.assertFalse(os.path.exists(journal_path))
+
+    def test_sync(self):
+        shutil.copytree("tests/test data/audio", "tests/tmp/input")
+        manifest_path = get_manifest_path(
+            filename_to_uri("tests/tmp/output"), "audio/x-flac"
+        )
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(manifest_path + suffix):
+                os.remove(manifest_path + suffix)
+        args = ["-b", "tests/tmp/input", "-r", "-o", "tests/tmp/output", "-f", "flac"]
+
+        launch(args + ["--sync"])
+        self.assertEqual(cli_convert[0].num_conversions, 3)
+        self.assertTrue(os.path.isfile("tests/tmp/output/input/a.flac"))
+        self.assertTrue(os.path.isfile("tests/tmp/output/input/b/c.flac"))
+
+        # nothing changed, so nothing is discovered or converted
+        with patch.object(Discoverer, "run") as discover:
+            launch(args + ["--sync"])
+        discover.assert_not_called()
+        self.assertEqual(cli_convert[0].num_conversions, 0)
+        self.assertEqual(cli_convert[0].num_skipped, 3)
+
+        # a changed source is converted again, a removed one is deleted
+        os.remove("tests/tmp/input/b/c.mp3")
+        stat = os.stat("tests/tmp/input/a.wav")
+        os.utime("tests/tmp/input/a.wav", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        launch(args + ["--sync", "--sync-delete"])
+        self.assertEqual(cli_convert[0].num_conversions, 1)
+        self.assertTrue(os.path.isfile("tests/tmp/output/input/a.flac"))
+        # overwritten instead of incremented
+        self.assertFalse(os.path.exists("tests/tmp/output/input/a (1).flac"))
+        self.assertFalse(os.path.exists("tests/tmp/output/input/b/c.flac"))
+
+    def test_sync_shared_target(self):
+        os.makedirs("tests/tmp/input")
+        shutil.copy("tests/test data/audio/a.wav", "tests/tmp/input/a.wav")
+        manifest_path = get_manifest_path(
+            filename_to_uri("tests/tmp/output"), "audio/x-flac"
+        )
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(manifest_path + suffix):
+                os.remove(manifest_path + suffix)
+        args = ["-b", "tests/tmp/input", "-r", "-o", "tests/tmp/output", "-f", "flac"]
+
+        launch(args + ["--sync"])
+        self.assertEqual(cli_convert[0].num_conversions, 1)
+        with open("tests/tmp/output/input/a.flac", "rb") as target:
+            content = target.read()
+
+        # a new source with the same target doesn't replace the output of
+        # the unchanged one
+        shutil.copy("tests/test data/audio/a.wav", "tests/tmp/input/a.mp3")
+        launch(args + ["--sync"])
+        self.assertEqual(cli_convert[0].num_conversions, 1)
+        self.assertEqual(cli_convert[0].num_skipped, 1)
+        self.assertTrue(os.path.isfile("tests/tmp/output/input/a (1).flac"))
+        with open("tests/tmp/output/input/a.flac", "rb") as target:
+            self.assertEqual(target.read(), content)
+
+        # changed sources overwrite their own previous target
+        for path in ("tests/tmp/input/a.wav", "tests/tmp/input/a.mp3"):
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        launch(args + ["--sync"])
+        self.assertEqual(cli_convert[0].num_conversions, 2)
+        self.assertTrue(os.path.isfile("tests/tmp/output/input/a.flac"))
+        self.assertTrue(os.path.isfile("tests/tmp/output/input/a (1).flac"))
+        self.assertFalse(os.path.exists("tests/tmp/output/input/a (2).flac"))
+
+    def test_plan(self):
+        shutil.copytree("tests/test data/audio", "tests/tmp/input")
+        # both end up as a.flac
+        shutil.copy("tests/tmp/input/a.wav", "tests/tmp/input/a.mp3")
+        args = ["-b", "tests/tmp/input", "-r", "-o", "tests/tmp/output", "-f", "flac"]
+
+        launch(args + ["--dry-run"])
+        self.assertEqual(len(cli_convert[0].plan.entries), 4)
+        self.assertFalse(os.path.exists("tests/tmp/output"))
+
+        launch(args + ["--write-plan", "tests/tmp/plan.jsonl"])
+        self.assertFalse(os.path.exists("tests/tmp/output"))
+        planned = {
+            entry.source: entry.target for entry in cli_convert[0].plan.entries.values()
+        }
+        # the same one gets the number every time
+        self.assertEqual(
+            sorted(os.path.basename(target) for target in planned.values())[:2],
+            ["a (1).flac", "a.flac"],
+        )
+        self.assertTrue(
+            planned[filename_to_uri("tests/tmp/input/a.mp3")].endswith("/a.flac")
+        )
+
+        # no input files needed, nothing is discovered
+        with patch.object(Discoverer, "run") as discover:
+            launch(
+                ["-b", "-o", "tests/tmp/output", "-f", "flac"]
+                + ["--plan", "tests/tmp/plan.jsonl"]
+            )
+        discover.assert_not_called()
+        self.assertEqual(cli_convert[0].num_conversions, 4)
+        self.assertTrue(os.path.isfile("tests/tmp/output/input/a.flac"))
+        self.assertTrue(os.path.isfile("tests/tmp/output/input/a (1).flac"))
+
+    def test_extra_output(self):
+        converters = self.launch_and_collect(
+            [
+                "-b",
+                "tests/test data/audio/a.wav",
+                "-o",
+                "tests/tmp/flac",
+                "-f",
+                "flac",
+                "--extra-output",
+                "mp3:0:tests/tmp/mp3",
+                "--extra-output",
+                "opus:128:tests/tmp/opus",
+            ]
+        )
+        self.assertEqual(cli_convert[0].num_conversions, 1)
+        converter = converters[0]
+        self.assertIsNone(converter.error)
+        self.assertIn(" tee name=tee ", converter.command)
+        self.assertTrue(os.path.isfile("tests/tmp/flac/a.flac"))
+        self.assertTrue(os.path.isfile("tests/tmp/mp3/a.mp3"))
+        self.assertTrue(os.path.isfile("tests/tmp/opus/a.opus"))
+
+        # only the missing output is written
+        os.remove("tests/tmp/mp3/a.mp3")
+        converters = self.launch_and_collect(
+            [
+                "-b",
+                "tests/test data/audio/a.wav",
+                "-o",
+                "tests/tmp/flac",
+                "-f",
+                "flac",
+                "-e",
+                "skip",
+                "--extra-output",
+                "mp3:0:tests/tmp/mp3",
+                "--extra-output",
+                "opus:128:tests/tmp/opus",
+            ]
+        )
+        converter = converters[0]
+        self.assertNotIn("tee", converter.command)
+        self.assertTrue(os.path.isfile("tests/tmp/mp3/a.mp3"))
+        self.assertFalse(os.path.exists("tests/tmp/flac/a (1).flac"))
+
+    def test_extra_output_rename_failed(self):
+        def rename(source, target):
+            if target.endswith(".opus"):
+                raise OSError("no space left")
+            vfs_rename(source, target)
+
+        with patch("soundconverter.gstreamer.converter.vfs_rename", rename):
+            converters = self.launch_and_collect(
+                [
+                    "-b",
+                    "tests/test data/audio/a.wav",
+                    "-o",
+                    "tests/tmp/flac",
+                    "-f",
+                    "flac",
+                    "--extra-output",
+                    "mp3:0:tests/tmp/mp3",
+                    "--extra-output",
+                    "opus:128:tests/tmp/opus",
+                ]
+            )
+        self.assertEqual(converters[0].error, "no space left")
+        # moved before the failure, it is complete
+        self.assertTrue(os.path.isfile("tests/tmp/mp3/a.mp3"))
+        self.assertFalse(os.path.exists("tests/tmp/opus/a.opus"))
+        self.assertFalse(os.path.exists("tests/tmp/flac/a.flac"))
+        for _, _, filenames in os.walk("tests/tmp"):
+            self.assertEqual([f for f in filenames if f.endswith("~SC~")], [])
+
     def test_tags(self):
         # it should run and not raise exceptions
         launch(["-t", "tests/test data/", "-r"])
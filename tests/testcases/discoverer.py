@@ -22,12 +22,15 @@
 import os
 import time
 import unittest
-from unittest.mock import Mock
+from threading import Event
+from unittest.mock import Mock, patch
 
 from gi.repository import GLib
 
 from soundconverter.gstreamer.discoverer import (
     Discoverer,
+    DiscovererThread,
+    DiscoveryStream,
     add_discoverers,
     is_denylisted,
 )
@@ -94,6 +97,149 @@ class DiscovererQueueTest(unittest.TestCase):
         self.assertTrue(sound_files[3].readable)
         self.assertFalse(sound_files[4].readable)
 
+    def test_work_stealing(self):
+        self.gio_settings.set_boolean("limit-jobs", True)
+        self.gio_settings.set_int("number-of-jobs", 2)
+        sound_files = [SoundFile(f"file:///{i}.mp3") for i in range(10)]
+
+        def _analyse_file(_, sound_file):
+            # the first file is huge and takes long, the others are quick
+            time.sleep(0.3 if sound_file is sound_files[0] else 0.01)
+            sound_file.readable = True
+
+        path = "soundconverter.gstreamer.discoverer.DiscovererThread._analyse_file"
+        with patch(path, _analyse_file):
+            add_discoverers(self.queue, sound_files)
+            first, second = self.queue.all_tasks
+            self.assertEqual(first.sound_files, sound_files[:5])
+            self.assertEqual(second.sound_files, sound_files[5:])
+            self.queue.run()
+            self.wait_for_queue()
+
+        # the second thread took over the files of the first chunk
+        self.assertEqual(first.discovered, 1)
+        self.assertEqual(second.discovered, 9)
+        self.assertEqual(self.queue.get_progress()[0], 1)
+        self.assertTrue(all(sound_file.readable for sound_file in sound_files))
+
+    def test_progress_without_main_loop(self):
+        sound_files = [SoundFile(f"file:///{i}.mp3") for i in range(100)]
+        release = Event()
+
+        def _analyse_file(_, sound_file):
+            if sound_file is sound_files[50]:
+                release.wait(5)
+
+        path = "soundconverter.gstreamer.discoverer.DiscovererThread._analyse_file"
+        with patch(path, _analyse_file):
+            discoverer = Discoverer(sound_files)
+            on_done = Mock()
+            discoverer.connect("done", on_done)
+            with patch.object(GLib, "idle_add") as idle_add:
+                discoverer.run()
+                # the counter is updated without iterating the main loop
+                while discoverer.discovered < 50:
+                    time.sleep(0.001)
+                self.assertEqual(discoverer.get_progress(), (0.5, 1))
+                self.assertTrue(discoverer.running)
+                release.set()
+                discoverer.thread.join()
+
+        self.assertEqual(discoverer.discovered, 100)
+        # a single notification for the whole thread
+        idle_add.assert_called_once_with(discoverer._on_finished)
+        on_done.assert_not_called()
+        discoverer._on_finished()
+        self.assertFalse(discoverer.running)
+        on_done.assert_called_once()
+
+
+class DiscoveryStreamTest(unittest.TestCase):
+    def test_bounded(self):
+        produced = []
+
+        def sound_files():
+            for i in range(1000):
+                sound_file = SoundFile(f"file:///{i}.mp3")
+                produced.append(sound_file)
+                yield sound_file
+
+        def _analyse_file(_, sound_file):
+            sound_file.readable = True
+
+        path = "soundconverter.gstreamer.discoverer.DiscovererThread._analyse_file"
+        with patch(path, _analyse_file):
+            stream = DiscoveryStream(sound_files(), 10)
+            stream.start()
+            time.sleep(0.2)
+            # nothing is collected yet, so the producer is waiting for
+            # room in the queues instead of iterating over everything
+            self.assertLess(len(produced), 100)
+
+            discovered = []
+            while not stream.finished:
+                discovered += stream.get_discovered(20)
+                time.sleep(0.001)
+
+        self.assertEqual(len(produced), 1000)
+        self.assertEqual(
+            sorted(sound_file.uri for sound_file in discovered),
+            sorted(sound_file.uri for sound_file in produced),
+        )
+        self.assertTrue(all(sound_file.readable for sound_file in discovered))
+
+
+class FakeGstDiscoverer:
+    """Stands in for GstPbutils.Discoverer, takes long for slow uris."""
+
+    def __init__(self, slow_uris):
+        self.slow_uris = slow_uris
+
+    def discover_uri(self, uri):
+        if uri in self.slow_uris:
+            time.sleep(0.1)
+            raise GLib.Error("timeout")
+        # not an audio file
+        return None
+
+
+class DiscovererThreadTest(unittest.TestCase):
+    def test_reuse_and_timeout(self):
+        sound_files = [SoundFile(f"file:///{i}.mp3") for i in range(4)]
+        slow_uris = [sound_files[1].uri]
+        created = []
+
+        def new(timeout):
+            created.append(timeout)
+            return FakeGstDiscoverer(slow_uris)
+
+        path = "soundconverter.gstreamer.discoverer.GstPbutils.Discoverer.new"
+        with patch(path, new):
+            thread = DiscovererThread(sound_files, Mock())
+            self.assertEqual(thread.timeout, 30)
+            thread.timeout = 0.05
+            thread.run()
+
+        # one discoverer for the first two files, a new one after the timeout
+        self.assertEqual(len(created), 2)
+        self.assertFalse(sound_files[1].readable)
+
+    def test_needed_tags(self):
+        thread = DiscovererThread([], Mock(), {"artist", "year"})
+        self.assertEqual(thread.gst_tags, ("artist", "datetime", "year"))
+
+        taglist = Mock()
+        taglist.get_tag_size = lambda tag: 1 if tag in ("artist", "title") else 0
+        added = []
+        with patch.object(thread, "_add_tag", lambda _, tag, __: added.append(tag)):
+            thread._read_tags(taglist, SoundFile("file:///a.mp3"))
+
+        # title was not even looked at
+        self.assertEqual(added, ["artist"])
+        taglist.foreach.assert_not_called()
+
+        self.assertIsNone(DiscovererThread([], Mock()).gst_tags)
+
 
 class DiscovererTest(unittest.TestCase):
     """Checks if async Task class functions are working properly."""
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from gi.repository import Gst, GstPbutils
+from util import reset_settings
+
+from soundconverter.gstreamer.discoverer import DiscovererThread, DiscoveryProcess
+from soundconverter.util.fileoperations import filename_to_uri
+from soundconverter.util.settings import settings
+from soundconverter.util.soundfile import SoundFile
+
+C_MP3 = filename_to_uri(os.path.realpath("tests/test data/audio/b/c.mp3"))
+A_WAV = filename_to_uri(os.path.realpath("tests/test data/audio/a.wav"))
+EMPTY = filename_to_uri(os.path.realpath("tests/test data/empty/a"))
+
+
+def use_gstreamer():
+    """Run a discovery, which starts the threads of gstreamer."""
+    discoverer = GstPbutils.Discoverer.new(5 * Gst.SECOND)
+    try:
+        discoverer.discover_uri(C_MP3)
+    except Exception:
+        pass
+
+
+class DiscoveryWorkerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        settings["discovery-processes"] = True
+
+    def tearDown(self):
+        reset_settings()
+        shutil.rmtree(self.directory)
+
+    def test_discoverer_thread(self):
+        sound_files = [SoundFile(uri) for uri in (C_MP3, EMPTY, A_WAV)]
+        thread = DiscovererThread(sound_files, Mock(), {"artist"})
+        thread.cache = None
+        thread.run()
+
+        self.assertIsNone(thread.process)
+        self.assertTrue(sound_files[0].readable)
+        self.assertEqual(sound_files[0].tags, {"artist": "test_artist"})
+        self.assertEqual(int(sound_files[0].duration), 1)
+        self.assertFalse(sound_files[1].readable)
+        self.assertTrue(sound_files[2].readable)
+        self.assertEqual(sound_files[2].codec, "audio/x-raw")
+
+    def test_stuck_worker(self):
+        # reading from a fifo without a writer blocks forever
+        fifo = os.path.join(self.directory, "fifo.mp3")
+        os.mkfifo(fifo)
+        sound_files = [SoundFile(filename_to_uri(fifo)), SoundFile(C_MP3)]
+
+        thread = DiscovererThread(sound_files, Mock())
+        thread.cache = None
+        thread.timeout = 1
+        with patch.object(DiscoveryProcess, "grace_period", 0):
+            start = time.monotonic()
+            thread.run()
+
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertFalse(sound_files[0].readable)
+        # a new worker took over
+        self.assertTrue(sound_files[1].readable)
+
+    def test_fork_hang(self):
+        """Forked processes can hang in discover_uri, spawned ones don't."""
+        use_gstreamer()
+
+        context = multiprocessing.get_context("fork")
+        forked = context.Process(target=use_gstreamer)
+        forked.start()
+        forked.join(10)
+        hung = forked.is_alive()
+        if hung:
+            forked.kill()
+            forked.join()
+
+        # the same situation, but the worker is a fresh process
+        process = DiscoveryProcess(5)
+        sound_file = SoundFile(C_MP3)
+        try:
+            self.assertTrue(process.discover(sound_file))
+        finally:
+            process.stop()
+        self.assertTrue(sound_file.readable)
+
+        if not hung:
+            self.skipTest("discover_uri did not hang in a forked process here")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from util import reset_settings
+
+from soundconverter.util.eta import EtaEstimator, SpeedHistory
+from soundconverter.util.settings import get_gio_settings
+from soundconverter.util.task import Task
+from soundconverter.util.taskqueue import TaskQueue
+
+
+class KeyedTask(Task):
+    """Task that makes progress only when told to."""
+
+    def __init__(self, key, weight):
+        self.key = key
+        self.weight = weight
+        self.progress = 0
+        self.error = None
+        super().__init__()
+
+    def get_progress(self):
+        return self.progress, self.weight
+
+    def get_speed_key(self):
+        return self.key
+
+    def run(self):
+        pass
+
+    def cancel(self):
+        pass
+
+    def pause(self):
+        pass
+
+    def resume(self):
+        pass
+
+    def finish(self):
+        self.progress = 1
+        self.emit("done")
+
+
+class SpeedHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "speeds.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_smoothing(self):
+        history = SpeedHistory(self.path)
+        self.assertIsNone(history.get("a"))
+        history.add("a", 10, 1)
+        self.assertEqual(history.get("a"), 10)
+
+        # a short outlier doesn't change much
+        history.add("a", 100, 0.1)
+        self.assertGreater(history.get("a"), 10)
+        self.assertLess(history.get("a"), 11)
+
+        # but a long lasting change does
+        for _ in range(10):
+            history.add("a", 100, 10)
+        self.assertAlmostEqual(history.get("a"), 100, places=1)
+
+    def test_save_load(self):
+        history = SpeedHistory(self.path)
+        history.load()
+        self.assertEqual(history.speeds, {})
+        history.add("a", 10, 1)
+        history.save()
+
+        history = SpeedHistory(self.path)
+        history.load()
+        self.assertEqual(history.get("a"), 10)
+
+    def test_load_broken(self):
+        with open(self.path, "w") as file:
+            file.write('{"a": 1')
+        history = SpeedHistory(self.path)
+        history.load()
+        self.assertEqual(history.speeds, {})
+
+
+class EtaEstimatorTest(unittest.TestCase):
+    def setUp(self):
+        get_gio_settings().set_boolean("limit-jobs", True)
+        get_gio_settings().set_int("number-of-jobs", 2)
+        self.history = SpeedHistory(os.path.join(tempfile.mkdtemp(), "speeds"))
+        self.queue = TaskQueue()
+        self.eta = EtaEstimator(self.queue, self.history)
+
+    def tearDown(self):
+        reset_settings()
+        shutil.rmtree(os.path.dirname(self.history.path))
+
+    def test_from_history(self):
+        self.history.add("flac", 10, 1)
+        self.history.add("mp3", 5, 1)
+        tasks = [
+            KeyedTask("flac", 100),
+            KeyedTask("flac", 100),
+            KeyedTask("mp3", 100),
+        ]
+        for task in tasks:
+            self.queue.add(task)
+        self.queue.run()
+        for task in tasks:
+            task.timer.get_duration = lambda: 0
+
+        # known right away, without any progress: 10 + 10 + 20 seconds
+        # of work for two jobs
+        self.eta.update()
+        self.assertAlmostEqual(self.eta.get_remaining(), 20)
+
+    def test_measure(self):
+        tasks = [KeyedTask("flac", 100), KeyedTask("unknown", 10)]
+        for task in tasks:
+            self.queue.add(task)
+        self.queue.run()
+        for task in tasks:
+            task.timer.get_duration = lambda: 0
+        self.eta.update()
+        self.assertIsNone(self.eta.get_remaining())
+
+        # 50 weight in 5 seconds
+        tasks[0].progress = 0.5
+        tasks[0].timer.get_duration = lambda: 5
+        tasks[1].timer.get_duration = lambda: 5
+        self.eta.update()
+        self.assertAlmostEqual(self.history.get("flac"), 10)
+        # nothing processed, but the speed of flac is used in the meantime
+        self.assertIsNone(self.history.get("unknown"))
+        # the flac task needs 5 more seconds, the other one 1 second
+        self.assertAlmostEqual(self.eta.get_remaining(), 5)
+
+        tasks[1].progress = 0.5
+        tasks[1].timer.get_duration = lambda: 10
+        tasks[0].finish()
+        tasks[0].timer.get_duration = lambda: 10
+        self.eta.update()
+        self.assertAlmostEqual(self.history.get("flac"), 10)
+        # 5 weight since it started to make progress
+        self.assertAlmostEqual(self.history.get("unknown"), 1)
+        self.assertEqual(self.eta.remaining_weights, {"flac": 0, "unknown": 10})
+        # 5 weight left at 1 per second
+        self.assertAlmostEqual(self.eta.get_remaining(), 5)
@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+import unittest
+
+from util import reset_settings
+
+from soundconverter.gstreamer.fileio import (
+    DEFAULT_BLOCK_SIZE,
+    get_local_path,
+    get_sink,
+    get_source,
+    quote_location,
+)
+from soundconverter.util.settings import settings
+
+
+class FileIOTest(unittest.TestCase):
+    def tearDown(self):
+        reset_settings()
+
+    def test_get_local_path(self):
+        self.assertEqual(get_local_path("file:///a%20b/c.flac"), "/a b/c.flac")
+        self.assertEqual(get_local_path("file:///%C3%A4%25.flac"), "/ä%.flac")
+        self.assertIsNone(get_local_path("file://host/a.flac"))
+        self.assertIsNone(get_local_path("smb://host/a.flac"))
+
+    def test_local(self):
+        self.assertEqual(
+            get_source("file:///a%20b/c.flac"),
+            (f"filesrc blocksize={DEFAULT_BLOCK_SIZE}", "/a b/c.flac"),
+        )
+        self.assertEqual(
+            get_sink("/a b/c.wav"),
+            (
+                f"filesink buffer-mode=full buffer-size={DEFAULT_BLOCK_SIZE}",
+                "/a b/c.wav",
+            ),
+        )
+        settings["block-size"] = 1024
+        self.assertEqual(
+            get_source("file:///a.flac"),
+            ("filesrc blocksize=1024", "/a.flac"),
+        )
+
+    def test_gio(self):
+        self.assertEqual(
+            get_source("ftp://host/a%20b.flac"),
+            ("giosrc", "ftp://host/a%20b.flac"),
+        )
+        self.assertEqual(
+            get_sink("smb://host/a b.wav"),
+            ("giosink", "smb://host/a%20b.wav"),
+        )
+        settings["block-size"] = 0
+        self.assertEqual(
+            get_source("file:///a%20b.flac"),
+            ("giosrc", "file:///a%20b.flac"),
+        )
+
+    def test_quote_location(self):
+        self.assertEqual(quote_location("/a b/c.flac"), '"/a b/c.flac"')
+        self.assertEqual(quote_location('/a"\\b.flac'), '"/a\\"\\\\b.flac"')
+
+
+if __name__ == "__main__":
+    unittest.main()
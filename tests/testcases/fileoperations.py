@@ -19,9 +19,21 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
 # USA
 
+import os
+import shutil
+import tempfile
 import unittest
+from unittest.mock import patch
 
-from soundconverter.util.fileoperations import is_uri, split_uri
+from gi.repository import Gio
+
+from soundconverter.util.fileoperations import (
+    filename_to_uri,
+    is_uri,
+    iter_walk,
+    split_uri,
+    vfs_walk,
+)
 
 
 class Fileoperations(unittest.TestCase):
@@ -65,5 +77,74 @@ class Fileoperations(unittest.TestCase):
         self.assertFalse(is_uri("file://"))
 
 
+class WalkTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for path in ("a.mp3", "b/c.mp3", "b/d/e f.mp3", "b/d/g.mp3", "h/i.mp3"):
+            path = os.path.join(self.directory, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as file:
+                file.write("foo")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def walk(self, **kwargs):
+        return [
+            (uri[len(filename_to_uri(self.directory)) :], relative)
+            for uri, relative in iter_walk(filename_to_uri(self.directory), **kwargs)
+        ]
+
+    def test_order(self):
+        expected = [
+            ("/a.mp3", ""),
+            ("/b/c.mp3", "b/"),
+            ("/b/d/e%20f.mp3", "b/d/"),
+            ("/b/d/g.mp3", "b/d/"),
+            ("/h/i.mp3", "h/"),
+        ]
+        # the same as with a single thread
+        self.assertEqual(self.walk(), expected)
+        self.assertEqual(self.walk(max_workers=1), expected)
+        self.assertEqual(
+            vfs_walk(filename_to_uri(self.directory)),
+            [filename_to_uri(self.directory) + uri for uri, _ in expected],
+        )
+
+    def test_gio_escaping(self):
+        # urllib would escape those, gio doesn't
+        path = os.path.join(self.directory, "Best (Of)", "a&'b.mp3")
+        os.makedirs(os.path.dirname(path))
+        open(path, "w").close()
+        base = Gio.File.new_for_path(os.path.dirname(path)).get_uri()
+        walked = [uri for uri, _ in iter_walk(base)]
+        self.assertEqual(walked, [Gio.File.new_for_path(path).get_uri()])
+        self.assertTrue(walked[0].startswith(base))
+        self.assertIn("(Of)/a&'b.mp3", walked[0])
+
+    def test_symlink_loop(self):
+        os.symlink(self.directory, os.path.join(self.directory, "b", "loop"))
+        os.symlink(os.path.join(self.directory, "h"), os.path.join(self.directory, "j"))
+        os.symlink("/nonexistent", os.path.join(self.directory, "k.mp3"))
+        walked = self.walk()
+        self.assertEqual(len(walked), 5)
+        # h comes before the link j to it
+        self.assertIn(("/h/i.mp3", "h/"), walked)
+
+    def test_unreadable(self):
+        scandir = os.scandir
+        unreadable = os.path.join(self.directory, "b")
+
+        def fail(path):
+            if path == unreadable:
+                raise PermissionError("no")
+            return scandir(path)
+
+        with patch.object(os, "scandir", fail):
+            walked = self.walk()
+        self.assertEqual(walked, [("/a.mp3", ""), ("/h/i.mp3", "h/")])
+        self.assertEqual(list(iter_walk(filename_to_uri(unreadable + "/x"))), [])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,264 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+import os
+import struct
+import unittest
+from unittest.mock import Mock, patch
+
+from soundconverter.gstreamer.discoverer import DiscovererThread
+from soundconverter.util.fileoperations import filename_to_uri
+from soundconverter.util.headerreader import Unsupported, parse, read_header
+from soundconverter.util.soundfile import SoundFile
+
+
+def vorbis_comment(*comments):
+    data = struct.pack("<I", 3) + b"foo" + struct.pack("<I", len(comments))
+    for comment in comments:
+        comment = comment.encode()
+        data += struct.pack("<I", len(comment)) + comment
+    return data
+
+
+def ogg_page(serial, granule, packets, flags=0):
+    lacing = b""
+    for packet in packets:
+        lacing += b"\xff" * (len(packet) // 255) + bytes([len(packet) % 255])
+    header = b"OggS" + struct.pack(
+        "<BBqIIIB", 0, flags, granule, serial, 0, 0, len(lacing)
+    )
+    return header + lacing + b"".join(packets)
+
+
+def atom(atom_type, *content):
+    content = b"".join(content)
+    return struct.pack(">I", len(content) + 8) + atom_type + content
+
+
+def mp4(handlers, ilst=b""):
+    traks = b""
+    for handler in handlers:
+        stsd = atom(b"stsd", b"\0" * 4, struct.pack(">I", 1), atom(b"mp4a", b"\0" * 28))
+        hdlr = atom(b"hdlr", b"\0" * 8, handler, b"\0" * 12)
+        minf = atom(b"minf", atom(b"stbl", stsd))
+        traks += atom(b"trak", atom(b"mdia", hdlr, minf))
+    mvhd = atom(b"mvhd", b"\0" * 12, struct.pack(">II", 1000, 2500), b"\0" * 80)
+    udta = atom(b"udta", atom(b"meta", b"\0" * 4, atom(b"ilst", ilst)))
+    return atom(b"ftyp", b"M4A \0\0\0\0") + atom(b"moov", mvhd, traks, udta)
+
+
+def id3v2(*frames, version=3):
+    content = b""
+    for frame_id, text in frames:
+        frame = b"\x03" + text.encode()
+        content += frame_id + struct.pack(">IH", len(frame), 0) + frame
+    content += b"\0" * 16
+    size = len(content)
+    syncsafe = bytes([(size >> shift) & 0x7F for shift in (21, 14, 7, 0)])
+    return b"ID3" + bytes([version, 0, 0]) + syncsafe + content
+
+
+def mpeg_frames(count):
+    # MPEG 1 layer III, 128 kbit/s, 44.1 kHz, 417 bytes per frame
+    return (b"\xff\xfb\x90\x00" + b"\0" * 413) * count
+
+
+def info_frame(count):
+    # a frame like the others, with the Info header of a constant bitrate
+    content = b"\0" * 32 + b"Info" + struct.pack(">II", 1, count)
+    return b"\xff\xfb\x90\x00" + content + b"\0" * (413 - len(content))
+
+
+class ParseTest(unittest.TestCase):
+    def test_flac(self):
+        # 44.1 kHz, stereo, 16 bit, 88200 samples
+        info = (44100 << 44) | (1 << 41) | (15 << 36) | 88200
+        streaminfo = b"\0" * 10 + struct.pack(">Q", info) + b"\0" * 16
+        comment = vorbis_comment(
+            "ARTIST=a", "artist=b", "TRACKNUMBER=03/12", "DATE=1999"
+        )
+        data = (
+            b"fLaC"
+            + b"\x00"
+            + len(streaminfo).to_bytes(3, "big")
+            + streaminfo
+            + b"\x84"
+            + len(comment).to_bytes(3, "big")
+            + comment
+        )
+        codec, duration, tags = parse(data)
+        self.assertEqual(codec, "audio/x-flac")
+        self.assertEqual(duration, 2)
+        self.assertEqual(
+            tags,
+            {
+                "artist": "a, b",
+                "track-number": "3",
+                "track-count": "12",
+                "year": 1999,
+                "date": "1999",
+            },
+        )
+
+    def test_opus(self):
+        identification = b"OpusHead\x01\x02" + struct.pack("<H", 312) + b"\0" * 7
+        comment = b"OpusTags" + vorbis_comment("TITLE=" + "t" * 300)
+        data = (
+            ogg_page(7, 0, [identification], flags=2)
+            + ogg_page(7, 0, [comment])
+            + ogg_page(7, 48312, [b"\0" * 10], flags=4)
+        )
+        codec, duration, tags = parse(data)
+        self.assertEqual(codec, "audio/x-opus")
+        self.assertEqual(duration, 1)
+        self.assertEqual(tags, {"title": "t" * 300})
+
+    def test_ogg_multiplexed(self):
+        identification = b"\x01vorbis" + b"\0" * 23
+        data = ogg_page(1, 0, [identification], flags=2) + ogg_page(2, 0, [b"x"])
+        self.assertRaises(Unsupported, parse, data)
+
+    def test_wav(self):
+        fmt = struct.pack("<HHIIHH", 1, 2, 8000, 32000, 4, 16)
+        info = b"INFO" + b"INAM" + struct.pack("<I", 3) + b"ab\0\0"
+        data = (
+            b"WAVEfmt "
+            + struct.pack("<I", len(fmt))
+            + fmt
+            + b"LIST"
+            + struct.pack("<I", len(info))
+            + info
+            + b"data"
+            + struct.pack("<I", 16000)
+            + b"\0" * 16000
+        )
+        data = b"RIFF" + struct.pack("<I", len(data)) + data
+        codec, duration, tags = parse(data)
+        self.assertEqual(codec, "audio/x-raw")
+        self.assertEqual(duration, 0.5)
+        self.assertEqual(tags, {"container-format": "WAV", "title": "ab"})
+
+    def test_mp4(self):
+        data_atom = atom(b"data", b"\0\0\0\x01\0\0\0\0", b"foo")
+        trkn = atom(b"data", b"\0" * 8, struct.pack(">HHHH", 0, 2, 10, 0))
+        ilst = atom(b"\xa9ART", data_atom) + atom(b"trkn", trkn)
+        codec, duration, tags = parse(mp4([b"soun"], ilst))
+        self.assertEqual(codec, "audio/mpeg")
+        self.assertEqual(duration, 2.5)
+        self.assertEqual(
+            tags, {"artist": "foo", "track-number": "2", "track-count": "10"}
+        )
+
+    def test_mp4_video(self):
+        self.assertRaises(Unsupported, parse, mp4([b"vide", b"soun"]))
+
+    def test_mp3(self):
+        data = id3v2((b"TIT2", "title"), (b"TPOS", "1/2"))
+        data += info_frame(10) + mpeg_frames(10)
+        codec, duration, tags = parse(data)
+        self.assertEqual(codec, "audio/mpeg")
+        self.assertAlmostEqual(duration, 10 * 1152 / 44100, delta=0.001)
+        self.assertEqual(
+            tags,
+            {"title": "title", "album-disc-number": "1", "album-disc-count": "2"},
+        )
+
+    def test_mp3_vbr(self):
+        # a different bitrate in the second frame, without a Xing header
+        data = b"\xff\xfb\x90\x00" + b"\0" * 413 + b"\xff\xfb\xa0\x00" + b"\0" * 100
+        self.assertRaises(Unsupported, parse, data)
+
+    def test_mp3_without_header(self):
+        # the bitrate might change after the first frames, only gstreamer
+        # can tell the duration
+        self.assertRaises(Unsupported, parse, mpeg_frames(10))
+
+    def test_id3_numbered_genre(self):
+        data = id3v2((b"TCON", "(17)")) + info_frame(2) + mpeg_frames(2)
+        self.assertRaises(Unsupported, parse, data)
+
+    def test_id3_unsynchronised(self):
+        data = bytearray(id3v2((b"TIT2", "title")) + mpeg_frames(2))
+        data[5] = 0x80
+        self.assertRaises(Unsupported, parse, data)
+
+
+class ReadHeaderTest(unittest.TestCase):
+    def get_sound_file(self, path):
+        return SoundFile(filename_to_uri(os.path.realpath(path)))
+
+    def test_read_header(self):
+        sound_file = self.get_sound_file("tests/test data/audio/b/c.mp3")
+        self.assertTrue(read_header(sound_file))
+        self.assertTrue(sound_file.readable)
+        self.assertEqual(sound_file.codec, "audio/mpeg")
+        self.assertEqual(int(sound_file.duration), 1)
+        self.assertEqual(sound_file.tags["artist"], "test_artist")
+        self.assertEqual(sound_file.tags["album"], "test_album")
+
+        for path in ("no-tags.flac", "no-tags.mp3", "no-tags.ogg"):
+            sound_file = self.get_sound_file(f"tests/test data/no tags/{path}")
+            self.assertTrue(read_header(sound_file))
+            self.assertEqual(int(sound_file.duration), 1)
+
+    def test_needed_tags(self):
+        sound_file = self.get_sound_file("tests/test data/audio/b/c.mp3")
+        self.assertTrue(read_header(sound_file, {"album", "title"}))
+        self.assertEqual(sound_file.tags, {"album": "test_album"})
+
+    def test_not_audio(self):
+        for path in ("tests/test data/empty/a", "tests/test data/image.jpg"):
+            sound_file = self.get_sound_file(path)
+            self.assertFalse(read_header(sound_file))
+            self.assertFalse(sound_file.readable)
+            self.assertIsNone(sound_file.duration)
+
+    def test_fallback(self):
+        sound_files = [
+            self.get_sound_file("tests/test data/audio/a.wav"),
+            self.get_sound_file("tests/test data/image.jpg"),
+        ]
+        discover = Mock(return_value=True)
+        with patch.object(DiscovererThread, "_discover", discover):
+            thread = DiscovererThread(sound_files, Mock(), {"title"})
+            thread.cache = None
+            thread.prefilter = None
+            thread.run()
+
+        # only the image was handed to gstreamer
+        discover.assert_called_once_with(sound_files[1])
+        self.assertEqual(sound_files[0].duration, 1)
+
+    def test_all_tags(self):
+        # for example for -t, which prints all tags that gstreamer knows
+        sound_file = self.get_sound_file("tests/test data/audio/b/c.mp3")
+        discover = Mock(return_value=True)
+        with patch.object(DiscovererThread, "_discover", discover):
+            thread = DiscovererThread([sound_file], Mock())
+            thread.cache = None
+            thread.prefilter = None
+            thread.run()
+        discover.assert_called_once_with(sound_file)
+
+
+if __name__ == "__main__":
+    unittest.main()
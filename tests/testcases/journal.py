@@ -0,0 +1,143 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from soundconverter.util.fileoperations import filename_to_uri
+from soundconverter.util.journal import Journal, get_journal_path
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.journal = Journal(os.path.join(self.directory, "journal.jsonl"))
+        self.source = filename_to_uri(os.path.join(self.directory, "a.wav"))
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.directory)
+
+    def create(self, filename):
+        path = os.path.join(self.directory, filename)
+        open(path, "w").close()
+        return filename_to_uri(path)
+
+    def write(self, *entries):
+        with open(self.journal.path, "w") as journal:
+            for entry in entries:
+                journal.write(json.dumps({"uri": self.source, **entry}) + "\n")
+
+    def test_path(self):
+        path = get_journal_path(["b", "/a"], "file:///out", "audio/x-flac")
+        self.assertEqual(
+            path,
+            get_journal_path(
+                ["/a", os.path.abspath("b")], "file:///out", "audio/x-flac"
+            ),
+        )
+        # different inputs into the same output don't share a journal
+        self.assertNotEqual(
+            path, get_journal_path(["/a"], "file:///out", "audio/x-flac")
+        )
+        self.assertNotEqual(
+            path, get_journal_path(["b", "/a"], "file:///out", "audio/mpeg")
+        )
+
+    def test_exists(self):
+        self.assertFalse(self.journal.exists())
+        self.journal.start()
+        self.assertTrue(self.journal.exists())
+
+    def test_moving(self):
+        converter = Mock()
+        converter.sound_file.uri = self.source
+        converter.newname = "file:///a.mp3"
+        converter.get_temporary_filenames.return_value = [
+            "file:///a.mp3~SC~",
+            "file:///a.ogg~SC~",
+        ]
+        self.journal.start()
+        self.journal.on_started(converter)
+        self.journal.on_moving(converter, "file:///a%20(1).mp3")
+        self.journal.close()
+
+        entry = self.journal.read()[self.source]
+        self.assertEqual(entry["event"], "moving")
+        self.assertEqual(entry["moved"], ["file:///a%20(1).mp3"])
+        self.assertEqual(entry["temps"], ["file:///a.mp3~SC~", "file:///a.ogg~SC~"])
+
+    def test_resume_renamed(self):
+        # crashed after renaming, before writing down that it finished
+        target = self.create("a.mp3")
+        temp = filename_to_uri(os.path.join(self.directory, "a.mp3~SC~"))
+        self.write(
+            {"event": "started", "temps": [temp]},
+            {"event": "moving", "target": target},
+        )
+        self.assertEqual(self.journal.resume(), {self.source})
+
+    def test_resume_not_renamed(self):
+        # crashed before the rename happened
+        temp = self.create("a.mp3~SC~")
+        target = filename_to_uri(os.path.join(self.directory, "a.mp3"))
+        self.write(
+            {"event": "started", "temps": [temp]},
+            {"event": "moving", "target": target},
+        )
+        self.assertEqual(self.journal.resume(), set())
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "a.mp3~SC~")))
+
+    def test_resume_started(self):
+        # an old target of a conversion that didn't finish doesn't count
+        self.create("a.mp3")
+        temps = [self.create("a.mp3~SC~"), self.create("a.ogg~SC~")]
+        self.write({"event": "started", "temps": temps})
+        self.assertEqual(self.journal.resume(), set())
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "a.mp3~SC~")))
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "a.ogg~SC~")))
+
+    def test_resume_partly_renamed(self):
+        # the extra output was renamed, the main output wasn't
+        target = self.create("a.ogg")
+        temp = self.create("a.mp3~SC~")
+        self.write(
+            {"event": "started", "temps": [temp, target + "~SC~"]},
+            {"event": "moving", "target": target},
+        )
+        self.assertEqual(self.journal.resume(), set())
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "a.mp3~SC~")))
+
+    def test_resume_single_temp(self):
+        # journal of an older version
+        temp = self.create("a.mp3~SC~")
+        self.write({"event": "started", "temp": temp})
+        self.assertEqual(self.journal.resume(), set())
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "a.mp3~SC~")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from soundconverter.util.fileoperations import filename_to_uri
+from soundconverter.util.manifest import (
+    CHANGED,
+    NEW,
+    UNCHANGED,
+    Manifest,
+    get_settings_fingerprint,
+)
+from soundconverter.util.settings import get_gio_settings
+
+
+class ManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "manifest.db")
+        self.source = self.create("a.wav")
+        self.target = self.create("a.mp3")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create(self, filename):
+        path = os.path.join(self.directory, filename)
+        with open(path, "w") as file:
+            file.write("foo")
+        return filename_to_uri(path)
+
+    def run_twice(self, fingerprint="a"):
+        manifest = Manifest(self.path, fingerprint)
+        self.assertEqual(manifest.check(self.source), NEW)
+        manifest.record(self.source, self.target)
+        manifest.close()
+        return Manifest(self.path, fingerprint)
+
+    def test_unchanged(self):
+        manifest = self.run_twice()
+        self.assertEqual(manifest.check(self.source), UNCHANGED)
+        self.assertEqual(manifest.get_state(self.source), UNCHANGED)
+        self.assertIsNone(manifest.get_state(self.target))
+        manifest.close()
+
+    def test_changed(self):
+        manifest = self.run_twice()
+        with open(self.source[len("file://") :], "a") as file:
+            file.write("bar")
+        self.assertEqual(manifest.check(self.source), CHANGED)
+        manifest.close()
+
+    def test_target_gone(self):
+        manifest = self.run_twice()
+        os.remove(self.target[len("file://") :])
+        self.assertEqual(manifest.check(self.source), CHANGED)
+        manifest.close()
+
+    def test_settings_changed(self):
+        self.run_twice().close()
+        manifest = Manifest(self.path, "b")
+        self.assertEqual(manifest.check(self.source), CHANGED)
+        manifest.close()
+
+    def test_fingerprint(self):
+        gio_settings = get_gio_settings()
+        fingerprint = get_settings_fingerprint()
+        self.assertEqual(get_settings_fingerprint(), fingerprint)
+        quality = gio_settings.get_int("flac-compression")
+        gio_settings.set_int("flac-compression", quality + 1)
+        try:
+            self.assertNotEqual(get_settings_fingerprint(), fingerprint)
+        finally:
+            gio_settings.set_int("flac-compression", quality)
+
+    def test_delete_old_target(self):
+        manifest = self.run_twice()
+        manifest.check(self.source)
+        new_target = self.create("b.mp3")
+        manifest.record(self.source, new_target, delete_old=True)
+        self.assertFalse(os.path.exists(self.target[len("file://") :]))
+        self.assertEqual(manifest.check(self.source), UNCHANGED)
+        manifest.close()
+
+    def test_remove_missing(self):
+        other = self.create("other.wav")
+        manifest = self.run_twice()
+        # sources that still exist but were not walked over are kept
+        manifest.check(other)
+        manifest.record(other, self.create("other.mp3"))
+        self.assertEqual(manifest.remove_missing(delete=True), 0)
+        manifest.close()
+
+        # in the next run, the source was removed
+        os.remove(self.source[len("file://") :])
+        manifest = Manifest(self.path, "a")
+        self.assertEqual(manifest.remove_missing(delete=True), 1)
+        self.assertFalse(os.path.exists(self.target[len("file://") :]))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "other.mp3")))
+        manifest.close()
+
+    def test_keep_shared_target(self):
+        self.run_twice().close()
+
+        # the source was renamed, its new name took over the target
+        renamed = self.create("b.wav")
+        os.remove(self.source[len("file://") :])
+        target_index = Mock()
+        manifest = Manifest(self.path, "a", target_index)
+        manifest.check(renamed)
+        manifest.record(renamed, self.target)
+        self.assertEqual(manifest.remove_missing(delete=True), 1)
+        self.assertTrue(os.path.exists(self.target[len("file://") :]))
+        target_index.remove.assert_not_called()
+        manifest.close()
+
+    def test_keep_target_recorded_in_this_run(self):
+        manifest = self.run_twice()
+        other = self.create("other.wav")
+        manifest.check(other)
+        manifest.record(other, self.target)
+        # another source wrote the old target in this run
+        manifest.check(self.source)
+        manifest.record(self.source, self.create("b.mp3"), delete_old=True)
+        self.assertTrue(os.path.exists(self.target[len("file://") :]))
+        manifest.close()
+
+    def test_target_lookup_uses_index(self):
+        manifest = self.run_twice()
+        plan = manifest.connection.execute(
+            "EXPLAIN QUERY PLAN SELECT 1 FROM sources WHERE target = ?",
+            (self.target,),
+        ).fetchall()
+        self.assertIn("sources_target", str(plan))
+        manifest.close()
+
+    def test_target_index(self):
+        self.run_twice().close()
+        os.remove(self.source[len("file://") :])
+        target_index = Mock()
+        manifest = Manifest(self.path, "a", target_index)
+        self.assertEqual(manifest.remove_missing(delete=True), 1)
+        self.assertFalse(os.path.exists(self.target[len("file://") :]))
+        target_index.remove.assert_called_once_with(self.target)
+        manifest.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from soundconverter.gstreamer.discoverer import DiscovererThread
+from soundconverter.util.fileoperations import filename_to_uri
+from soundconverter.util.metadatacache import MetadataCache
+from soundconverter.util.soundfile import SoundFile
+
+
+class MetadataCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cache", "metadata.db")
+        self.audio = os.path.join(self.directory, "a b.mp3")
+        with open(self.audio, "w") as file:
+            file.write("foo")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def discovered(self):
+        sound_file = SoundFile(filename_to_uri(self.audio))
+        sound_file.readable = True
+        sound_file.duration = 12.5
+        sound_file.codec = "audio/mpeg"
+        sound_file.tags.update({"artist": "foo", "year": 2000})
+        return sound_file
+
+    def test_store_load(self):
+        cache = MetadataCache(self.path)
+        cache.store(self.discovered())
+        cache.flush()
+
+        # survives restarts
+        cache = MetadataCache(self.path)
+        sound_file = SoundFile(filename_to_uri(self.audio))
+        self.assertTrue(cache.load(sound_file))
+        self.assertTrue(sound_file.readable)
+        self.assertEqual(sound_file.duration, 12.5)
+        self.assertEqual(sound_file.codec, "audio/mpeg")
+        self.assertEqual(sound_file.tags, {"artist": "foo", "year": 2000})
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_changed_file(self):
+        cache = MetadataCache(self.path)
+        cache.store(self.discovered())
+        stat = os.stat(self.audio)
+        os.utime(self.audio, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        self.assertFalse(cache.load(SoundFile(filename_to_uri(self.audio))))
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_rebuild(self):
+        cache = MetadataCache(self.path)
+        cache.store(self.discovered())
+        cache.flush()
+        cache = MetadataCache(self.path, rebuild=True)
+        self.assertFalse(cache.load(SoundFile(filename_to_uri(self.audio))))
+
+    def test_needed_tags(self):
+        cache = MetadataCache(self.path)
+        cache.store(self.discovered(), {"artist", "year"})
+        uri = filename_to_uri(self.audio)
+        self.assertTrue(cache.load(SoundFile(uri), {"artist"}))
+        self.assertFalse(cache.load(SoundFile(uri), {"artist", "album"}))
+        # the -t mode and the gui need all of them
+        self.assertFalse(cache.load(SoundFile(uri)))
+
+        cache.store(self.discovered())
+        self.assertTrue(cache.load(SoundFile(uri), {"artist", "album"}))
+
+    def test_not_local(self):
+        cache = MetadataCache(self.path)
+        sound_file = SoundFile("sftp://host/a.mp3")
+        cache.store(sound_file)
+        self.assertFalse(cache.load(sound_file))
+        # not counted as a miss, because it cannot be cached
+        self.assertEqual(cache.misses, 0)
+
+    def test_discoverer_thread(self):
+        cache = MetadataCache(self.path)
+        cache.store(self.discovered())
+        sound_files = [SoundFile(filename_to_uri(self.audio))]
+        discoverer = Mock()
+        discoverer.discover_uri = Mock(return_value=None)
+
+        path = "soundconverter.gstreamer.discoverer.get_metadata_cache"
+        with patch(path, lambda: cache):
+            thread = DiscovererThread(sound_files, Mock())
+        thread.discoverer = discoverer
+        thread.run()
+
+        discoverer.discover_uri.assert_not_called()
+        self.assertEqual(sound_files[0].duration, 12.5)
@@ -36,6 +36,7 @@ from soundconverter.util.fileoperations import (
     unquote_filename,
 )
 from soundconverter.util.namegenerator import (
+    PatternTemplate,
     TargetNameGenerator,
     custom_patterns,
     get_basename_pattern,
@@ -136,6 +137,39 @@ class Patterns(unittest.TestCase):
     def test_custom_patterns_mapping(self):
         self.assertEqual(custom_patterns["{Artist}"], "{artist}")
 
+    def test_pattern_template(self):
+        template = PatternTemplate(
+            "{album-artist}/{{x}}{track-number:02} {title} {venue}.{target-ext}",
+            "ogg",
+        )
+        self.assertEqual(
+            template.fields,
+            ["album-artist", "track-number", "title", "venue", "target-ext"],
+        )
+        self.assertFalse(template.uses_timestamp)
+
+        sound_file = SoundFile("file:///a%20b/c.flac")
+        self.assertEqual(
+            template.fill(sound_file),
+            "Unknown Artist/{x}00 c Unknown Venue.ogg",
+        )
+
+        sound_file.tags.update(
+            {"artist": "A/B", "title": "T/U", "track-number": "3", "venue": "V"}
+        )
+        # the artist is used as album-artist as it is
+        self.assertEqual(template.fill(sound_file), "A/B/{x}03 T-U V.ogg")
+
+        sound_file.tags["album-artist"] = "C/D"
+        self.assertEqual(template.fill(sound_file), "C-D/{x}03 T-U V.ogg")
+
+    def test_templates_are_reused(self):
+        generator = TargetNameGenerator()
+        template = generator.get_template("{title}.{target-ext}")
+        self.assertIs(generator.get_template("{title}.{target-ext}"), template)
+        generator.suffix = "flac"
+        self.assertIsNot(generator.get_template("{title}.{target-ext}"), template)
+
 
 class TargetNameGeneratorTestCases(unittest.TestCase):
     def setUp(self):
@@ -753,6 +787,17 @@ class TargetNameGeneratorTestCases(unittest.TestCase):
         # if it didn't crash it's already working actually
         self.assertEqual(formatted, "11b1{d}1c{1}1")
 
+    def test_get_needed_tags(self):
+        self.g.basename_pattern = "{track-number:02}-{title}"
+        self.g.subfolder_pattern = "{album-artist}/{album}"
+        self.g.create_subfolders = True
+        self.assertEqual(
+            self.g.get_needed_tags(),
+            {"track-number", "title", "album-artist", "artist", "album"},
+        )
+        self.g.create_subfolders = False
+        self.assertEqual(self.g.get_needed_tags(), {"track-number", "title"})
+
     def test_pattern_unknown_tag(self):
         gio_settings = get_gio_settings()
         gio_settings.set_int("name-pattern-index", -1)
@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+import os
+import shutil
+import unittest
+
+from util import reset_settings
+
+from soundconverter.gstreamer.converter import Converter
+from soundconverter.gstreamer.pipelinepool import get_pipeline_pool, make_template
+from soundconverter.gstreamer.workerpool import get_worker_pool
+from soundconverter.interface.mainloop import gtk_iteration
+from soundconverter.util.fileoperations import filename_to_uri
+from soundconverter.util.namegenerator import TargetNameGenerator
+from soundconverter.util.settings import get_gio_settings, settings
+from soundconverter.util.soundfile import SoundFile
+from soundconverter.util.taskqueue import TaskQueue
+
+
+class MakeTemplateTest(unittest.TestCase):
+    def test_make_template(self):
+        self.assertEqual(
+            make_template("giosrc", ["audioconvert", "flacenc"], "giosink"),
+            "giosrc name=src ! decodebin name=decoder "
+            "audioconvert name=head ! flacenc ! giosink name=sink",
+        )
+        self.assertEqual(
+            make_template("filesrc", ["audioconvert"], "filesink"),
+            "filesrc name=src ! decodebin name=decoder "
+            "audioconvert name=head ! filesink name=sink",
+        )
+
+
+class PipelinePoolTest(unittest.TestCase):
+    def setUp(self):
+        os.makedirs("tests/tmp", exist_ok=True)
+        settings["reuse-pipelines"] = True
+        gio_settings = get_gio_settings()
+        gio_settings.set_boolean("same-folder-as-input", False)
+        gio_settings.set_string("selected-folder", filename_to_uri("tests/tmp"))
+        gio_settings.set_string("output-mime-type", "audio/x-flac")
+        gio_settings.set_boolean("limit-jobs", True)
+        gio_settings.set_int("number-of-jobs", 1)
+        get_pipeline_pool().clear()
+
+    def tearDown(self):
+        reset_settings()
+        get_pipeline_pool().clear()
+        get_worker_pool().shutdown()
+        if os.path.isdir("tests/tmp/"):
+            shutil.rmtree("tests/tmp")
+
+    def convert(self):
+        name_generator = TargetNameGenerator()
+        queue = TaskQueue()
+        # different decoders one after another in the same pipeline
+        for path in ["a.wav", "b/c.mp3", "strângë chàrs фズ.wav"]:
+            sound_file = SoundFile(filename_to_uri(f"tests/test data/audio/{path}"))
+            queue.add(Converter(sound_file, name_generator))
+        queue.run()
+        while not queue.finished:
+            gtk_iteration(True)
+
+        for task in queue.done:
+            self.assertIsNone(task.error)
+        self.assertTrue(os.path.isfile("tests/tmp/a.flac"))
+        self.assertTrue(os.path.isfile("tests/tmp/c.flac"))
+        self.assertTrue(os.path.isfile("tests/tmp/strângë chàrs фズ.flac"))
+
+    def test_reuse(self):
+        pool = get_pipeline_pool()
+        created = pool.created
+        reused = pool.reused
+        self.convert()
+        self.assertEqual(pool.created - created, 1)
+        self.assertEqual(pool.reused - reused, 2)
+
+    def test_reuse_in_workers(self):
+        settings["worker-processes"] = True
+        self.convert()
+
+
+if __name__ == "__main__":
+    unittest.main()
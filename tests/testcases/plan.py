@@ -0,0 +1,207 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from util import reset_settings
+
+from soundconverter.util.fileoperations import filename_to_uri
+from soundconverter.util.manifest import Manifest
+from soundconverter.util.namegenerator import TargetNameGenerator
+from soundconverter.util.plan import (
+    CONVERT,
+    OVERWRITE,
+    SKIP,
+    ConversionPlan,
+    PlanStream,
+)
+from soundconverter.util.settings import get_gio_settings
+from soundconverter.util.soundfile import SoundFile
+
+
+class ConversionPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        gio_settings = get_gio_settings()
+        gio_settings.set_string("selected-folder", filename_to_uri(self.directory))
+        gio_settings.set_boolean("same-folder-as-input", False)
+        gio_settings.set_boolean("create-subfolders", False)
+        gio_settings.set_boolean("replace-messy-chars", False)
+        gio_settings.set_string("output-mime-type", "audio/x-flac")
+        gio_settings.set_int("name-pattern-index", -1)
+        gio_settings.set_string("custom-filename-pattern", "{title}")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        reset_settings()
+
+    def create_sound_file(self, uri, title):
+        sound_file = SoundFile(uri)
+        sound_file.tags["title"] = title
+        sound_file.readable = True
+        sound_file.duration = len(uri)
+        sound_file.codec = "audio/mpeg"
+        return sound_file
+
+    def uri(self, filename):
+        # like the Converter, numbers are appended without quoting them
+        return filename_to_uri(self.directory) + "/" + filename
+
+    def plan(self, existing_behaviour, sound_files):
+        plan = ConversionPlan(TargetNameGenerator())
+        for sound_file in sorted(sound_files, key=lambda s: s.uri):
+            plan.add(sound_file, existing_behaviour)
+        return plan
+
+    def test_collisions(self):
+        sound_files = [
+            self.create_sound_file("file:///c.mp3", "x"),
+            self.create_sound_file("file:///a.mp3", "x"),
+            self.create_sound_file("file:///b.mp3", "y"),
+        ]
+        for order in (sound_files, sound_files[::-1]):
+            plan = self.plan("increment", order)
+            self.assertEqual(plan.get("file:///a.mp3").target, self.uri("x.flac"))
+            self.assertEqual(plan.get("file:///b.mp3").target, self.uri("y.flac"))
+            self.assertEqual(plan.get("file:///c.mp3").target, self.uri("x (1).flac"))
+            self.assertEqual(plan.num_collisions, 1)
+
+    def test_existing(self):
+        with open(os.path.join(self.directory, "x.flac"), "w"):
+            pass
+        sound_files = [
+            self.create_sound_file("file:///a.mp3", "x"),
+            self.create_sound_file("file:///b.mp3", "x"),
+        ]
+
+        plan = self.plan("skip", sound_files)
+        self.assertEqual(plan.get("file:///a.mp3").action, SKIP)
+        self.assertEqual(plan.get("file:///b.mp3").action, SKIP)
+
+        plan = self.plan("overwrite", sound_files)
+        self.assertEqual(plan.get("file:///a.mp3").action, OVERWRITE)
+        self.assertEqual(plan.get("file:///a.mp3").target, self.uri("x.flac"))
+        self.assertEqual(plan.get("file:///b.mp3").action, CONVERT)
+        self.assertEqual(plan.get("file:///b.mp3").target, self.uri("x (1).flac"))
+
+        plan = self.plan("increment", sound_files)
+        self.assertEqual(plan.get("file:///a.mp3").target, self.uri("x (1).flac"))
+        self.assertEqual(plan.get("file:///b.mp3").target, self.uri("x (2).flac"))
+
+    def test_manifest(self):
+        sources = []
+        for filename in ("a.mp3", "b.mp3"):
+            path = os.path.join(self.directory, filename)
+            with open(path, "w"):
+                pass
+            sources.append(self.create_sound_file(filename_to_uri(path), "x"))
+        with open(os.path.join(self.directory, "x.flac"), "w"):
+            pass
+        manifest = Manifest(os.path.join(self.directory, "manifest.db"), "a")
+        manifest.check(sources[0].uri)
+        manifest.record(sources[0].uri, self.uri("x.flac"))
+
+        # the target of the first, unchanged source is not replaced
+        plan = ConversionPlan(TargetNameGenerator(), manifest=manifest)
+        entry = plan.add(sources[1], "overwrite")
+        self.assertEqual(entry.action, CONVERT)
+        self.assertEqual(entry.target, self.uri("x (1).flac"))
+        self.assertEqual(plan.num_collisions, 1)
+        with open(os.path.join(self.directory, "x (1).flac"), "w"):
+            pass
+        manifest.check(sources[1].uri)
+        manifest.record(sources[1].uri, entry.target)
+
+        # both changed, each one overwrites its own target, even with -e skip
+        plan = ConversionPlan(TargetNameGenerator(), manifest=manifest)
+        for source, target in zip(sources, ("x.flac", "x (1).flac")):
+            entry = plan.add(source, "skip")
+            self.assertEqual(entry.action, OVERWRITE)
+            self.assertEqual(entry.target, self.uri(target))
+        manifest.close()
+
+    def test_without_entries(self):
+        plan = ConversionPlan(TargetNameGenerator(), keep_entries=False)
+        first = plan.add(self.create_sound_file("file:///a.mp3", "x"), "increment")
+        second = plan.add(self.create_sound_file("file:///b.mp3", "x"), "increment")
+        self.assertEqual(plan.entries, {})
+        # collisions are still resolved
+        self.assertEqual(first.target, self.uri("x.flac"))
+        self.assertEqual(second.target, self.uri("x (1).flac"))
+        self.assertEqual(plan.num_collisions, 1)
+
+    def test_apply(self):
+        plan = self.plan("skip", [self.create_sound_file("file:///a.mp3", "x")])
+        converter = Mock(newname=None, existing_behaviour="skip")
+        plan.get("file:///a.mp3").apply(converter)
+        self.assertEqual(converter.newname, self.uri("x.flac"))
+        self.assertEqual(converter.existing_behaviour, "skip")
+
+    def test_write_and_load(self):
+        sound_files = [
+            self.create_sound_file(f"file:///{i}.mp3", str(i % 2)) for i in range(5)
+        ]
+        plan = self.plan("increment", sound_files)
+        path = os.path.join(self.directory, "plans", "plan.jsonl")
+        plan.write(path)
+
+        loaded = ConversionPlan.load(path, TargetNameGenerator())
+        self.assertEqual(
+            [(e.source, e.target, e.action) for e in loaded.entries.values()],
+            [(e.source, e.target, e.action) for e in plan.entries.values()],
+        )
+
+        stream = PlanStream(loaded)
+        stream.start()
+        self.assertEqual(len(stream.get_discovered(3)), 3)
+        self.assertFalse(stream.finished)
+        sound_files = stream.get_discovered(3)
+        self.assertEqual(
+            [s.uri for s in sound_files], ["file:///3.mp3", "file:///4.mp3"]
+        )
+        self.assertTrue(all(s.readable for s in sound_files))
+        self.assertTrue(stream.finished)
+        # needed for the progress and for starting the longest files first
+        self.assertEqual([s.duration for s in sound_files], [13, 13])
+        self.assertEqual([s.codec for s in sound_files], ["audio/mpeg"] * 2)
+
+        # a line without a duration, like in plans of older versions
+        with open(path, "a") as plan_file:
+            plan_file.write('{"source": "a", "target": "b", "action": "skip"}\n')
+        with self.assertRaisesRegex(ValueError, "line 7 "):
+            ConversionPlan.load(path, TargetNameGenerator())
+
+        # targets would be different in another format
+        get_gio_settings().set_string("output-mime-type", "audio/mpeg")
+        self.assertRaises(ValueError, ConversionPlan.load, path, TargetNameGenerator())
+
+        with open(path, "w") as plan_file:
+            plan_file.write("foo\n")
+        self.assertRaises(ValueError, ConversionPlan.load, path, TargetNameGenerator())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from soundconverter.gstreamer.discoverer import DiscovererThread
+from soundconverter.util.fileoperations import filename_to_uri
+from soundconverter.util.prefilter import Prefilter, get_prefilter
+from soundconverter.util.settings import get_gio_settings
+from soundconverter.util.soundfile import SoundFile
+
+
+class PrefilterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.prefilter = Prefilter(["cue", ".JPG"])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create(self, filename, content):
+        path = os.path.join(self.directory, filename)
+        with open(path, "wb") as file:
+            file.write(content)
+        return SoundFile(filename_to_uri(path))
+
+    def test_extension(self):
+        sound_file = self.create("a.CUE", b"\x00\x01")
+        self.assertEqual(self.prefilter.check(sound_file), "ignored extension .cue")
+        sound_file = self.create("b.jpg", b"\x00\x01")
+        self.assertEqual(self.prefilter.check(sound_file), "ignored extension .jpg")
+
+    def test_signature(self):
+        sound_file = self.create("cover.mp3", b"\x89PNG\r\n\x1a\n\x00\x00")
+        self.assertEqual(self.prefilter.check(sound_file), "PNG image")
+
+    def test_text(self):
+        sound_file = self.create("info", "Künstler: foo\r\n".encode() * 100)
+        self.assertEqual(self.prefilter.check(sound_file), "text file")
+
+    def test_empty(self):
+        sound_file = self.create("a.mp3", b"")
+        self.assertEqual(self.prefilter.check(sound_file), "empty file")
+
+    def test_audio(self):
+        for path in ("audio/a.wav", "audio/b/c.mp3", "no tags/no-tags.ogg"):
+            path = os.path.realpath(f"tests/test data/{path}")
+            sound_file = SoundFile(filename_to_uri(path))
+            self.assertIsNone(self.prefilter.check(sound_file))
+
+    def test_not_local(self):
+        sound_file = SoundFile("sftp://host/a.jpg")
+        self.assertIsNotNone(self.prefilter.check(sound_file))
+        sound_file = SoundFile("sftp://host/a.mp3")
+        self.assertIsNone(self.prefilter.check(sound_file))
+
+    def test_get_prefilter(self):
+        gio_settings = get_gio_settings()
+        self.assertIn(".cue", get_prefilter().ignored_extensions)
+        gio_settings.set_boolean("prefilter", False)
+        try:
+            self.assertIsNone(get_prefilter())
+        finally:
+            gio_settings.set_boolean("prefilter", True)
+
+    def test_discoverer(self):
+        image = os.path.realpath("tests/test data/image.jpg")
+        sound_file = SoundFile(filename_to_uri(image))
+        discover = Mock(return_value=True)
+        with patch.object(DiscovererThread, "_discover", discover):
+            thread = DiscovererThread([sound_file], Mock())
+            thread.cache = None
+            thread.run()
+
+        discover.assert_not_called()
+        self.assertFalse(sound_file.readable)
+
+
+if __name__ == "__main__":
+    unittest.main()
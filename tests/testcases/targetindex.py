@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from soundconverter.util.fileoperations import filename_to_uri, vfs_exists
+from soundconverter.util.namegenerator import TargetNameGenerator
+from soundconverter.util.targetindex import TargetIndex
+
+
+class TargetIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, "a b", "c"))
+        for name in ["x.mp3", "a b/y ä.mp3", "a b/c/z.mp3"]:
+            with open(os.path.join(self.directory, name), "w"):
+                pass
+        self.uri = filename_to_uri(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_exists(self):
+        index = TargetIndex()
+        for child in [
+            "/x.mp3",
+            "/a%20b",
+            "/a%20b/",
+            "/a%20b/y%20%C3%A4.mp3",
+            "/a%20b/c/z.mp3",
+            "/a%20b/c/missing.mp3",
+            "/missing/x.mp3",
+            "/x.mp3/x.mp3",
+        ]:
+            uri = self.uri + child
+            self.assertEqual(index.exists(uri), vfs_exists(uri), uri)
+        self.assertTrue(index.exists(os.path.join(self.directory, "a b")))
+
+    def test_probes(self):
+        index = TargetIndex()
+        for i in range(100):
+            index.exists(f"{self.uri}/a%20b/{i}.mp3")
+        self.assertEqual(index.checks, 100)
+        self.assertEqual(index.probes, 1)
+
+        index.clear()
+        index.exists(f"{self.uri}/x.mp3")
+        self.assertEqual(index.probes, 2)
+
+    def test_add_and_remove(self):
+        index = TargetIndex()
+        new = f"{self.uri}/new/dir/file.mp3"
+        self.assertFalse(index.exists(new))
+        self.assertFalse(index.exists(f"{self.uri}/new"))
+
+        index.add(new)
+        self.assertTrue(index.exists(new))
+        self.assertTrue(index.exists(f"{self.uri}/new"))
+
+        index.remove(new)
+        self.assertFalse(index.exists(new))
+        self.assertTrue(index.exists(f"{self.uri}/new"))
+
+        # nothing was written to the disk, everything was answered from
+        # the listings of the first two calls
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "new")))
+        self.assertEqual(index.probes, 2)
+
+    def test_safe_uri(self):
+        index = TargetIndex()
+        for parent, child in [
+            (self.uri, "/a b/y ä.mp3"),
+            (self.uri, "a%20b/c/ä ö.mp3"),
+            (self.uri + "/", "/ä b/c/z.mp3"),
+            (self.uri + "/a%20b", "c/z ü.mp3"),
+        ]:
+            self.assertEqual(
+                TargetNameGenerator.safe_uri(parent, child, index.exists),
+                TargetNameGenerator.safe_uri(parent, child),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -22,14 +22,14 @@
 import threading
 import time
 import unittest
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 from gi.repository import GLib, Gst
 from util import reset_settings
 
 from soundconverter.util.settings import get_gio_settings
 from soundconverter.util.task import Task
-from soundconverter.util.taskqueue import TaskQueue, Timer
+from soundconverter.util.taskqueue import ConcurrencyController, TaskQueue, Timer
 
 
 class SyncSleepTask(Task):
@@ -136,6 +136,45 @@ class AsyncSleepTask(Task):
         super().done()
 
 
+class WeightedTask(SyncSleepTask):
+    """Task that claims to process weight seconds of audio."""
+
+    def __init__(self, weight):
+        self.weight = weight
+        super().__init__()
+
+    def get_progress(self):
+        return 0, self.weight
+
+
+class ManualTask(Task):
+    """Task that makes progress and finishes only when told to."""
+
+    def __init__(self, weight):
+        self.progress = 0
+        self.weight = weight
+        super().__init__()
+
+    def get_progress(self):
+        return self.progress, self.weight
+
+    def run(self):
+        pass
+
+    def cancel(self):
+        pass
+
+    def pause(self):
+        pass
+
+    def resume(self):
+        pass
+
+    def finish(self):
+        self.progress = 1
+        self.emit("done")
+
+
 class SyncSleepTaskTest(unittest.TestCase):
     def test(self):
         """Checks if basic Task class functions are working properly."""
@@ -458,6 +497,311 @@ class TaskQueueTest(unittest.TestCase):
         self.assertEqual(len(q.running), 0)
         self.assertGreater(q.get_duration(), 0.2)
 
+    def test_open_queue(self):
+        get_gio_settings().set_boolean("limit-jobs", True)
+        get_gio_settings().set_int("number-of-jobs", 2)
+        q = TaskQueue()
+        q.open()
+        q.run()
+        context = GLib.MainLoop().get_context()
+
+        # added while running, starts right away
+        q.add(AsyncSleepTask())
+        self.assertEqual(len(q.running), 1)
+        while len(q.done) < 1:
+            context.iteration(True)
+        # ran empty, but waits for more tasks
+        self.assertFalse(q.finished)
+
+        q.add(AsyncSleepTask())
+        q.add(AsyncSleepTask())
+        q.add(AsyncSleepTask())
+        self.assertEqual(len(q.running), 2)
+        self.assertEqual(q.pending.qsize(), 1)
+
+        q.close()
+        self.assertFalse(q.finished)
+        while not q.finished:
+            context.iteration(True)
+        self.assertEqual(len(q.done), 4)
+
+    def test_close_empty(self):
+        q = TaskQueue()
+        q.open()
+        q.run()
+        done = Mock()
+        q.connect("done", done)
+        self.assertFalse(q.finished)
+        q.close()
+        self.assertTrue(q.finished)
+        done.assert_called_once()
+
+
+class IncrementalProgressTest(unittest.TestCase):
+    def tearDown(self):
+        reset_settings()
+
+    def test_progress_and_remaining(self):
+        get_gio_settings().set_boolean("limit-jobs", True)
+        get_gio_settings().set_int("number-of-jobs", 2)
+        q = TaskQueue()
+        tasks = [ManualTask(weight) for weight in [10, 20, 30, 40]]
+        for task in tasks:
+            q.add(task)
+        q.run()
+        self.assertEqual(q.get_progress()[0], 0)
+        self.assertIsNone(q.get_remaining())
+
+        for task in tasks:
+            # each task that ran for some time ran for 2 seconds
+            task.timer.get_duration = lambda: 2
+
+        tasks[0].progress = 0.5
+        tasks[1].progress = 0.25
+        progress, task_progress = q.get_progress(only_running=True)
+        self.assertEqual(progress, 0.1)
+        self.assertEqual(task_progress, [(tasks[0], 0.5), (tasks[1], 0.25)])
+        self.assertEqual(len(q.get_progress()[1]), 4)
+
+        tasks[0].finish()
+        self.assertEqual(q.running, [tasks[1], tasks[2]])
+        tasks[1].progress = 0.5
+        self.assertEqual(q.get_progress()[0], 0.2)
+        self.assertEqual(q.get_processed_weight(), 20)
+        # 6 seconds for 20 weight, 80 weight left on 2 jobs
+        self.assertAlmostEqual(q.get_remaining(), 12)
+
+        tasks[2].progress = 0.5
+        # the pending task with a weight of 40 is the longest one left
+        self.assertAlmostEqual(q.get_remaining(), 40 * 6 / 35)
+
+        tasks[1].finish()
+        tasks[2].finish()
+        tasks[3].finish()
+        self.assertTrue(q.finished)
+        self.assertEqual(q.get_progress()[0], 1)
+
+    def test_forget_tasks(self):
+        get_gio_settings().set_boolean("limit-jobs", True)
+        get_gio_settings().set_int("number-of-jobs", 1)
+        q = TaskQueue(keep_tasks=False)
+        added = Mock()
+        done = Mock()
+        q.connect("task-added", added)
+        q.connect("task-done", done)
+        q.open()
+        q.run()
+
+        for weight in range(100):
+            task = ManualTask(weight)
+            task.error = "foo" if weight == 0 else None
+            q.add(task)
+            added.assert_called_with(q, task)
+            task.finish()
+            done.assert_called_with(q, task)
+
+        self.assertEqual(q.all_tasks, [])
+        self.assertEqual(q.done, [])
+        self.assertEqual(q.num_added, 100)
+        self.assertEqual(q.num_done, 100)
+        self.assertEqual(q.num_failed, 1)
+        self.assertEqual(q._weights, {})
+        self.assertLessEqual(len(q._pending_weights), q.max_heap_overhead)
+        self.assertEqual(q.get_progress(), (1, []))
+
+        q.close()
+        self.assertTrue(q.finished)
+
+    def test_compact_pending_weights(self):
+        get_gio_settings().set_boolean("limit-jobs", True)
+        get_gio_settings().set_int("number-of-jobs", 1)
+        q = TaskQueue()
+        tasks = [ManualTask(weight) for weight in range(100)]
+        for task in tasks:
+            q.add(task)
+        q.run()
+        # the heaviest tasks are at the top of the heap and still pending,
+        # so the lighter ones that finished can't be dropped lazily
+        for task in tasks[:90]:
+            task.finish()
+        self.assertLessEqual(len(q._pending_weights), 2 * 11)
+        self.assertEqual(q._get_max_pending_weight(), 99)
+
+
+class TaskOrderTest(unittest.TestCase):
+    def test_fifo(self):
+        q = TaskQueue()
+        tasks = [WeightedTask(weight) for weight in [1, 3, None, 2]]
+        for task in tasks:
+            q.add(task)
+        self.assertEqual([q.pending.get() for _ in tasks], tasks)
+
+    def test_longest_first(self):
+        q = TaskQueue(TaskQueue.LONGEST_FIRST)
+        tasks = [WeightedTask(weight) for weight in [1, 3, None, 2, 3]]
+        for task in tasks:
+            q.add(task)
+        self.assertEqual(q.pending.qsize(), 5)
+        order = [q.pending.get() for _ in tasks]
+        # equally long tasks keep their order, unknown durations go last
+        self.assertEqual(order, [tasks[1], tasks[4], tasks[3], tasks[0], tasks[2]])
+
+    def test_cancel_keeps_order(self):
+        get_gio_settings().set_boolean("limit-jobs", True)
+        get_gio_settings().set_int("number-of-jobs", 1)
+        q = TaskQueue(TaskQueue.LONGEST_FIRST)
+        short = AsyncSleepTask()
+        long = AsyncSleepTask()
+        long.get_cost = lambda: 10
+        q.add(short)
+        q.add(long)
+        q.run()
+        self.assertEqual(q.running, [long])
+        q.cancel()
+        self.assertEqual(q.pending.get(), long)
+
+    def test_unknown_order(self):
+        self.assertRaises(ValueError, lambda: TaskQueue("foo"))
+
+
+class FakeQueue:
+    """Pretends to process a given amount of weight per second."""
+
+    def __init__(self, num_jobs):
+        self.num_jobs = num_jobs
+        self.finished = False
+        self.duration = 0
+        self.processed_weight = 0
+
+    def get_duration(self):
+        return self.duration
+
+    def get_processed_weight(self):
+        return self.processed_weight
+
+    def set_num_jobs(self, num_jobs):
+        self.num_jobs = num_jobs
+
+    def tick(self, throughput):
+        self.duration += ConcurrencyController.interval
+        self.processed_weight += throughput * ConcurrencyController.interval
+
+
+class ConcurrencyControllerTest(unittest.TestCase):
+    def tearDown(self):
+        reset_settings()
+
+    def test_hill_climbing(self):
+        q = FakeQueue(4)
+        controller = ConcurrencyController(q, 8)
+        controller.start()
+
+        # the first decision is always to try more jobs
+        q.tick(100)
+        self.assertTrue(controller.update())
+        self.assertEqual(q.num_jobs, 5)
+
+        # more throughput, keep going
+        q.tick(120)
+        controller.update()
+        self.assertEqual(q.num_jobs, 6)
+
+        # less throughput, go back
+        q.tick(110)
+        controller.update()
+        self.assertEqual(q.num_jobs, 5)
+
+        # better again, continue downwards
+        q.tick(120)
+        controller.update()
+        self.assertEqual(q.num_jobs, 4)
+
+        # no significant change, prefer fewer jobs
+        q.tick(119)
+        controller.update()
+        self.assertEqual(q.num_jobs, 3)
+
+        q.finished = True
+        self.assertFalse(controller.update())
+
+    def test_limits(self):
+        q = FakeQueue(2)
+        controller = ConcurrencyController(q, 3)
+        controller.start()
+        throughput = 100
+        for _ in range(5):
+            throughput *= 2
+            q.tick(throughput)
+            controller.update()
+            self.assertLessEqual(q.num_jobs, 3)
+            self.assertGreaterEqual(q.num_jobs, 1)
+
+        q = FakeQueue(1)
+        controller = ConcurrencyController(q, 3)
+        controller.direction = -1
+        controller.start()
+        q.tick(100)
+        controller.update()
+        self.assertEqual(q.num_jobs, 1)
+        # turns around after hitting the lower limit
+        self.assertEqual(controller.direction, 1)
+
+    def test_paused(self):
+        q = FakeQueue(2)
+        controller = ConcurrencyController(q, 4)
+        controller.start()
+        # no time passed, no decision
+        self.assertTrue(controller.update())
+        self.assertEqual(q.num_jobs, 2)
+
+    def test_single_controller(self):
+        get_gio_settings().set_boolean("limit-jobs", True)
+        get_gio_settings().set_int("number-of-jobs", 4)
+        q = TaskQueue(adaptive=True)
+        q.open()
+        task = ManualTask(1)
+        q.add(task)
+        with patch.object(GLib, "source_remove") as source_remove:
+            q.run()
+            first = q._controller
+            self.assertIsNotNone(first.source_id)
+
+            # for example after resuming, the previous one is removed
+            q.run()
+            source_remove.assert_called_once()
+            self.assertIsNone(first.source_id)
+            second = q._controller
+            self.assertIsNot(second, first)
+
+            q.close()
+            task.finish()
+            self.assertTrue(q.finished)
+            self.assertEqual(source_remove.call_count, 2)
+            self.assertIsNone(second.source_id)
+            self.assertIsNone(q._controller)
+
+    def test_set_num_jobs(self):
+        get_gio_settings().set_boolean("limit-jobs", True)
+        get_gio_settings().set_int("number-of-jobs", 1)
+        q = TaskQueue()
+        for _ in range(4):
+            q.add(AsyncSleepTask())
+        q.run()
+        self.assertEqual(len(q.running), 1)
+        q.set_num_jobs(3)
+        self.assertEqual(len(q.running), 3)
+        self.assertEqual(q.pending.qsize(), 1)
+        q.set_num_jobs(1)
+        # running tasks are not stopped
+        self.assertEqual(len(q.running), 3)
+
+        loop = GLib.MainLoop()
+        context = loop.get_context()
+        while not q.finished:
+            context.iteration(True)
+            self.assertLessEqual(len(q.running), 3)
+        self.assertEqual(len(q.done), 4)
+
 
 class TestTimer(unittest.TestCase):
     def test(self):
@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from soundconverter.util.fileoperations import filename_to_uri, iter_walk
+from soundconverter.util.settings import settings
+from soundconverter.util.walkfilter import WalkFilter, get_walk_filter, parse_size
+
+
+class WalkFilterTest(unittest.TestCase):
+    def test_parse_size(self):
+        self.assertEqual(parse_size("123"), 123)
+        self.assertEqual(parse_size("500k"), 500000)
+        self.assertEqual(parse_size("1.5M"), 1500000)
+        self.assertEqual(parse_size("2 GB"), 2000000000)
+        self.assertRaises(ValueError, parse_size, "-1")
+        self.assertRaises(ValueError, parse_size, "1T")
+
+    def test_patterns(self):
+        walk_filter = WalkFilter(include=["*.flac", "live/*"], exclude=["Scans"])
+        self.assertTrue(walk_filter.accepts_file("a/b.flac"))
+        self.assertTrue(walk_filter.accepts_file("live/b.mp3"))
+        self.assertFalse(walk_filter.accepts_file("a/live/b.mp3"))
+        self.assertFalse(walk_filter.accepts_file("a/b.FLAC"))
+        self.assertFalse(walk_filter.accepts_file("Scans"))
+        self.assertTrue(walk_filter.accepts_directory("a/b"))
+        self.assertFalse(walk_filter.accepts_directory("a/Scans"))
+
+    def test_extensions(self):
+        walk_filter = WalkFilter(extensions=["FLAC", ".ogg"])
+        self.assertTrue(walk_filter.accepts_file("a/b.flac"))
+        self.assertTrue(walk_filter.accepts_file("a/b.OGG"))
+        self.assertFalse(walk_filter.accepts_file("a/b.mp3"))
+        self.assertFalse(walk_filter.accepts_file("flac"))
+
+    def test_size(self):
+        walk_filter = WalkFilter(extensions=["flac"], min_size=10, max_size=20)
+        get_size = Mock(return_value=15)
+        self.assertTrue(walk_filter.accepts_file("a.flac", get_size))
+        get_size.return_value = 9
+        self.assertFalse(walk_filter.accepts_file("a.flac", get_size))
+        get_size.return_value = 21
+        self.assertFalse(walk_filter.accepts_file("a.flac", get_size))
+        # the size of files that are rejected anyway is not needed
+        get_size.reset_mock()
+        self.assertFalse(walk_filter.accepts_file("a.mp3", get_size))
+        get_size.assert_not_called()
+
+    def test_get_walk_filter(self):
+        self.assertIsNone(get_walk_filter())
+        with patch.dict(settings, {"exclude": ["a"], "max-size": "1k"}):
+            walk_filter = get_walk_filter()
+        self.assertEqual(walk_filter.exclude, ["a"])
+        self.assertEqual(walk_filter.max_size, 1000)
+
+
+class FilteredWalkTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for path, size in (
+            ("a.flac", 100),
+            ("b.mp3", 100),
+            ("c/d.flac", 10),
+            ("Scans/e/f.flac", 100),
+        ):
+            path = os.path.join(self.directory, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as file:
+                file.write(b"\x00" * size)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_pruned(self):
+        walk_filter = WalkFilter(exclude=["Scans"], extensions=["flac"], min_size=50)
+        scandir = os.scandir
+        scanned = []
+
+        def record(path):
+            scanned.append(os.path.relpath(path, self.directory))
+            return scandir(path)
+
+        with patch.object(os, "scandir", record):
+            walked = list(iter_walk(filename_to_uri(self.directory), 1, walk_filter))
+
+        self.assertEqual(walked, [(filename_to_uri(self.directory) + "/a.flac", "")])
+        # nothing in Scans was looked at
+        self.assertEqual(sorted(scanned), [".", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
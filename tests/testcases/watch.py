@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from gi.repository import Gio
+from util import reset_settings
+
+from soundconverter.gstreamer.discoverer import Discoverer
+from soundconverter.interface.watch import CLIWatch, Debouncer
+from soundconverter.util.fileoperations import filename_to_uri
+from soundconverter.util.settings import get_gio_settings, settings
+
+
+def gfile(path):
+    return Mock(get_path=Mock(return_value=path))
+
+
+class DebouncerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "a.mp3")
+        self.write("foo")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, content):
+        with open(self.path, "a") as file:
+            file.write(content)
+
+    def test_settle(self):
+        debouncer = Debouncer(2)
+        debouncer.touch(self.path, "data", now=10)
+        self.assertEqual(debouncer.collect(now=11), [])
+        # changed without a notification
+        self.write("bar")
+        self.assertEqual(debouncer.collect(now=12), [])
+        self.assertEqual(debouncer.collect(now=13), [])
+        self.assertEqual(debouncer.collect(now=14), [(self.path, "data")])
+        self.assertEqual(debouncer.pending, {})
+
+    def test_touch_again(self):
+        debouncer = Debouncer(2)
+        debouncer.touch(self.path, now=10)
+        debouncer.touch(self.path, now=11)
+        self.assertEqual(debouncer.collect(now=12), [])
+        self.assertEqual(debouncer.collect(now=13), [(self.path, None)])
+
+    def test_gone(self):
+        debouncer = Debouncer(2)
+        debouncer.touch(self.path, now=10)
+        debouncer.touch(os.path.join(self.directory, "b.mp3"), now=10)
+        os.remove(self.path)
+        self.assertEqual(debouncer.collect(now=20), [])
+        self.assertEqual(debouncer.pending, {})
+
+        debouncer.touch(self.path, now=10)
+        debouncer.discard(self.path)
+        self.assertEqual(debouncer.pending, {})
+
+
+class CLIWatchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input = os.path.join(self.directory, "input")
+        self.output = os.path.join(self.directory, "output")
+        os.makedirs(os.path.join(self.input, "a"))
+        os.makedirs(self.output)
+        get_gio_settings().set_string("selected-folder", filename_to_uri(self.output))
+        settings["recursive"] = True
+
+        patcher = patch.object(CLIWatch, "_monitor", lambda *_: Mock())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.watch = CLIWatch([self.input])
+        self.watch.settle_time = 0
+        self.watch.debouncer.settle_time = 0
+
+    def tearDown(self):
+        reset_settings()
+        self.watch.conversions.cancel()
+        shutil.rmtree(self.directory)
+
+    def create(self, relative_path):
+        path = os.path.join(self.input, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write("foo")
+        return path
+
+    def test_monitors(self):
+        self.assertEqual(
+            sorted(self.watch.monitors),
+            [self.input, os.path.join(self.input, "a")],
+        )
+
+    def test_new_files(self):
+        root = (self.input, "input/")
+        events = Gio.FileMonitorEvent
+        created = self.create("a/b.mp3")
+        self.watch._on_changed(None, gfile(created), None, events.CREATED, root)
+
+        # a directory with a file is moved in
+        moved = self.create("c/d/e.mp3")
+        moved_dir = os.path.join(self.input, "c")
+        self.watch._on_changed(None, gfile(moved_dir), None, events.MOVED_IN, root)
+        self.assertIn(os.path.join(moved_dir, "d"), self.watch.monitors)
+
+        # renamed after being downloaded
+        part = self.create("f.mp3.part")
+        renamed = os.path.join(self.input, "f.mp3")
+        self.watch._on_changed(None, gfile(part), None, events.CREATED, root)
+        os.rename(part, renamed)
+        self.watch._on_changed(None, gfile(part), gfile(renamed), events.RENAMED, root)
+
+        # temporary files of the conversions are ignored
+        temp = self.create("g.mp3~123~SC~")
+        self.watch._on_changed(None, gfile(temp), None, events.CREATED, root)
+
+        discoverers = []
+        with patch.object(Discoverer, "run", lambda self: discoverers.append(self)):
+            self.watch._check_pending()
+
+        (discoverer,) = discoverers
+        self.assertEqual(
+            sorted(sound_file.uri for sound_file in discoverer.sound_files),
+            sorted(filename_to_uri(path) for path in (created, moved, renamed)),
+        )
+        self.assertEqual(self.watch.debouncer.pending, {})
+
+    def test_subfolders(self):
+        root = (self.input, "input/")
+        created = self.create("a/b.mp3")
+        self.watch._on_changed(
+            None, gfile(created), None, Gio.FileMonitorEvent.CREATED, root
+        )
+        discoverers = []
+        with patch.object(Discoverer, "run", lambda self: discoverers.append(self)):
+            self.watch._check_pending()
+
+        (sound_file,) = discoverers[0].sound_files
+        self.assertEqual(sound_file.uri, filename_to_uri(created))
+        self.assertEqual(sound_file.subfolders, "input/a/")
+
+        sound_file.readable = True
+        with patch.object(self.watch.conversions, "add") as add:
+            self.watch._on_discovered(discoverers[0])
+        self.assertIs(add.call_args[0][0].sound_file, sound_file)
+
+    def test_deleted(self):
+        root = (self.input, "input/")
+        created = self.create("a/b.mp3")
+        events = Gio.FileMonitorEvent
+        self.watch._on_changed(None, gfile(created), None, events.CREATED, root)
+        directory = os.path.join(self.input, "a")
+        self.watch._on_changed(None, gfile(created), None, events.DELETED, root)
+        self.watch._on_changed(None, gfile(directory), None, events.DELETED, root)
+        self.assertEqual(self.watch.debouncer.pending, {})
+        self.assertEqual(list(self.watch.monitors), [self.input])
+
+
+if __name__ == "__main__":
+    unittest.main()
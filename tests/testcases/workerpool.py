@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+#
+# SoundConverter - GNOME application for converting between audio formats.
+# Copyright 2004 Lars Wirzenius
+# Copyright 2005-2025 Gautier Portet
+# Copyright 2020-2025 Sezanzeb
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+import os
+import shutil
+import signal
+import unittest
+
+from util import reset_settings
+
+from soundconverter.gstreamer.converter import Converter
+from soundconverter.gstreamer.workerpool import get_worker_pool
+from soundconverter.interface.mainloop import gtk_iteration
+from soundconverter.util.fileoperations import filename_to_uri
+from soundconverter.util.namegenerator import TargetNameGenerator
+from soundconverter.util.settings import get_gio_settings, settings
+from soundconverter.util.soundfile import SoundFile
+from soundconverter.util.taskqueue import TaskQueue
+
+
+class WorkerPoolTest(unittest.TestCase):
+    def setUp(self):
+        os.makedirs("tests/tmp", exist_ok=True)
+        settings["worker-processes"] = True
+        gio_settings = get_gio_settings()
+        gio_settings.set_boolean("same-folder-as-input", False)
+        gio_settings.set_string("selected-folder", filename_to_uri("tests/tmp"))
+        gio_settings.set_string("output-mime-type", "audio/x-flac")
+        gio_settings.set_boolean("limit-jobs", True)
+        gio_settings.set_int("number-of-jobs", 2)
+
+    def tearDown(self):
+        reset_settings()
+        get_worker_pool().shutdown()
+        if os.path.isdir("tests/tmp/"):
+            shutil.rmtree("tests/tmp")
+
+    def test_crashing_worker(self):
+        name_generator = TargetNameGenerator()
+        crashing = Converter(
+            SoundFile(filename_to_uri("tests/test data/audio/a.wav")),
+            name_generator,
+        )
+        working = Converter(
+            SoundFile(filename_to_uri("tests/test data/audio/b/c.mp3")),
+            name_generator,
+        )
+        queue = TaskQueue()
+        queue.add(crashing)
+        queue.add(working)
+        queue.run()
+        while crashing.worker is None:
+            gtk_iteration(True)
+        os.kill(crashing.worker.process.pid, signal.SIGKILL)
+
+        while not queue.finished:
+            gtk_iteration(True)
+
+        self.assertIn("crashed", crashing.error)
+        self.assertIsNone(working.error)
+        self.assertTrue(os.path.isfile("tests/tmp/c.flac"))
+        self.assertFalse(os.path.isfile("tests/tmp/a.flac"))
+        # the crashed worker was removed from the pool, the other one remains
+        pool = get_worker_pool()
+        self.assertEqual(len(pool.busy), 0)
+        self.assertEqual(len(pool.idle), 1)
+        self.assertTrue(pool.idle[0].is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()